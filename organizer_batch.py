@@ -0,0 +1,184 @@
+"""
+Batch mode: organize several Plug-ins directories (e.g. every After Effects
+version installed on a render node) in one pass.
+
+Roots are planned in parallel with a process pool, then executed concurrently
+with one thread per root. Each root gets its own undo file, so roots can be
+reverted independently, and the results are merged into one BatchReport.
+"""
+import os
+import json
+import hashlib
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+import organizer_core as core
+from organizer_core import log_action, flush_log
+from organizer_events import EventBuffer
+
+BATCH_UNDO_DIR = os.path.join(core.SCRIPT_DIR, "undo_batch")
+
+
+def batch_undo_file(root):
+    """Per-root undo file inside BATCH_UNDO_DIR, keyed by the normalized root path."""
+    key = os.path.normcase(os.path.abspath(root))
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(BATCH_UNDO_DIR, f"undo_{digest}.jsonl")
+
+
+def discover_roots(include_vendor_subfolders=False):
+    """
+    Plug-ins folders of every installed After Effects version. With
+    include_vendor_subfolders, first-level subfolders that hold .aex files for
+    two or more different plugins (vendor folders, not folders we created) are
+    added as roots of their own.
+    """
+    roots = core.find_ae_plugin_dirs()
+    if not include_vendor_subfolders: return roots
+    found = []
+    for root in roots:
+        found.append(root)
+        try:
+            with os.scandir(root) as it: subdirs = [e.path for e in it if e.is_dir()]
+        except OSError as e:
+            log_action(f"Batch: could not list '{root}' for vendor subfolders: {e}"); continue
+        for subdir in subdirs:
+            try:
+                with os.scandir(subdir) as it:
+                    bases = {os.path.splitext(e.name)[0].lower() for e in it if e.name.lower().endswith('.aex') and e.is_file()}
+            except OSError: continue
+            if len(bases) >= 2: found.append(subdir)
+    return found
+
+
+class RootReport:
+    """Outcome for one root of a batch."""
+    def __init__(self, root):
+        self.root = root
+        self.planned = 0
+        self.aex_count = 0
+        self.moved = 0
+        self.reverted = 0
+        self.issues = []    # Human-readable problems
+        self.error = None   # Planning/undo failure that stopped this root entirely
+        self.undo_file = batch_undo_file(root)
+
+    @property
+    def ok(self): return self.error is None and not self.issues
+
+    def as_dict(self):
+        return {"root": self.root, "planned": self.planned, "aex_count": self.aex_count, "moved": self.moved,
+                "reverted": self.reverted, "issues": self.issues, "error": self.error, "undo_file": self.undo_file}
+
+class BatchReport:
+    """Merged outcome of a batch run."""
+    def __init__(self, mode):
+        self.mode = mode # "plan", "apply" or "undo"
+        self.roots = []  # [RootReport, ...] in the order the roots were given
+
+    @property
+    def ok(self): return all(r.ok for r in self.roots)
+
+    def as_dict(self):
+        return {"mode": self.mode, "ok": self.ok,
+                "totals": {"roots": len(self.roots), "planned": sum(r.planned for r in self.roots),
+                           "moved": sum(r.moved for r in self.roots), "reverted": sum(r.reverted for r in self.roots),
+                           "failed_roots": sum(1 for r in self.roots if not r.ok)},
+                "roots": [r.as_dict() for r in self.roots]}
+
+    def save(self, path):
+        with open(path, "w", encoding='utf-8') as f: json.dump(self.as_dict(), f, indent=2)
+
+
+# --- Planning (process pool) ---
+
+def _plan_worker(root, prefix, suffix, trace, rules):
+    """
+    Runs in a worker process. Log lines and structured events are collected in
+    memory and handed back so the parent writes them to the one log in order.
+    """
+    lines = core.RingLogSink(size=None); events = EventBuffer()
+    core.configure_logging(log_sink=lines, trace_sink=lines if trace else core.NullLogSink(), event_log=events)
+    try:
+        plan = core.plan_moves(root, prefix, suffix, rules=rules)
+        return plan, None, list(lines.lines), events.records
+    except core.OrganizerError as e:
+        return None, str(e), list(lines.lines), events.records
+
+def plan_roots(roots, prefix, suffix, workers=None, trace=True):
+    """Plan every root, in parallel when workers != 1. Returns [(root, PlanResult or None, error or None)]."""
+    results = {}
+    rules = core.current_rules() # Compiled once; workers get the same rules, whatever core.RULES_FILE is there
+    if workers == 1 or len(roots) <= 1:
+        trace_sink = core.TRACE_SINK
+        if not trace: core.configure_logging(trace_sink=core.NullLogSink()) # As the pool workers do
+        try:
+            for root in roots:
+                try: results[root] = (core.plan_moves(root, prefix, suffix, rules=rules), None)
+                except core.OrganizerError as e: results[root] = (None, str(e))
+        finally:
+            if not trace: core.configure_logging(trace_sink=trace_sink)
+    else:
+        flush_log()
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {root: pool.submit(_plan_worker, root, prefix, suffix, trace, rules) for root in roots}
+                for root in roots: # Collect in input order so the log reads root by root
+                    plan, error, lines, events = futures[root].result()
+                    for line in lines: core.LOG_SINK.write(line)
+                    for record in events: core.EVENT_LOG.write(record)
+                    results[root] = (plan, error)
+        except (OSError, BrokenProcessPool) as e:
+            log_action(f"Batch: process pool unavailable ({e}); planning serially.")
+            return plan_roots(roots, prefix, suffix, workers=1, trace=trace)
+    flush_log()
+    return [(root, *results[root]) for root in roots]
+
+
+# --- Execution / undo (thread per root) ---
+
+def _apply_root(report, plan):
+    result = core.execute_moves(plan.moves, plan.snapshot, undo_file=report.undo_file, prefix=plan.prefix, suffix=plan.suffix)
+    report.moved = result.moved_count
+    report.issues = [i.message for i in result.issues]
+
+def _undo_root(report):
+    try:
+        result = core.undo_moves(report.undo_file)
+    except core.UndoUnavailableError as e:
+        report.error = str(e); return
+    report.reverted = result.reverted
+    report.issues = list(result.issues)
+
+def _run_threads(func, jobs, workers):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers or min(8, len(jobs) or 1)) as pool:
+        for future in [pool.submit(func, *job) for job in jobs]: future.result()
+
+
+def run_batch(roots, prefix="", suffix="", apply=False, workers=None, trace=True):
+    """Plan (and with apply=True, execute) every root. Returns a BatchReport."""
+    report = BatchReport("apply" if apply else "plan")
+    log_action(f"Batch {report.mode} started for {len(roots)} root(s), Prefix: '{prefix}', Suffix: '{suffix}'")
+    jobs = []
+    for root, plan, error in plan_roots(roots, prefix, suffix, workers, trace):
+        root_report = RootReport(root); report.roots.append(root_report)
+        if error is not None: root_report.error = error; continue
+        root_report.planned = len(plan.moves); root_report.aex_count = plan.aex_count
+        if apply and plan.moves: jobs.append((root_report, plan))
+
+    if jobs:
+        os.makedirs(BATCH_UNDO_DIR, exist_ok=True)
+        _run_threads(_apply_root, jobs, workers)
+    log_action(f"Batch {report.mode} finished: {report.as_dict()['totals']}")
+    flush_log()
+    return report
+
+def undo_batch(roots, workers=None):
+    """Revert each root from its own batch undo file. Returns a BatchReport."""
+    report = BatchReport("undo")
+    report.roots = [RootReport(root) for root in roots]
+    log_action(f"Batch undo started for {len(roots)} root(s).")
+    _run_threads(_undo_root, [(r,) for r in report.roots], workers)
+    log_action(f"Batch undo finished: {report.as_dict()['totals']}")
+    flush_log()
+    return report
@@ -0,0 +1,249 @@
+"""
+Benchmarks for the organizer core.
+
+    python organizer_bench.py                          # 100, 1k, 10k and 100k entries
+    python organizer_bench.py --sizes 1000 10000 --out bench.json
+    python organizer_bench.py --compare old.json new.json
+    python organizer_bench.py --memory-fs --latency 2 --workers 1 8   # A share with 2 ms per call
+
+For every size a synthetic Plug-ins directory is generated in a temp dir
+(same seed, same tree) and the four phases are timed: plan (plan_moves),
+preview (group_moves, the preview model), execute (execute_moves) and undo
+(undo_moves). For each phase the filesystem calls made are counted (stat and
+lstat, plus the audited os.* events: scandir, listdir, mkdir, rename, ...)
+and, in a second run of the same tree, the peak Python memory is measured
+with tracemalloc. Results are written as JSON so runs of different versions
+can be compared with --compare.
+
+With --memory-fs the trees live in an organizer_fs.MemoryFileSystem instead,
+behind a FaultyFileSystem that adds --latency milliseconds to every call (a
+network share's round trip) and counts the calls per operation. Several
+--workers values are then run on the same tree, so batching and parallelism
+can be compared on any machine.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+import organizer_core as core
+import organizer_fs
+from organizer_metrics import CallCounter
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+BENCH_VERSION = 1
+
+# Stems share prefixes on purpose (Element/Elem/ElementPro, Saber/Sab, Deep/DeepGlow)
+STEMS = ["Element", "Elem", "ElementPro", "Optical", "OpticalFlares", "Saber", "Sab", "Twitch",
+         "Particular", "Part", "Form", "Deep", "DeepGlow", "Plug", "Trapcode", "Magic", "MagicBullet"]
+EXTRA_NAMES = [" Presets", "_Data", "-cfg", ".dll", " Help.pdf", "Zeta.dll", "ical.txt", " 2", "Lib", "Library.dll"]
+
+
+# --- Synthetic trees ---
+
+def generate_tree(root, entries, seed=0, items_per_plugin=3, fs=None):
+    """
+    Fill root with about `entries` files and folders: .aex plugins plus
+    associated items (known suffixes, presets folders, folders named like the
+    target folder) and tricky near-misses. Deterministic for a given seed.
+    fs is the filesystem to create them in (default: core.FILESYSTEM).
+    Returns the number of plugins created.
+    """
+    rnd = random.Random(seed)
+    fs = fs or core.FILESYSTEM
+    fs.makedirs(root, exist_ok=True)
+    names = set(); bases = []
+    def add(name, folder):
+        key = name.lower()
+        if key in names: return
+        names.add(key)
+        path = os.path.join(root, name)
+        if folder: fs.mkdir(path)
+        else: fs.create_file(path)
+
+    plugins = max(1, entries // (items_per_plugin + 1))
+    for i in range(plugins):
+        stem = rnd.choice(STEMS)
+        roll = rnd.random()
+        if roll < 0.05: base = "_" + stem + str(i)                    # Underscore base: never organized
+        elif roll < 0.15: base = stem + rnd.choice(core.KNOWN_SUFFIXES).capitalize() + str(i) # Base ending in a known suffix
+        elif roll < 0.25: base = stem                                  # Bare stem: prefix of many other bases
+        else: base = f"{stem}{i}"
+        bases.append(base)
+        add(base + rnd.choice([".aex", ".AEX"]), False)
+
+    while len(names) < entries:
+        base = rnd.choice(bases)
+        if rnd.random() < 0.2: base = base.lower()
+        roll = rnd.random()
+        if roll < 0.35: name = base + rnd.choice(core.KNOWN_SUFFIXES).capitalize() + rnd.choice(["", ".dll", ".dat", " 2.txt"])
+        elif roll < 0.65: name = base + rnd.choice(EXTRA_NAMES)
+        elif roll < 0.7: name = base # Folder named like the target folder
+        else: name = f"{base}{rnd.choice(['', 'a', 'Keyz', 'Unrelated'])}{rnd.randint(0, 9999)}"
+        add(name, rnd.random() < 0.3 or name == base)
+    return plugins
+
+
+# --- Counting filesystem calls ---
+
+COUNTER = CallCounter()
+
+
+# --- Running ---
+
+def _phases(directory, workers):
+    """Yield (phase, callable) in order; each callable runs one phase on the tree in directory."""
+    state = {}
+    def plan(): state["plan"] = core.plan_moves(directory, "", "")
+    def preview(): state["groups"] = core.group_moves(state["plan"].moves, state["plan"].snapshot)
+    def execute(): state["result"] = core.execute_moves(state["plan"].moves, state["plan"].snapshot, workers=workers)
+    def undo(): state["undo"] = core.undo_moves(workers=workers)
+    return state, [("plan", plan), ("preview", preview), ("execute", execute), ("undo", undo)]
+
+def bench_size(entries, seed=0, workers=None, memory=True, work_dir=None, latency=None):
+    """
+    Benchmark one tree size. Returns a dict for the results file. With
+    latency (seconds) the tree is in memory and every filesystem call waits
+    that long.
+    """
+    if latency is not None: return _bench_memory(entries, seed, workers, latency)
+    base = tempfile.mkdtemp(prefix="organizer_bench_", dir=work_dir)
+    saved = (core.UNDO_FILE, core.HISTORY_FILE)
+    core.UNDO_FILE = os.path.join(base, "undo_log.jsonl"); core.HISTORY_FILE = os.path.join(base, "undo_history.sqlite3")
+    try:
+        directory = os.path.join(base, "Plug-ins")
+        started = time.perf_counter()
+        plugins = generate_tree(directory, entries, seed)
+        report = {"entries": len(os.listdir(directory)), "plugins": plugins, "generate_seconds": time.perf_counter() - started, "phases": {}}
+
+        state, phases = _phases(directory, workers)
+        for name, run in phases:
+            with COUNTER:
+                started = time.perf_counter(); run(); elapsed = time.perf_counter() - started
+            report["phases"][name] = {"seconds": round(elapsed, 6), "calls": dict(sorted(COUNTER.counts.items()))}
+        report["moves"] = len(state["plan"].moves)
+        report["moved"] = state["result"].moved_count
+        report["reverted"] = state["undo"].reverted
+
+        if memory: # Same tree again, now under tracemalloc (slower, so not timed)
+            shutil.rmtree(directory); generate_tree(directory, entries, seed)
+            state, phases = _phases(directory, workers)
+            for name, run in phases:
+                tracemalloc.start()
+                try: run(); report["phases"][name]["peak_kib"] = tracemalloc.get_traced_memory()[1] // 1024
+                finally: tracemalloc.stop()
+        return report
+    finally:
+        core.UNDO_FILE, core.HISTORY_FILE = saved
+        shutil.rmtree(base, ignore_errors=True)
+
+def _bench_memory(entries, seed, workers, latency):
+    """bench_size on a MemoryFileSystem behind a FaultyFileSystem with latency; calls are the backend calls."""
+    base = tempfile.mkdtemp(prefix="organizer_bench_")
+    saved = (core.UNDO_FILE, core.HISTORY_FILE, core.FILESYSTEM)
+    core.UNDO_FILE = os.path.join(base, "undo_log.jsonl"); core.HISTORY_FILE = os.path.join(base, "undo_history.sqlite3")
+    try:
+        memory_fs = organizer_fs.MemoryFileSystem()
+        directory = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+        started = time.perf_counter()
+        plugins = generate_tree(directory, entries, seed, fs=memory_fs) # Not slowed down
+        report = {"entries": len(memory_fs.listdir(directory)), "plugins": plugins, "generate_seconds": time.perf_counter() - started,
+                  "latency_ms": latency * 1000, "phases": {}}
+        fs = core.FILESYSTEM = organizer_fs.FaultyFileSystem(memory_fs, latency)
+        state, phases = _phases(directory, workers)
+        for name, run in phases:
+            fs.calls.clear()
+            started = time.perf_counter(); run(); elapsed = time.perf_counter() - started
+            report["phases"][name] = {"seconds": round(elapsed, 6), "calls": dict(sorted(fs.calls.items()))}
+        report["moves"] = len(state["plan"].moves)
+        report["moved"] = state["result"].moved_count
+        report["reverted"] = state["undo"].reverted
+        return report
+    finally:
+        core.UNDO_FILE, core.HISTORY_FILE, core.FILESYSTEM = saved
+        shutil.rmtree(base, ignore_errors=True)
+
+def run_benchmarks(sizes=DEFAULT_SIZES, seed=0, workers=None, memory=True, work_dir=None, log=False, latency=None):
+    """
+    Benchmark every size, once per workers value if workers is a list.
+    Returns the results document.
+    """
+    if not log: core.configure_logging(log_sink=core.NullLogSink(), trace_sink=core.NullLogSink(), event_log=core.NullEventLog())
+    worker_counts = workers if isinstance(workers, (list, tuple)) else [workers]
+    results = {"version": BENCH_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "python": platform.python_version(), "platform": platform.platform(), "seed": seed,
+               "workers": [w or core.MOVE_WORKERS for w in worker_counts] if len(worker_counts) > 1 else worker_counts[0] or core.MOVE_WORKERS,
+               "logging": log, "backend": "real" if latency is None else "memory", "sizes": []}
+    for size in sizes:
+        for count in worker_counts:
+            report = bench_size(size, seed, count, memory, work_dir, latency)
+            if len(worker_counts) > 1: report["workers"] = count or core.MOVE_WORKERS
+            results["sizes"].append(report)
+    try:
+        import resource
+        results["max_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # KiB on Linux
+    except ImportError: pass # Not available on Windows
+    return results
+
+
+# --- Reporting ---
+
+def format_results(results):
+    lines = [f"{'entries':>8} {'workers':>7} {'phase':<8} {'seconds':>9} {'peak KiB':>9}  calls"]
+    for size in results["sizes"]:
+        workers = size.get("workers", results["workers"])
+        for phase, data in size["phases"].items():
+            calls = ", ".join(f"{k[3:] if k.startswith('os.') else k}={v}" for k, v in data["calls"].items())
+            lines.append(f"{size['entries']:>8} {workers!s:>7} {phase:<8} {data['seconds']:>9.4f} {data.get('peak_kib', ''):>9}  {calls}")
+    return lines
+
+def compare(old, new):
+    """Lines comparing two results documents phase by phase (time ratio new/old)."""
+    lines = [f"{'entries':>8} {'phase':<8} {'old s':>9} {'new s':>9} {'ratio':>6}"]
+    old_sizes = {(s["entries"], s.get("workers")): s for s in old["sizes"]}
+    for size in new["sizes"]:
+        before = old_sizes.get((size["entries"], size.get("workers")))
+        if before is None: continue
+        for phase, data in size["phases"].items():
+            if phase not in before["phases"]: continue
+            old_s = before["phases"][phase]["seconds"]; new_s = data["seconds"]
+            ratio = new_s / old_s if old_s else float("inf")
+            lines.append(f"{size['entries']:>8} {phase:<8} {old_s:>9.4f} {new_s:>9.4f} {ratio:>6.2f}" + ("  <-- slower" if ratio > 1.2 else ""))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="organizer_bench", description="Benchmark plan, preview, execute and undo on synthetic Plug-ins trees.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Entry counts to test (default: 100 1000 10000 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="Tree generator seed")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="execute_moves and undo threads (several: one run each)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--memory-fs", action="store_true", help="Use an in-memory filesystem instead of temp dirs")
+    parser.add_argument("--latency", type=float, default=None, metavar="MS", help="Milliseconds added to every filesystem call (implies --memory-fs)")
+    parser.add_argument("--log", action="store_true", help="Keep logging enabled (to plugin_organizer.log)")
+    parser.add_argument("--dir", help="Create the trees under this directory (default: system temp)")
+    parser.add_argument("--out", help="Write the results JSON here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two results files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f: old = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f: new = json.load(f)
+        for line in compare(old, new): print(line)
+        return 0
+    latency = args.latency / 1000 if args.latency is not None else 0.0 if args.memory_fs else None
+    results = run_benchmarks(args.sizes, args.seed, args.workers, not args.no_memory, args.dir, args.log, latency)
+    for line in format_results(results): print(line)
+    if args.out:
+        with open(args.out, "w", encoding='utf-8') as f: json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
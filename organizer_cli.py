@@ -0,0 +1,402 @@
+"""
+Headless command line for Plugin Organizer.
+
+    plugin_organizer.py plan  DIR [--prefix P] [--suffix S] [--full] [--save FILE] [--json]
+    plugin_organizer.py apply DIR [--prefix P] [--suffix S] [--full | --stream] [--verify size|hash] [--json]
+    plugin_organizer.py apply --plan FILE [--json]
+    plugin_organizer.py diff  OLD_PLAN NEW_PLAN [--json]
+    plugin_organizer.py undo      [--operation ID] [--workers N] [--json]
+    plugin_organizer.py history   [--root DIR] [--limit N] [--origin PATH] [--json]
+    plugin_organizer.py log       [--lines N] [--grep TEXT]
+    plugin_organizer.py rules     [--json]
+    plugin_organizer.py events    [--op OP | --operation ID | --path PATH] [--limit N] [--json]
+    plugin_organizer.py watch DIR [--prefix P] [--suffix S] [--interval S] [--settle S]
+    plugin_organizer.py batch [ROOT ...] [--discover] [--apply | --undo] [--workers N] [--report FILE]
+    plugin_organizer.py duplicates DIR [--depth N | --all] [--stale] [--apply] [--no-cache] [--workers N] [--json]
+    plugin_organizer.py relayout DIR (--flatten | --to-prefix P --to-suffix S) [--prefix P] [--suffix S] [--apply] [--json]
+
+Every command takes --rules FILE to use another association rules file (see
+organizer_rules).
+
+Exit codes: 0 success, 1 finished with errors, 2 nothing could be done (bad
+directory, no undo information, ...).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import organizer_core as core
+import organizer_snapshot
+from organizer_plan import MovePlan, apply_plan, diff_plans
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="plugin_organizer", description="Organize After Effects plug-in files into per-plugin folders.")
+    parser.add_argument("--no-trace", action="store_true", help="Do not write per-item detail lines to the log")
+    parser.add_argument("--undo-file", help=f"Undo file to write/read (default: {core.UNDO_FILE})")
+    parser.add_argument("--metrics", nargs="?", const="", metavar="FILE", help="Print per-phase timings and counters after each run; also write them to FILE (JSON)")
+    parser.add_argument("--rules", metavar="FILE", help=f"Association rules file (default: {core.RULES_FILE})")
+    parser.add_argument("--cprofile", metavar="FILE", help="Profile the run with cProfile and write the stats to FILE")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("plan", "Show the moves that would be made"), ("apply", "Compute and execute the moves")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("directory", nargs="?" if name == "apply" else None, help="Plug-ins directory to organize")
+        p.add_argument("--prefix", default="", help="Prefix for created folder names")
+        p.add_argument("--suffix", default="", help="Suffix for created folder names")
+        p.add_argument("--full", action="store_true", help="Ignore the saved snapshot and classify every entry again")
+        p.add_argument("--json", action="store_true", help="Print a machine-readable result")
+        if name == "plan": p.add_argument("--save", metavar="FILE", help="Also write the plan to a plan file (apply it later with apply --plan)")
+        if name == "apply":
+            p.add_argument("--plan", metavar="FILE", help="Apply a saved plan file instead of planning now (refused if the directory changed)")
+            p.add_argument("--workers", type=int, default=None, help=f"Parallel move threads (default: {core.MOVE_WORKERS})")
+            p.add_argument("--stream", action="store_true", help="Start moving each plugin's items as soon as they are planned (large folders). "
+                                                                        "Checks run per plugin, not for the whole plan first: a problem in a later plugin stops the run after the earlier ones moved (undo reverts them)")
+            p.add_argument("--verify", choices=("size", "hash"), default=None, help=f"Check cross-volume copies by size or SHA-256 before deleting the source (default: {core.TRANSFER_VERIFY})")
+
+    p = sub.add_parser("diff", help="Compare two saved plan files")
+    p.add_argument("old", help="Older plan file")
+    p.add_argument("new", help="Newer plan file")
+    p.add_argument("--json", action="store_true", help="Print a machine-readable result")
+
+    p = sub.add_parser("undo", help="Revert the last applied organization")
+    p.add_argument("--operation", type=int, default=None, metavar="ID", help="Revert this operation from the undo history instead")
+    p.add_argument("--workers", type=int, default=None, help=f"Parallel rename threads (default: {core.MOVE_WORKERS})")
+    p.add_argument("--json", action="store_true", help="Print a machine-readable result")
+
+    p = sub.add_parser("history", help="List past operations, or find where an item came from")
+    p.add_argument("--root", help="Only operations on this directory")
+    p.add_argument("--limit", type=int, default=20, help="Number of operations to list (default: 20)")
+    p.add_argument("--origin", metavar="PATH", help="Show the recorded moves to or from this path")
+    p.add_argument("--json", action="store_true", help="Print a machine-readable result")
+
+    p = sub.add_parser("log", help="Print the end of the log, or the newest lines matching a text")
+    p.add_argument("--lines", type=int, default=50, help="Number of lines to print (default: 50)")
+    p.add_argument("--grep", metavar="TEXT", help="Only lines containing TEXT (case-insensitive)")
+
+    p = sub.add_parser("rules", help="Check the association rules file and print the rules in effect")
+    p.add_argument("--json", action="store_true", help="Print a machine-readable result")
+
+    p = sub.add_parser("events", help="List operations in the structured log, or print the records of one")
+    which = p.add_mutually_exclusive_group()
+    which.add_argument("--op", help="Records of this operation id")
+    which.add_argument("--operation", type=int, metavar="ID", help="Records of the run recorded as this undo history operation")
+    which.add_argument("--path", help="Records of the runs that moved this path")
+    p.add_argument("--limit", type=int, default=20, help="Number of operations to list (default: 20)")
+    p.add_argument("--json", action="store_true", help="Print a machine-readable result")
+
+    p = sub.add_parser("watch", help="Keep organizing newly installed plugins until interrupted (Ctrl+C)")
+    p.add_argument("directory", help="Plug-ins directory to watch")
+    p.add_argument("--prefix", default="", help="Prefix for created folder names")
+    p.add_argument("--suffix", default="", help="Suffix for created folder names")
+    p.add_argument("--interval", type=float, default=2.0, help="Seconds between checks when polling (default: 2)")
+    p.add_argument("--settle", type=float, default=5.0, help="Quiet seconds before new items are organized (default: 5)")
+    p.add_argument("--workers", type=int, default=None, help=f"Parallel move threads (default: {core.MOVE_WORKERS})")
+
+    p = sub.add_parser("batch", help="Plan, apply or undo several Plug-ins directories at once")
+    p.add_argument("roots", nargs="*", help="Plug-ins directories to process")
+    p.add_argument("--discover", action="store_true", help="Add the Plug-ins folders of every installed After Effects version")
+    p.add_argument("--vendor-subfolders", action="store_true", help="With --discover, also treat vendor subfolders holding several plugins as roots")
+    mode = p.add_mutually_exclusive_group()
+    mode.add_argument("--apply", action="store_true", help="Execute the planned moves (default: plan only)")
+    mode.add_argument("--undo", action="store_true", help="Revert each root from its batch undo file")
+    p.add_argument("--prefix", default="", help="Prefix for created folder names")
+    p.add_argument("--suffix", default="", help="Suffix for created folder names")
+    p.add_argument("--workers", type=int, default=None, help="Parallel workers (default: CPU count for planning, up to 8 threads for moves)")
+    p.add_argument("--report", help="Also write the merged report to this JSON file")
+    p.add_argument("--json", action="store_true", help="Print a machine-readable result")
+
+    p = sub.add_parser("duplicates", help="Find identical files and older plugin versions; optionally move them aside (undoable)")
+    p.add_argument("directory", help="Plug-ins directory to check")
+    depth = p.add_mutually_exclusive_group()
+    depth.add_argument("--depth", type=int, default=1, help="Folder levels below the root to search (default: 1)")
+    depth.add_argument("--all", action="store_true", help="Search every folder level")
+    p.add_argument("--stale", action="store_true", help="With --apply, also move older versions of a plugin (.aex), not only identical copies")
+    p.add_argument("--apply", action="store_true", help="Move the removal candidates into the _Duplicates folder (undo with: undo)")
+    p.add_argument("--no-cache", action="store_true", help="Hash every candidate file instead of reusing cached fingerprints")
+    p.add_argument("--workers", type=int, default=None, help="Parallel hashing threads (default: 4)")
+    p.add_argument("--json", action="store_true", help="Print a machine-readable result")
+
+    p = sub.add_parser("relayout", help="Flatten organized folders, or rename them to another prefix/suffix, without the undo file")
+    p.add_argument("directory", help="Organized Plug-ins directory")
+    p.add_argument("--prefix", default=None, help="Prefix the folders were organized with (default: detected)")
+    p.add_argument("--suffix", default=None, help="Suffix the folders were organized with (default: detected)")
+    layout = p.add_mutually_exclusive_group(required=True)
+    layout.add_argument("--flatten", action="store_true", help="Move the items back into the directory and remove the emptied folders")
+    layout.add_argument("--to-prefix", default=None, metavar="P", help="New folder prefix")
+    p.add_argument("--to-suffix", default="", metavar="S", help="New folder suffix (with --to-prefix; use --to-prefix '' to change only the suffix)")
+    p.add_argument("--apply", action="store_true", help="Execute the moves (default: only show them); undo with: undo")
+    p.add_argument("--workers", type=int, default=None, help=f"Parallel move threads (default: {core.MOVE_WORKERS})")
+    p.add_argument("--json", action="store_true", help="Print a machine-readable result")
+    return parser
+
+
+def _emit(args, payload, lines):
+    if args.json: print(json.dumps(payload, indent=2))
+    else:
+        for line in lines: print(line)
+
+def _plan_payload(plan):
+    return {"directory": plan.directory, "prefix": plan.prefix, "suffix": plan.suffix, "event_op": plan.event_op,
+            "aex_count": plan.aex_count, "changed": plan.changed, "moves": [{"source": s, "destination": d} for s, d in plan.moves]}
+
+def _plan_lines(plan):
+    if plan.aex_count == 0: return ["No plugin (.aex) files found directly in the selected directory to organize."]
+    lines = [f"{len(plan.moves)} move(s) planned for {plan.aex_count} plugin(s):"]
+    for source, destination in plan.moves:
+        lines.append(f"  {os.path.basename(source)} -> {os.path.relpath(destination, plan.directory)}")
+    return lines
+
+
+def _plan(args):
+    if args.full: organizer_snapshot.forget(args.directory)
+    return organizer_snapshot.plan_incremental(args.directory, args.prefix, args.suffix)
+
+def cmd_plan(args):
+    plan = _plan(args)
+    payload = _plan_payload(plan); lines = _plan_lines(plan)
+    if args.save:
+        MovePlan.from_result(plan).save(args.save)
+        payload["saved_to"] = args.save; lines.append(f"Plan saved to {args.save}")
+    _emit(args, payload, lines)
+    return 0
+
+def cmd_apply(args):
+    if args.verify: core.TRANSFER_VERIFY = args.verify
+    if args.plan:
+        move_plan = MovePlan.load(args.plan)
+        result = apply_plan(move_plan, undo_file=args.undo_file, workers=args.workers)
+        organizer_snapshot.forget(move_plan.root) # Planned elsewhere; the next plan starts from a fresh listing
+        payload = {"plan_file": args.plan, "directory": move_plan.root, "prefix": move_plan.prefix, "suffix": move_plan.suffix}
+    elif not args.directory: raise core.OrganizerError("apply needs a directory or --plan FILE.")
+    elif args.stream:
+        stream = core.stream_moves(args.directory, args.prefix, args.suffix)
+        result = core.execute_stream(stream, undo_file=args.undo_file, workers=args.workers)
+        organizer_snapshot.forget(args.directory) # Not planned through the snapshot; the next plan starts from a fresh listing
+        payload = {"directory": args.directory, "prefix": args.prefix, "suffix": args.suffix, "event_op": stream.event_op,
+                   "aex_count": stream.aex_count, "groups": stream.groups, "streamed": True}
+    else:
+        plan = _plan(args)
+        result = core.execute_moves(plan.moves, plan.snapshot, undo_file=args.undo_file, workers=args.workers, prefix=plan.prefix, suffix=plan.suffix)
+        organizer_snapshot.remember_applied(plan, result)
+        payload = _plan_payload(plan)
+    payload.update({"moved": result.moved_count, "stopped": result.stopped, "undo_saved": result.undo_saved,
+                    "undo_file": result.undo_file, "operation_id": result.operation_id, "event_op": result.event_op, "issues": [i.as_dict() for i in result.issues],
+                    "renamed": result.renamed, "copied": result.copied, "bytes_moved": result.bytes_moved,
+                    "elapsed": result.elapsed, "items_per_sec": result.items_per_sec, "bytes_per_sec": result.bytes_per_sec})
+    lines = [f"Moved {result.moved_count} of {result.planned} planned item(s) in {result.elapsed:.3f}s "
+             f"({result.items_per_sec:.1f} items/s, {result.bytes_per_sec / 1048576:.1f} MiB/s; {result.renamed} renamed, {result.copied} copied)."]
+    lines += [f"  {i.kind}: {i.message}" for i in result.issues]
+    if result.undo_saved: lines.append(f"Undo information saved to {result.undo_file}")
+    if result.operation_id is not None: lines.append(f"Recorded as operation #{result.operation_id} (undo later with: undo --operation {result.operation_id})")
+    _emit(args, payload, lines)
+    return 0 if result.ok else 1
+
+def cmd_diff(args):
+    old = MovePlan.load(args.old); new = MovePlan.load(args.new)
+    changes = diff_plans(old, new)
+    lines = []
+    if (old.root, old.prefix, old.suffix) != (new.root, new.prefix, new.suffix):
+        lines.append(f"Note: plans differ in root/prefix/suffix ({old.root!r} {old.prefix!r} {old.suffix!r} vs {new.root!r} {new.prefix!r} {new.suffix!r}).")
+    for name, before, after in changes:
+        if before is None: lines.append(f"+ {name} -> {after}")
+        elif after is None: lines.append(f"- {name} -> {before}")
+        else: lines.append(f"~ {name}: {before} -> {after}")
+    lines.append(f"{len(changes)} difference(s); {len(old)} move(s) in {args.old}, {len(new)} in {args.new}.")
+    _emit(args, {"old": args.old, "new": args.new, "changes": [{"name": n, "old": b, "new": a} for n, b, a in changes]}, lines)
+    return 0 if not changes else 1
+
+def cmd_undo(args):
+    result = core.undo_moves(args.undo_file, operation_id=args.operation, workers=args.workers)
+    payload = {"attempted": result.attempted, "reverted": result.reverted, "removed_folders": result.removed_folders,
+               "issues": result.issues, "undo_file_kept": result.undo_file_kept, "event_op": result.event_op,
+               "items": [i.as_dict() for i in result.items]}
+    lines = [f"Reverted {result.reverted} of {result.attempted} item(s); removed {result.removed_folders} empty folder(s)."]
+    lines += [f"  {issue}" for issue in result.issues]
+    _emit(args, payload, lines)
+    return 0 if result.ok else 1
+
+def cmd_history(args):
+    history = core.undo_history()
+    if history is None: raise core.OrganizerError("The undo history is disabled.")
+    if args.origin:
+        rows = history.origin_of(args.origin)
+        lines = [f"#{r['op_id']} {r['started']} {r['source']} -> {r['destination']}" + (" (reverted)" if r["reverted"] else "") for r in rows]
+        _emit(args, {"path": args.origin, "moves": rows}, lines or [f"No recorded moves for {args.origin}."])
+        return 0
+    rows = history.operations(args.root, args.limit)
+    lines = [f"#{r['id']} {r['started']} {r['state']:<16} {r['moved']:>5} moved  {r['root']}" for r in rows]
+    _emit(args, {"operations": rows}, lines or ["No operations recorded."])
+    return 0
+
+def cmd_log(args):
+    from organizer_logreader import LogReader
+    core.flush_log()
+    if not os.path.exists(core.LOG_FILE): raise core.OrganizerError(f"Log file {core.LOG_FILE} not found.")
+    reader = LogReader(core.LOG_FILE)
+    if args.grep:
+        lines = []
+        for _, line in reader.search(args.grep):
+            lines.append(line)
+            if len(lines) >= args.lines: break
+        lines.reverse()
+    else: lines = [line for _, line in reader.lines_before(None, args.lines)]
+    for line in lines: print(line)
+    return 0
+
+def _event_line(record):
+    fields = {k: v for k, v in record.items() if k not in ("t", "op", "ev")}
+    return f"{record['t']} {record['ev']:<14} {json.dumps(fields, ensure_ascii=False)}"
+
+def cmd_events(args):
+    events = core.EVENT_LOG
+    if args.op is None and args.operation is None and args.path is None:
+        ops = list(events.index().items())[-args.limit:]
+        lines = [f"{op} {e['kind']:<8} segment {e['seg']} @ {e['off']}" + (f"  (history #{e['history_id']})" if "history_id" in e else "") for op, e in ops]
+        _emit(args, {"operations": [dict(e, op=op) for op, e in ops]}, lines or ["No operations in the structured log."])
+        return 0
+
+    if args.path is not None: # The undo history knows which runs moved the path; the index finds their records
+        history = core.undo_history()
+        if history is None: raise core.OrganizerError("The undo history is disabled; --path needs it.")
+        path = os.path.abspath(args.path)
+        index = events.index(); by_history_id = events.history_ids(index) # One read of the index for every run
+        op_ids = [by_history_id.get(op_id) for op_id in dict.fromkeys(r["op_id"] for r in history.origin_of(path))]
+        key = os.path.normcase(path)
+        records = [r for op in op_ids if op for r in events.read_operation(op, index)
+                   if r["ev"] not in ("move", "revert") or key in (os.path.normcase(r["src"]), os.path.normcase(r["dst"]))]
+    else:
+        op = args.op if args.op is not None else events.operation_for_history_id(args.operation)
+        records = events.read_operation(op) if op else []
+    if not records: raise core.OrganizerError("No matching records in the structured log (unknown operation, or rotated away).")
+    _emit(args, {"records": records}, [_event_line(r) for r in records])
+    return 0
+
+def cmd_rules(args):
+    rules = core.current_rules() # Raises RulesError for a bad file
+    found = bool(core.RULES_FILE) and os.path.exists(core.RULES_FILE)
+    payload = dict(rules.config, file=core.RULES_FILE, found=found, fingerprint=rules.fingerprint, suffixes=rules.suffixes)
+    lines = [f"Rules file: {core.RULES_FILE}" + ("" if found else " (not found; built-in rules)"),
+             f"Known suffixes: {', '.join(rules.suffixes)}",
+             f"Ignored plugins: {', '.join(rules.config['ignore_plugins']) or '-'}",
+             f"Ignored items: {', '.join(rules.config['ignore']) or '-'}"]
+    lines += [f"Alias: {alias} -> {base}" for base, aliases in rules.config["aliases"].items() for alias in aliases]
+    lines += [f"Mapping: {name} -> {base}" for name, base in rules.config["mappings"].items()]
+    _emit(args, payload, lines)
+    return 0
+
+def cmd_watch(args):
+    import organizer_watch
+    def report(batch):
+        moved = batch.result.moved_count if batch.result else 0
+        print(f"{time.strftime('%H:%M:%S')} {len(batch.new_entries)} new item(s): moved {moved} into {batch.groups} folder(s)"
+              + (f", waiting for {len(batch.deferred)} still being written" if batch.deferred else ""))
+        if batch.result:
+            for issue in batch.result.issues: print(f"  {issue.kind}: {issue.message}")
+        sys.stdout.flush()
+    print(f"Watching {args.directory} (Ctrl+C to stop)"); sys.stdout.flush()
+    try: organizer_watch.watch(args.directory, args.prefix, args.suffix, args.interval, args.settle, args.workers, on_batch=report)
+    except KeyboardInterrupt: print("Stopped.")
+    return 0
+
+
+def cmd_batch(args):
+    import organizer_batch as batch
+    roots = list(args.roots)
+    if args.discover: roots += [r for r in batch.discover_roots(args.vendor_subfolders) if r not in roots]
+    if not roots: raise core.OrganizerError("No roots given and none discovered (use ROOT arguments or --discover).")
+
+    if args.undo: report = batch.undo_batch(roots, args.workers)
+    else: report = batch.run_batch(roots, args.prefix, args.suffix, apply=args.apply, workers=args.workers, trace=not args.no_trace)
+    if args.report: report.save(args.report)
+
+    lines = []
+    for r in report.roots:
+        if r.error: lines.append(f"{r.root}: ERROR {r.error}")
+        elif report.mode == "undo": lines.append(f"{r.root}: reverted {r.reverted}")
+        elif report.mode == "apply": lines.append(f"{r.root}: moved {r.moved} of {r.planned} ({r.aex_count} plugin(s))")
+        else: lines.append(f"{r.root}: {r.planned} move(s) for {r.aex_count} plugin(s)")
+        lines += [f"  {issue}" for issue in r.issues]
+    _emit(args, report.as_dict(), lines)
+    return 0 if report.ok else 1
+
+
+def cmd_duplicates(args):
+    import organizer_duplicates
+    report = organizer_duplicates.find_duplicates(args.directory, None if args.all else args.depth, args.workers, use_cache=not args.no_cache)
+    payload = {"directory": report.directory, "files": report.files, "hashed": report.hashed, "cached": report.cached,
+               "elapsed": report.elapsed, "groups": [g.as_dict() for g in report.groups]}
+    lines = []
+    for g in report.groups:
+        lines.append(f"{'Identical' if g.kind == 'duplicate' else 'Older versions of'} {os.path.relpath(g.keep.path, report.directory)} ({g.keep.size} bytes):")
+        lines += [f"  {os.path.relpath(f.path, report.directory)}" for f in g.candidates]
+    lines.append(f"{len(report.duplicates)} group(s) of identical files, {len(report.stale)} plugin(s) with older versions; "
+                 f"{report.files} file(s) checked, {report.hashed} hashed, {report.cached} from the cache in {report.elapsed:.3f}s.")
+    if not args.apply:
+        _emit(args, payload, lines); return 0
+    plan = report.plan(include_stale=args.stale)
+    if not plan.moves:
+        lines.append("Nothing to move."); _emit(args, payload, lines); return 0
+    result = core.execute_moves(plan.moves, undo_file=args.undo_file)
+    organizer_snapshot.forget(args.directory)
+    payload.update({"moved": result.moved_count, "undo_file": result.undo_file, "operation_id": result.operation_id, "issues": [i.as_dict() for i in result.issues]})
+    lines.append(f"Moved {result.moved_count} of {len(plan.moves)} file(s) into {organizer_duplicates.QUARANTINE_FOLDER}.")
+    lines += [f"  {i.kind}: {i.message}" for i in result.issues]
+    if result.operation_id is not None: lines.append(f"Recorded as operation #{result.operation_id} (undo later with: undo --operation {result.operation_id})")
+    _emit(args, payload, lines)
+    return 0 if result.ok else 1
+
+
+def cmd_relayout(args):
+    import organizer_relayout
+    prefix, suffix = args.prefix, args.suffix
+    if prefix is None or suffix is None:
+        scheme = organizer_relayout.detect_scheme(args.directory)
+        if scheme is None: print(f"No organized plugin folders found in {args.directory}.", file=sys.stderr); return 2
+        prefix = scheme[0] if prefix is None else prefix; suffix = scheme[1] if suffix is None else suffix
+    if args.flatten: plan = organizer_relayout.plan_flatten(args.directory, prefix, suffix)
+    else: plan = organizer_relayout.plan_relayout(args.directory, prefix, suffix, args.to_prefix, args.to_suffix)
+    payload = plan.as_dict()
+    scheme = f"'{prefix}<plugin>{suffix}'"
+    lines = [f"{len(plan.folders)} organized folder(s) named {scheme}."]
+    if plan.flatten: lines.append(f"{len(plan.moves)} item(s) to move back into the directory; {len(plan.remove_after)} folder(s) to remove afterwards.")
+    else: lines.append(f"{plan.renamed} folder(s) to rename to '{args.to_prefix}<plugin>{args.to_suffix}', {len(plan.moves) - plan.renamed} item(s) to merge into existing folders, {plan.unchanged} unchanged.")
+    for source, destination in plan.moves: lines.append(f"  {os.path.relpath(source, plan.directory)} -> {os.path.relpath(destination, plan.directory)}")
+    lines += [f"  left in place: {os.path.relpath(source, plan.directory)} ({message})" for source, _, message in plan.conflicts]
+    if not args.apply or not plan.moves:
+        _emit(args, payload, lines); return 0 if not plan.conflicts else 1
+    result = organizer_relayout.apply_relayout(plan, undo_file=args.undo_file, workers=args.workers)
+    payload.update({"moved": result.moved_count, "removed_folders": result.removed_folders, "undo_file": result.undo_file,
+                    "operation_id": result.operation_id, "issues": [i.as_dict() for i in result.issues]})
+    lines.append(f"Moved {result.moved_count} of {len(plan.moves)}; removed {len(result.removed_folders)} emptied folder(s).")
+    lines += [f"  {i.kind}: {i.message}" for i in result.issues]
+    if result.operation_id is not None: lines.append(f"Recorded as operation #{result.operation_id} (undo later with: undo --operation {result.operation_id})")
+    _emit(args, payload, lines)
+    return 0 if result.ok and not plan.conflicts else 1
+
+
+COMMANDS = {"plan": cmd_plan, "apply": cmd_apply, "diff": cmd_diff, "undo": cmd_undo, "history": cmd_history, "log": cmd_log, "rules": cmd_rules, "events": cmd_events, "watch": cmd_watch, "batch": cmd_batch, "duplicates": cmd_duplicates, "relayout": cmd_relayout}
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.no_trace: core.configure_logging(trace_sink=core.NullLogSink())
+    if args.rules: core.RULES_FILE = os.path.abspath(args.rules)
+    # Roots are recorded in the undo journal, the history and the snapshots: make them independent of the cwd once, here
+    if getattr(args, "directory", None): args.directory = os.path.abspath(args.directory)
+    if getattr(args, "roots", None): args.roots = [os.path.abspath(root) for root in args.roots]
+    echo = lambda lines: print("\n".join(lines), file=sys.stderr)
+    if args.metrics is not None or args.cprofile:
+        import organizer_metrics
+        organizer_metrics.enable(args.metrics or None, args.cprofile, echo)
+    elif os.environ.get("PLUGIN_ORGANIZER_METRICS") or os.environ.get("PLUGIN_ORGANIZER_CPROFILE"):
+        import organizer_metrics
+        organizer_metrics.enable_from_env(echo)
+    try:
+        return COMMANDS[args.command](args)
+    except core.OrganizerError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        core.flush_log()
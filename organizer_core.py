@@ -0,0 +1,1457 @@
+"""
+Plugin Organizer core: planning, execution and undo of plugin folder moves.
+
+Importing this module never touches Tk or requests elevation; it is used by the
+GUI (organizer_gui), the command line (organizer_cli) and scripts. Functions
+return result objects and raise OrganizerError subclasses instead of showing
+dialogs.
+"""
+import os
+import shutil
+import sys
+import datetime
+import time
+import atexit
+import collections
+import threading
+import errno
+import queue
+import heapq
+
+from organizer_journal import UndoJournal, JournalEntry, read_journal
+from organizer_events import EventLog, NullEventLog
+from organizer_rules import Rules, KNOWN_SUFFIXES, load_rules
+from organizer_transfer import TransferCancelled
+from organizer_fs import RealFileSystem
+
+# Globals
+if getattr(sys, 'frozen', False): SCRIPT_DIR = os.path.dirname(sys.executable)
+else: SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_FILE = os.path.join(SCRIPT_DIR, "plugin_organizer.log")
+UNDO_FILE = os.path.join(SCRIPT_DIR, "undo_log.jsonl")
+LEGACY_UNDO_FILE = os.path.join(SCRIPT_DIR, "undo_log.json") # Written by versions before the journal
+HISTORY_FILE = os.path.join(SCRIPT_DIR, "undo_history.sqlite3") # Every operation, for multi-level undo; None disables it
+RULES_FILE = os.path.join(SCRIPT_DIR, "organizer_rules.json") # Extra association rules (see organizer_rules); optional
+MOVE_WORKERS = 4 # Default size of the execute_moves and undo_moves thread pools
+UNDO_BATCH = 2048 # Recorded moves undo_moves checks before reverting them together
+TRANSFER_VERIFY = "size" # Cross-volume copies are verified by "size" or "hash" (SHA-256) before the source is deleted
+FILESYSTEM = RealFileSystem() # Everything planning, moving and undo do to the Plug-ins tree goes through this (see organizer_fs)
+
+# Logging
+class FileLogSink:
+    """
+    Keeps the log file open and buffers lines. The buffer is written out once it
+    holds max_lines lines or max_delay seconds have passed, and on flush().
+    Safe to share between threads (batch mode executes roots concurrently).
+    """
+    def __init__(self, path=None, max_lines=256, max_delay=2.0):
+        self.path = path # None -> follow the LOG_FILE global
+        self.max_lines = max_lines; self.max_delay = max_delay
+        self._buffer = []; self._file = None; self._file_path = None
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, line):
+        with self._lock:
+            self._buffer.append(line)
+            due = len(self._buffer) >= self.max_lines or time.monotonic() - self._last_flush >= self.max_delay
+        if due: self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._buffer: return
+            lines, self._buffer = self._buffer, []
+            path = self.path or LOG_FILE
+            try:
+                if self._file is None or self._file_path != path:
+                    self.close()
+                    self._file = open(path, "a", encoding='utf-8'); self._file_path = path
+                self._file.write("".join(lines)); self._file.flush()
+            except Exception as e: print(f"CRITICAL: Error writing to log file '{path}': {e}")
+
+    def close(self):
+        if self._file is not None:
+            try: self._file.close()
+            except Exception: pass
+        self._file = None; self._file_path = None
+
+class RingLogSink:
+    """Keeps only the last `size` lines in memory (e.g. for verbose per-item tracing)."""
+    def __init__(self, size=1000): self.lines = collections.deque(maxlen=size) # size=None keeps everything
+    def write(self, line): self.lines.append(line)
+    def flush(self): pass
+    def close(self): pass
+
+class NullLogSink:
+    """Discards everything."""
+    def write(self, line): pass
+    def flush(self): pass
+    def close(self): pass
+
+LOG_SINK = FileLogSink()    # Operation records
+TRACE_SINK = LOG_SINK       # Verbose per-item tracing (same file by default)
+EVENT_LOG = EventLog(SCRIPT_DIR) # Structured JSONL records per operation (see organizer_events)
+_timestamp_cache = [None, ""]
+
+def configure_logging(log_sink=None, trace_sink=None, event_log=None):
+    """
+    Swap the log backends. Pass trace_sink=NullLogSink() to turn per-item tracing
+    off, or a RingLogSink to keep it in memory; event_log=NullEventLog() turns the
+    structured operation log off.
+    """
+    global LOG_SINK, TRACE_SINK, EVENT_LOG
+    flush_log()
+    if log_sink is not None: LOG_SINK = log_sink
+    if trace_sink is not None: TRACE_SINK = trace_sink
+    if event_log is not None: EVENT_LOG = event_log
+
+def _timestamp():
+    now = int(time.time())
+    if _timestamp_cache[0] != now: # Formatting once per second is plenty for this resolution
+        _timestamp_cache[0] = now
+        _timestamp_cache[1] = datetime.datetime.fromtimestamp(now).strftime("[%Y-%m-%d %H:%M:%S]")
+    return _timestamp_cache[1]
+
+def log_action(message):
+    LOG_SINK.write(f"{_timestamp()} {message}\n")
+
+def log_trace(message):
+    """Per-item detail lines; routed to TRACE_SINK so they can be silenced or kept in memory."""
+    TRACE_SINK.write(f"{_timestamp()} {message}\n")
+
+def new_operation(kind):
+    """Operation id for the structured log records of one plan, execute or undo."""
+    return EVENT_LOG.new_operation(kind)
+
+def log_event(op, event, **fields):
+    """One structured record: event is 'plan.begin', 'move', 'execute.end', ... with counts as fields."""
+    EVENT_LOG.emit(op, event, **fields)
+
+def flush_log():
+    """Write out buffered log lines. Called at the end of each operation and before any destructive step."""
+    LOG_SINK.flush()
+    if TRACE_SINK is not LOG_SINK: TRACE_SINK.flush()
+    EVENT_LOG.flush()
+
+atexit.register(flush_log)
+
+
+# --- Instrumentation (see organizer_metrics) ---
+
+METRICS = None # organizer_metrics.Metrics while instrumentation is on; when None the hooks below cost one check
+
+def metrics_begin(kind):
+    """Start measuring a run ('plan', 'execute', ...). Returns None when instrumentation is off."""
+    return METRICS.begin(kind) if METRICS is not None else None
+
+def metrics_mark(run):
+    return run.mark() if run is not None else None
+
+def metrics_phase(run, name, mark, items=0):
+    """Record the phase that started at mark."""
+    if run is not None: run.phase(name, mark, items)
+
+def metrics_end(run, **fields):
+    """Finish a run: logs its summary and returns it as a dict (None when off)."""
+    return run.metrics.end(run, **fields) if run is not None else None
+
+
+# --- Errors and Results ---
+
+class OrganizerError(Exception):
+    """Base class for errors raised by the organizer core."""
+
+class InvalidDirectoryError(OrganizerError):
+    """The directory to organize does not exist or is not a directory."""
+
+class ScanError(OrganizerError):
+    """The directory could not be scanned."""
+
+class ScanPermissionError(ScanError):
+    """Permission denied while scanning the directory."""
+
+class UndoUnavailableError(OrganizerError):
+    """There is no usable undo information."""
+
+class OperationCancelled(OrganizerError):
+    """The operation was cancelled before it finished."""
+
+class RulesError(OrganizerError):
+    """The association rules file cannot be used."""
+
+class StalePlanError(OrganizerError):
+    """A saved plan no longer matches the directory it was made for."""
+    def __init__(self, message, problems=()):
+        super().__init__(message)
+        self.problems = list(problems)
+
+class PlanResult:
+    """Outcome of planning one directory."""
+    def __init__(self, directory, prefix, suffix, moves=None, aex_count=0, snapshot=None):
+        self.directory = directory
+        self.prefix = prefix
+        self.suffix = suffix
+        self.moves = moves if moves is not None else [] # [(source, destination), ...]
+        self.aex_count = aex_count                       # Unique .aex base names found in pass 1
+        self.snapshot = snapshot                         # DirectorySnapshot the plan was computed from
+        self.changed = None                              # Entries classified by an incremental plan (None: full plan)
+        self.dir_mtime_ns = None                         # Directory mtime taken before the scan, if known
+        self.rules = None                                # Rules the plan was made with
+        self.metrics = None                              # Instrumentation summary (dict) when enabled
+        self.event_op = None                             # Operation id in the structured log
+
+class MoveIssue:
+    """A problem met while executing one move. kind: 'permission', 'mkdir', 'self_move', 'move', 'undo_save' or 'preflight'."""
+    __slots__ = ("source", "destination", "kind", "message")
+
+    def __init__(self, source, destination, kind, message):
+        self.source = source; self.destination = destination; self.kind = kind; self.message = message
+
+    def as_dict(self):
+        return {"source": self.source, "destination": self.destination, "kind": self.kind, "message": self.message}
+
+class ExecutionResult:
+    """Outcome of execute_moves."""
+    def __init__(self, planned=0, undo_file=None):
+        self.planned = planned
+        self.undo_mapping = {} # destination -> source for every completed move (also journaled to undo_file)
+        self.issues = []       # [MoveIssue, ...]
+        self.stopped = False   # Execution stopped before the end of the plan
+        self.undo_saved = False   # Every completed move is in the undo journal
+        self.undo_file = undo_file
+        self.created_folders = [] # Target folders this run created
+        self.removed_folders = [] # Folders emptied and removed after the moves (organizer_relayout)
+        self.renamed = 0          # Items moved with a same-volume rename
+        self.copied = 0           # Items moved by copy and delete (cross-device)
+        self.bytes_moved = 0      # Sizes of moved files, when the scan recorded them
+        self.elapsed = 0.0        # Seconds spent executing
+        self.operation_id = None  # Id of this run in the undo history
+        self.cancelled = False    # Stopped between moves on request
+        self.event_op = None      # Operation id in the structured log
+        self.preflight = None     # PreflightReport, if the plan was checked first
+        self.metrics = None       # Instrumentation summary (dict) when enabled
+
+    @property
+    def moved_count(self): return len(self.undo_mapping)
+    @property
+    def items_per_sec(self): return self.moved_count / self.elapsed if self.elapsed else 0.0
+    @property
+    def bytes_per_sec(self): return self.bytes_moved / self.elapsed if self.elapsed else 0.0
+    @property
+    def ok(self): return not self.issues and not self.cancelled
+
+class UndoResult:
+    """Outcome of undo_moves."""
+    def __init__(self):
+        self.attempted = 0
+        self.reverted = 0
+        self.issues = []            # ["<name> -> <problem>", ...]
+        self.items = []             # [UndoItem, ...] one per recorded move, in no particular order
+        self.removed_folders = 0
+        self.undo_file_kept = False
+        self.undo_file_error = None # Set if the undo file could not be removed
+        self.cancelled = False      # Stopped on request; the undo file is kept for the rest
+        self.event_op = None        # Operation id in the structured log
+        self.metrics = None         # Instrumentation summary (dict) when enabled
+
+    @property
+    def ok(self): return not self.issues and not self.cancelled
+
+class UndoItem:
+    """What undo did with one recorded move. status: 'reverted', 'exists' (original location taken, skipped), 'missing', 'not_moved', 'permission' or 'error'."""
+    __slots__ = ("source", "destination", "status", "message")
+
+    def __init__(self, source, destination, status, message=None):
+        self.source = source; self.destination = destination; self.status = status; self.message = message
+
+    def as_dict(self):
+        return {"source": self.source, "destination": self.destination, "status": self.status, "message": self.message}
+
+
+# --- Progress ---
+
+class Progress:
+    """Progress of a running phase ('scan', 'plan', 'move', 'undo' or 'hash'), passed to progress callbacks."""
+    __slots__ = ("phase", "done", "total", "bytes_done", "elapsed")
+
+    def __init__(self, phase, done, total, bytes_done=0, elapsed=0.0):
+        self.phase = phase; self.done = done; self.total = total
+        self.bytes_done = bytes_done; self.elapsed = elapsed
+
+    @property
+    def eta(self):
+        """Estimated seconds left from the rate so far, or None if unknown."""
+        if not self.done or not self.total or self.done >= self.total: return None
+        return self.elapsed / self.done * (self.total - self.done)
+
+class _ProgressReporter:
+    """Thread-safe counter for one phase that calls back at most every `interval` seconds (and at the end)."""
+    def __init__(self, callback, phase, total, interval=0.1):
+        self.callback = callback; self.phase = phase; self.total = total; self.interval = interval
+        self.done = 0; self.bytes_done = 0
+        self._started = self._last = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def step(self, count=1, nbytes=0):
+        if self.callback is None: return
+        with self._lock:
+            self.done += count; self.bytes_done += nbytes
+            now = time.perf_counter()
+            if now - self._last < self.interval: return
+            self._last = now
+            event = Progress(self.phase, self.done, self.total, self.bytes_done, now - self._started)
+        self.callback(event)
+
+    def finish(self):
+        if self.callback is None: return
+        with self._lock: event = Progress(self.phase, self.done, self.total, self.bytes_done, time.perf_counter() - self._started)
+        self.callback(event)
+
+
+# --- Core Logic ---
+
+def current_rules():
+    """The compiled association rules from RULES_FILE (built-in rules if there is none). Raises RulesError."""
+    try: return load_rules(RULES_FILE) if RULES_FILE else Rules()
+    except ValueError as e:
+        log_action(f"Error: {e}"); flush_log()
+        raise RulesError(str(e)) from e
+
+class BaseNameTrie:
+    """
+    Case-insensitive prefix trie over .aex base names.
+    One walk of an item name yields every base that prefixes it, longest first.
+    """
+    _END = ""  # Terminal key; never collides with a real character
+
+    def __init__(self, base_names=()):
+        self.root = {}
+        for base_name in base_names: self.add(base_name)
+
+    def add(self, base_name):
+        node = self.root
+        for ch in base_name.lower(): node = node.setdefault(ch, {})
+        node[self._END] = base_name.lower()
+
+    def prefixes_of(self, name_lower):
+        """Return the bases that are prefixes of name_lower, longest first."""
+        node, found = self.root, []
+        for ch in name_lower:
+            node = node.get(ch)
+            if node is None: break
+            if self._END in node: found.append(node[self._END])
+        found.reverse()
+        return found
+
+class ScannedEntry:
+    """One directory entry, typed once during the scan."""
+    __slots__ = ("name", "name_lower", "path", "is_dir", "is_file", "size", "mtime")
+
+    def __init__(self, entry, with_stat=False):
+        self.name = entry.name
+        self.name_lower = entry.name.lower()
+        self.path = entry.path
+        try: self.is_dir = entry.is_dir()
+        except OSError: self.is_dir = False
+        try: self.is_file = entry.is_file()
+        except OSError: self.is_file = False
+        self.size = self.mtime = None
+        if with_stat:
+            try:
+                st = entry.stat()
+                self.size, self.mtime = st.st_size, st.st_mtime
+            except OSError: pass
+
+    @classmethod
+    def from_values(cls, name, path, is_dir, is_file, size=None, mtime=None):
+        """Rebuild an entry without a DirEntry (e.g. from a saved snapshot)."""
+        self = cls.__new__(cls)
+        self.name = name; self.name_lower = name.lower(); self.path = path
+        self.is_dir = is_dir; self.is_file = is_file; self.size = size; self.mtime = mtime
+        return self
+
+class DirectorySnapshot:
+    """
+    Single os.scandir pass over a directory. compute_moves, preview_moves and
+    execute_moves read entry types from here instead of stat-ing each path again.
+    """
+    def __init__(self, directory, with_stat=False):
+        self.directory = directory = os.path.abspath(directory)
+        self.entries = {} # name -> ScannedEntry, in listing order
+        with FILESYSTEM.scandir(directory) as it:
+            for entry in it: self.entries[entry.name] = ScannedEntry(entry, with_stat)
+        self.by_path = {e.path: e for e in self.entries.values()}
+
+    @classmethod
+    def from_entries(cls, directory, entries):
+        """A snapshot made of already known ScannedEntry objects instead of a new scan."""
+        self = cls.__new__(cls)
+        self.directory = directory
+        self.entries = {e.name: e for e in entries}
+        self.by_path = {e.path: e for e in self.entries.values()}
+        return self
+
+    def get(self, path):
+        return self.by_path.get(path)
+
+    def is_dir(self, path):
+        """Cached is_dir for scanned paths; falls back to the filesystem for anything else."""
+        entry = self.by_path.get(path)
+        return entry.is_dir if entry is not None else FILESYSTEM.isdir(path)
+
+    def item_type(self, path):
+        return "Folder" if self.is_dir(path) else "File"
+
+def scan_directory(directory, with_stat=False):
+    """Scan a directory once. Returns a DirectorySnapshot (raises OSError like os.scandir)."""
+    return DirectorySnapshot(directory, with_stat)
+
+def association_reason(item_name_lower, aex_base_lower, rules=None):
+    """
+    Return why item_name_lower belongs to aex_base_lower (which must prefix it),
+    or None if it is not related.
+    """
+    return (rules or current_rules()).reason(item_name_lower, aex_base_lower)
+
+
+def classify_entry(entry, base_trie, aex_base_to_target_folder, rules=None):
+    """
+    Pass 2 decision for one entry that is not a pass 1 .aex: returns
+    (aex_base_lower, target_folder_path, reason) for the base it belongs to, with
+    reason None for a folder that already has the target folder's name (left in
+    place), or None if the entry is not related to any base (or is ignored).
+    aex_base_to_target_folder and base_trie include the aliases of the rules
+    (see Rules.expand_targets).
+    """
+    rules = rules or current_rules()
+    if rules.ignores(entry.name): return None
+    item_name_lower = entry.name_lower
+    mapped = rules.mappings.get(item_name_lower)
+    if mapped is not None and mapped in aex_base_to_target_folder: # Explicit mapping beats the prefix rules
+        target_folder_path = aex_base_to_target_folder[mapped]
+        if entry.is_dir and entry.name == os.path.basename(target_folder_path): return mapped, target_folder_path, None
+        return mapped, target_folder_path, "Mapped by rule"
+    for aex_base_lower in base_trie.prefixes_of(item_name_lower): # Longest match first
+        reason = rules.reason(item_name_lower, aex_base_lower)
+        if reason is None: continue
+        target_folder_path = aex_base_to_target_folder[aex_base_lower]
+        if entry.is_dir and entry.name == os.path.basename(target_folder_path): return aex_base_lower, target_folder_path, None
+        return aex_base_lower, target_folder_path, reason
+    return None
+
+def _find_plugins(entries, directory, prefix, suffix, rules):
+    """Pass 1: ({aex base (lower): target folder path}, [the .aex entries that define them]); the first .aex of a base wins."""
+    log_action("Starting pass 1: Identifying .aex files and targets.")
+    aex_base_to_target_folder = {}; aex_entries = []
+    for item_name, entry in entries.items():
+        if entry.is_file and entry.name_lower.endswith('.aex'):
+            aex_base_name = os.path.splitext(item_name)[0]
+            if rules.ignores_plugin(aex_base_name) or rules.ignores(item_name): continue # Internal/temp (by default '_' names)
+
+            target_folder_name = f"{prefix}{aex_base_name}{suffix}"
+            aex_base_lower = aex_base_name.lower()
+            if aex_base_lower in aex_base_to_target_folder: continue # Use first encountered
+
+            aex_base_to_target_folder[aex_base_lower] = os.path.join(directory, target_folder_name)
+            log_trace(f"Identified .aex: '{item_name}', Base: '{aex_base_name}', Target Folder: '{target_folder_name}'")
+            aex_entries.append(entry)
+    return aex_base_to_target_folder, aex_entries
+
+def plan_moves(directory, prefix, suffix, snapshot=None, progress=None, cancel=None, rules=None):
+    """
+    Compute moves for .aex files and their associated items (files/folders).
+    Skips moving an associated folder if its name matches the target folder name.
+    Pass a DirectorySnapshot to reuse an existing scan of the directory, and
+    Rules to use other association rules than those of RULES_FILE.
+    progress is called with Progress events; setting the cancel Event stops
+    planning with OperationCancelled.
+    Raises InvalidDirectoryError, ScanError or RulesError; returns a PlanResult.
+    """
+    directory = os.path.abspath(directory) # The moves end up in the undo journal and history: never relative to the cwd
+    rules = rules or current_rules()
+    plan = PlanResult(directory, prefix, suffix)
+    plan.rules = rules
+    moves = plan.moves
+    processed_items = set()
+    op = plan.event_op = new_operation("plan")
+    log_event(op, "plan.begin", directory=directory, prefix=prefix, suffix=suffix)
+    run = metrics_begin("plan"); mark = metrics_mark(run)
+
+    if snapshot is None and not FILESYSTEM.isdir(directory):
+        log_action(f"Error: compute_moves called with invalid directory: {directory}")
+        log_event(op, "plan.end", error="invalid_directory")
+        flush_log()
+        raise InvalidDirectoryError(f"Directory not found or invalid:\n{directory}")
+
+    try:
+        if snapshot is None:
+            plan.dir_mtime_ns = FILESYSTEM.stat(directory).st_mtime_ns # Before the scan, so later changes always show
+            snapshot = scan_directory(directory, with_stat=(os.name == 'nt')) # Sizes come free with the listing on Windows
+        plan.snapshot = snapshot
+        entries = snapshot.entries
+        if progress is not None: progress(Progress("scan", len(entries), len(entries)))
+        log_event(op, "plan.scan", entries=len(entries))
+        metrics_phase(run, "scan", mark, len(entries)); mark = metrics_mark(run)
+        reporter = _ProgressReporter(progress, "plan", len(entries))
+
+        # --- Pass 1: Identify .aex files and targets ---
+        aex_base_to_target_folder, aex_entries = _find_plugins(entries, directory, prefix, suffix, rules)
+        for entry in aex_entries:
+            moves.append((entry.path, os.path.join(aex_base_to_target_folder[os.path.splitext(entry.name)[0].lower()], entry.name)))
+            processed_items.add(entry.name)
+
+        plan.aex_count = len(aex_base_to_target_folder)
+        metrics_phase(run, "pass1", mark, len(entries)); mark = metrics_mark(run)
+        if not aex_base_to_target_folder:
+            log_action("Pass 1 complete: No organizable .aex files found.")
+            log_event(op, "plan.end", entries=len(entries), aex=0, moves=0)
+            plan.metrics = metrics_end(run, entries=len(entries), aex=0, moves=0)
+            flush_log()
+            return plan
+        else:
+             log_action(f"Pass 1 complete: Found {len(aex_base_to_target_folder)} unique .aex base name(s) to process.")
+
+        # --- Pass 2: Find related files and folders ---
+        log_action("Starting pass 2: Identifying associated files and folders.")
+        targets = rules.expand_targets(aex_base_to_target_folder) # Aliases share their plugin's folder
+        base_trie = BaseNameTrie(targets.keys())
+
+        for index, (item_name, entry) in enumerate(entries.items()):
+            if not index & 255: # Every 256 items
+                if cancel is not None and cancel.is_set(): raise OperationCancelled("Planning was cancelled.")
+                if index: reporter.step(256)
+            if item_name in processed_items: continue
+
+            decision = classify_entry(entry, base_trie, targets, rules)
+            if decision is None: continue
+            aex_base_lower, target_folder_path, log_reason = decision
+            target_folder_basename = os.path.basename(target_folder_path) # Get name of folder to be created
+
+            if log_reason is None:
+                log_trace(f"Skipping associated Folder: '{item_name}' because its name matches the target folder name derived from '{aex_base_lower}.aex'.")
+                # Also mark as processed so it doesn't get matched again later by mistake
+                processed_items.add(item_name)
+                continue
+
+            # If not skipped, add the move
+            destination_item = os.path.join(target_folder_path, item_name)
+            item_type = "Folder" if entry.is_dir else "File"
+            log_trace(f"Identified associated {item_type}: '{item_name}' for base '{aex_base_lower}'. Reason: {log_reason}. Moving to '{target_folder_basename}'")
+            moves.append((entry.path, destination_item))
+            processed_items.add(item_name)
+
+        reporter.step(len(entries) - reporter.done); reporter.finish()
+        metrics_phase(run, "pass2", mark, len(entries))
+        log_action("Pass 2 complete.")
+
+    except OperationCancelled:
+        log_action(f"Planning cancelled for directory: {directory}")
+        log_event(op, "plan.end", cancelled=True)
+        flush_log()
+        raise
+    except PermissionError as e:
+         log_action(f"PermissionError scanning directory {directory}: {e}")
+         log_event(op, "plan.end", error="permission", message=str(e))
+         flush_log()
+         raise ScanPermissionError(f"Permission denied scanning directory:\n{directory}") from e
+    except FileNotFoundError as e:
+        log_action(f"Error: compute_moves called with invalid directory: {directory}")
+        log_event(op, "plan.end", error="invalid_directory")
+        flush_log()
+        raise InvalidDirectoryError(f"Directory not found or invalid:\n{directory}") from e
+    except Exception as e:
+        log_action(f"Error scanning directory {directory}: {e}")
+        log_event(op, "plan.end", error="scan", message=str(e))
+        flush_log()
+        raise ScanError(f"An unexpected error occurred while scanning directory {directory}:\n{e}") from e
+
+    log_action(f"Computed {len(moves)} move operations.")
+    log_event(op, "plan.end", entries=len(entries), aex=plan.aex_count, moves=len(moves))
+    plan.metrics = metrics_end(run, entries=len(entries), aex=plan.aex_count, moves=len(moves))
+    flush_log()
+    return plan
+
+def compute_moves(directory, prefix, suffix, snapshot=None):
+    """Like plan_moves, but returns only the list of (source, destination) tuples."""
+    return plan_moves(directory, prefix, suffix, snapshot).moves
+
+
+class PreviewGroup:
+    """Planned moves into one target folder, for the preview."""
+    __slots__ = ("name", "path", "items", "folder_count")
+
+    def __init__(self, name, path):
+        self.name = name; self.path = path
+        self.items = []       # [(item name, is_dir), ...] sorted by name
+        self.folder_count = 0 # How many of the items are folders
+
+    @property
+    def file_count(self): return len(self.items) - self.folder_count
+
+def group_moves(moves, snapshot=None):
+    """
+    Group planned moves by target folder in one pass. Entry types come from the
+    snapshot the plan was made from, so no filesystem calls are made for a plan
+    returned by plan_moves. Returns [PreviewGroup, ...] sorted by folder name.
+    """
+    groups = {}
+    is_dir = snapshot.is_dir if snapshot is not None else FILESYSTEM.isdir
+    basename = os.path.basename; dirname = os.path.dirname
+    for source, destination in moves:
+        folder_path = dirname(destination)
+        group = groups.get(folder_path)
+        if group is None: group = groups[folder_path] = PreviewGroup(basename(folder_path), folder_path)
+        folder = is_dir(source)
+        group.items.append((basename(source), folder))
+        if folder: group.folder_count += 1
+    ordered = sorted(groups.values(), key=lambda g: g.name)
+    for group in ordered: group.items.sort()
+    return ordered
+
+class MoveGroup(PreviewGroup):
+    """The planned moves into one target folder, as a MoveStream yields them."""
+    __slots__ = ("moves",)
+
+    def __init__(self, name, path):
+        PreviewGroup.__init__(self, name, path)
+        self.moves = [] # [(source, destination), ...], the .aex file first
+
+    def add(self, entry, destination):
+        self.moves.append((entry.path, destination))
+        self.items.append((entry.name, entry.is_dir))
+        if entry.is_dir: self.folder_count += 1
+
+
+def _range_end(key):
+    """The smallest string above every string that starts with key (None if there is none)."""
+    last = ord(key[-1])
+    return key[:-1] + chr(last + 1) if last < sys.maxunicode else None
+
+class MoveStream:
+    """
+    The moves plan_moves would make, one target folder at a time (see stream_moves).
+    Iterating it yields MoveGroups; snapshot, aex_count, groups and moves are
+    filled in as it runs.
+    """
+    def __init__(self, directory, prefix, suffix, snapshot=None, progress=None, cancel=None, rules=None):
+        self.directory = os.path.abspath(directory)
+        self.prefix = prefix; self.suffix = suffix
+        self.snapshot = snapshot
+        self.progress = progress; self.cancel = cancel
+        self.rules = rules
+        self.aex_count = 0; self.groups = 0; self.moves = 0 # So far
+        self.dir_mtime_ns = None; self.scanned_at = None
+        self.event_op = None
+        self._iterator = None
+
+    def __iter__(self):
+        if self._iterator is None: self._iterator = self._generate()
+        return self._iterator
+
+    def batches(self):
+        """Start the stream and return an iterator of move lists, one per group. Scan errors are raised here."""
+        groups = iter(self)
+        first = next(groups, None)
+        def batches():
+            if first is None: return
+            yield first.moves
+            for group in groups: yield group.moves
+        return batches()
+
+    def plan_result(self, groups):
+        """A PlanResult with the moves of groups (all the groups of this finished stream)."""
+        plan = PlanResult(self.directory, self.prefix, self.suffix, [m for g in groups for m in g.moves], self.aex_count, self.snapshot)
+        plan.dir_mtime_ns = self.dir_mtime_ns; plan.rules = self.rules; plan.event_op = self.event_op
+        return plan
+
+    def _generate(self):
+        directory = self.directory; prefix = self.prefix; suffix = self.suffix; cancel = self.cancel
+        rules = self.rules = self.rules or current_rules()
+        op = self.event_op = new_operation("plan")
+        log_event(op, "plan.begin", directory=directory, prefix=prefix, suffix=suffix, streamed=True)
+        run = metrics_begin("plan"); mark = metrics_mark(run)
+        try:
+            if self.snapshot is None:
+                if not FILESYSTEM.isdir(directory): raise FileNotFoundError(directory)
+                self.dir_mtime_ns = FILESYSTEM.stat(directory).st_mtime_ns # Before the scan, so later changes always show
+                self.scanned_at = time.time()
+                self.snapshot = scan_directory(directory, with_stat=(os.name == 'nt'))
+            entries = self.snapshot.entries
+            if self.progress is not None: self.progress(Progress("scan", len(entries), len(entries)))
+            log_event(op, "plan.scan", entries=len(entries))
+            metrics_phase(run, "scan", mark, len(entries)); mark = metrics_mark(run)
+
+            aex_base_to_target_folder, aex_entries = _find_plugins(entries, directory, prefix, suffix, rules)
+            self.aex_count = len(aex_base_to_target_folder)
+            metrics_phase(run, "pass1", mark, len(entries)); mark = metrics_mark(run)
+            if not aex_entries:
+                log_action("Pass 1 complete: No organizable .aex files found.")
+                log_event(op, "plan.end", entries=len(entries), aex=0, moves=0, streamed=True)
+                metrics_end(run, entries=len(entries), aex=0, moves=0)
+                flush_log()
+                return
+            log_action(f"Pass 1 complete: Found {self.aex_count} unique .aex base name(s); streaming their groups.")
+
+            # One group per target folder, the .aex first. Items are classified in name order: every
+            # item of a group starts with one of its keys (base or alias), so the group is complete
+            # once the walk is past the names those keys start.
+            targets = rules.expand_targets(aex_base_to_target_folder)
+            base_trie = BaseNameTrie(targets.keys())
+            aex_of = {} # target folder path -> the .aex entry that defines it
+            for entry in aex_entries: aex_of[aex_base_to_target_folder[os.path.splitext(entry.name)[0].lower()]] = entry
+            processed = {entry.name for entry in aex_entries}
+            open_groups = {} # Only groups that have items besides their .aex so far
+            def group_of(folder_path):
+                group = open_groups.get(folder_path)
+                if group is None:
+                    group = open_groups[folder_path] = MoveGroup(os.path.basename(folder_path), folder_path)
+                    group.add(aex_of[folder_path], os.path.join(folder_path, aex_of[folder_path].name))
+                return group
+            def take(folder_path): # A complete group, counted
+                group = group_of(folder_path); del open_groups[folder_path]
+                self.groups += 1; self.moves += len(group.moves); group.items.sort()
+                return group
+            keys_of = {}
+            for key, folder_path in targets.items(): keys_of.setdefault(folder_path, []).append(_range_end(key))
+            closing = [(max(ends), folder_path) for folder_path, ends in keys_of.items() if None not in ends]
+            heapq.heapify(closing)
+            unbounded = [folder_path for folder_path, ends in keys_of.items() if None in ends] # Complete only at the end
+
+            def classify(entry):
+                decision = classify_entry(entry, base_trie, targets, rules)
+                if decision is None: return
+                aex_base_lower, target_folder_path, log_reason = decision
+                if log_reason is None:
+                    log_trace(f"Skipping associated Folder: '{entry.name}' because its name matches the target folder name derived from '{aex_base_lower}.aex'.")
+                    return
+                log_trace(f"Identified associated {'Folder' if entry.is_dir else 'File'}: '{entry.name}' for base '{aex_base_lower}'. Reason: {log_reason}. Moving to '{os.path.basename(target_folder_path)}'")
+                group_of(target_folder_path).add(entry, os.path.join(target_folder_path, entry.name))
+            if rules.mappings: # Mapped items can sort anywhere: place them first
+                for entry in entries.values():
+                    if entry.name_lower in rules.mappings and entry.name not in processed: classify(entry); processed.add(entry.name)
+
+            log_action("Starting pass 2: Identifying associated files and folders.")
+            reporter = _ProgressReporter(self.progress, "plan", len(entries))
+            for index, entry in enumerate(sorted(entries.values(), key=lambda e: e.name_lower)):
+                if not index & 255:
+                    if cancel is not None and cancel.is_set(): raise OperationCancelled("Planning was cancelled.")
+                    if index: reporter.step(256)
+                while closing and closing[0][0] <= entry.name_lower: # Groups the walk is past are complete
+                    group = take(heapq.heappop(closing)[1])
+                    metrics_phase(run, "pass2", mark)
+                    yield group
+                    mark = metrics_mark(run)
+                if entry.name not in processed: classify(entry)
+            reporter.step(len(entries) - reporter.done); reporter.finish()
+            for folder_path in sorted([f for _, f in closing] + unbounded, key=lambda p: os.path.basename(p).lower()):
+                group = take(folder_path)
+                metrics_phase(run, "pass2", mark)
+                yield group
+                mark = metrics_mark(run)
+            metrics_phase(run, "pass2", mark, len(entries))
+            log_action("Pass 2 complete.")
+
+        except OperationCancelled:
+            log_action(f"Planning cancelled for directory: {directory}")
+            log_event(op, "plan.end", cancelled=True)
+            flush_log()
+            raise
+        except PermissionError as e:
+            log_action(f"PermissionError scanning directory {directory}: {e}")
+            log_event(op, "plan.end", error="permission", message=str(e))
+            flush_log()
+            raise ScanPermissionError(f"Permission denied scanning directory:\n{directory}") from e
+        except FileNotFoundError as e:
+            log_action(f"Error: stream_moves called with invalid directory: {directory}")
+            log_event(op, "plan.end", error="invalid_directory")
+            flush_log()
+            raise InvalidDirectoryError(f"Directory not found or invalid:\n{directory}") from e
+        except OrganizerError: raise
+        except Exception as e:
+            log_action(f"Error scanning directory {directory}: {e}")
+            log_event(op, "plan.end", error="scan", message=str(e))
+            flush_log()
+            raise ScanError(f"An unexpected error occurred while scanning directory {directory}:\n{e}") from e
+
+        log_action(f"Streamed {self.moves} move operations in {self.groups} group(s).")
+        log_event(op, "plan.end", entries=len(entries), aex=self.aex_count, moves=self.moves, groups=self.groups, streamed=True)
+        metrics_end(run, entries=len(entries), aex=self.aex_count, moves=self.moves, groups=self.groups)
+        flush_log()
+
+def stream_moves(directory, prefix, suffix, snapshot=None, progress=None, cancel=None, rules=None):
+    """
+    Plan like plan_moves, but hand out the moves one target folder at a time,
+    each as soon as its items are known, instead of one list at the end. The
+    directory is still listed once up front; classifying, logging, previewing
+    (and, with execute_stream, moving) then overlap. Returns a MoveStream;
+    iterating it raises the errors plan_moves raises.
+    """
+    return MoveStream(directory, prefix, suffix, snapshot, progress, cancel, rules)
+
+
+def _is_cross_device_error(e):
+    return e.errno == errno.EXDEV or getattr(e, 'winerror', None) == 17 # ERROR_NOT_SAME_DEVICE
+
+def undo_history():
+    """The UndoHistory store for HISTORY_FILE, or None if the history is disabled."""
+    if not HISTORY_FILE: return None
+    from organizer_history import UndoHistory # sqlite3 is only loaded when needed
+    return UndoHistory(HISTORY_FILE)
+
+def execute_moves(moves, snapshot=None, undo_file=None, workers=None, prefix="", suffix="", progress=None, cancel=None, check=True):
+    """
+    Execute planned moves and save undo information. Returns an ExecutionResult.
+    Stops on permission and unexpected errors; skips self-moves ("into itself").
+    Each move is journaled to undo_file as it happens (see organizer_journal),
+    so undo_moves can revert a run that stopped halfway or crashed. The run is
+    also recorded as an operation in the undo history (HISTORY_FILE), so it can
+    still be undone later by its operation id (prefix/suffix are stored with it).
+
+    All target folders are created first. Items are then moved by a bounded
+    thread pool (workers, default MOVE_WORKERS): a plain os.rename when source
+    and target folder are on the same volume, a verified, resumable copy (see
+    organizer_transfer) only for cross-device items. With the DirectorySnapshot the moves were
+    planned from, entry types and existence come from the scan instead of
+    per-item stat calls.
+
+    progress is called with Progress events ('move' phase). Setting the cancel
+    Event stops the run cleanly between moves: moves in flight finish (a
+    cross-volume copy stops and is resumed by the next run), the journal is
+    closed normally and result.cancelled is set.
+
+    With check (the default) the whole plan is validated first (see
+    organizer_preflight); if that finds a problem nothing is touched and the
+    problems are returned as 'preflight' issues.
+    """
+    return _execute([moves], len(moves), snapshot, undo_file, workers, prefix, suffix, progress, cancel, check)
+
+def execute_stream(stream, undo_file=None, workers=None, progress=None, cancel=None, check=True):
+    """
+    Execute a MoveStream (see stream_moves) while the rest of the directory is
+    still being classified: each group is checked by the preflight, its folder
+    created and its items handed to the move threads as soon as the planner
+    yields it. Everything else is as in execute_moves; the run is one undo
+    operation. Raises the planner's errors if the directory cannot be scanned.
+
+    The preflight only sees one group at a time, so it is not all-or-nothing
+    as for execute_moves: a problem found in a later group (a clash with an
+    earlier group's folder, too little space for the copies so far) stops the
+    run after the earlier groups have been moved (with several workers, moves
+    of earlier groups still queued then are left undone too). The moves made
+    are journaled and can be undone.
+    """
+    batches = stream.batches() # Scans the directory now, so scan errors are raised here
+    return _execute(batches, None, stream.snapshot, undo_file, workers, stream.prefix, stream.suffix, progress, cancel, check)
+
+def _execute(batches, planned, snapshot, undo_file, workers, prefix, suffix, progress, cancel, check):
+    """execute_moves for moves that arrive in batches ([(source, destination), ...]); planned is None when their number is not known up front."""
+    streamed = planned is None
+    fs = FILESYSTEM
+    undo_file = undo_file or UNDO_FILE
+    workers = max(1, workers or MOVE_WORKERS)
+    result = ExecutionResult(planned=planned or 0, undo_file=undo_file)
+    undo_mapping = result.undo_mapping
+    created_folders = result.created_folders # Track folders created by *this* process
+    lock = threading.Lock()
+    stop = threading.Event()
+    journal = UndoJournal(undo_file, header={"streamed": True} if streamed else {"planned": planned})
+    op = result.event_op = new_operation("execute")
+    run = metrics_begin("execute")
+
+    def path_exists(path):
+        if snapshot is not None and snapshot.get(path) is not None: return True
+        if snapshot is not None and os.path.dirname(path) == snapshot.directory: return False # Not in scan
+        return fs.exists(path)
+    def item_type_of(path):
+        return snapshot.item_type(path) if snapshot is not None else ("Folder" if fs.isdir(path) else "File")
+    def add_issue(source, destination, kind, message, fatal):
+        with lock:
+            result.issues.append(MoveIssue(source, destination, kind, message))
+            if fatal: result.stopped = True; stop.set()
+        log_event(op, "issue", kind=kind, src=source, dst=destination, message=message, fatal=fatal)
+
+    if streamed: log_action("Starting execution of streamed moves: each group is moved as soon as it is planned.")
+    else: log_action(f"Starting execution of {planned} move operations.")
+    log_event(op, "execute.begin", planned=planned, workers=workers, undo_file=undo_file, prefix=prefix, suffix=suffix, **({"streamed": True} if streamed else {}))
+    started = time.perf_counter()
+
+    existing_names = {} # Pre-existing target folder -> names already inside it
+    prepared = set()    # Target folders created or checked for an earlier batch
+    device_of_dir = {}  # Folder -> st_dev (None if it cannot be stat'ed); filled by the preflight first
+    def device(path):
+        if path not in device_of_dir:
+            try: device_of_dir[path] = fs.stat(path).st_dev
+            except OSError: device_of_dir[path] = None
+        return device_of_dir[path]
+
+    # --- Move items ---
+    def move_one(source, destination, folder_path):
+        item_name = os.path.basename(source)
+        target_name = os.path.basename(destination) # Differs from item_name when a folder is renamed
+        item_type = "Item"
+        move_started = time.perf_counter() if run is not None else 0.0
+        try:
+            if not path_exists(source):
+                log_action(f"Warning: Source item '{source}' not found for moving. Already moved or deleted?")
+                return
+            item_type = item_type_of(source)
+            folder_name = os.path.basename(folder_path)
+            log_action(f"Moving {item_type}: '{item_name}' -> '{folder_name}{os.sep}{target_name}' in '{folder_name}'")
+            if os.path.normcase(destination).startswith(os.path.normcase(source) + os.sep): # Would be moved into itself
+                raise shutil.Error(f"Cannot move a directory '{source}' into itself '{destination}'.")
+
+            folder_dev = device(folder_path) # A plain rename needs the source's folder and the target folder on one volume
+            fast = folder_dev is not None and folder_dev == device(os.path.dirname(source)) and target_name not in existing_names.get(folder_path, ())
+            try: move_id = journal.intent(source, destination) # Nothing moves unless it can be undone
+            except Exception as e:
+                error_msg = f"Could not write undo journal {undo_file}:\n{e}"
+                log_action(f"CRITICAL ERROR: {error_msg}")
+                add_issue(source, destination, "undo_save", error_msg, fatal=True)
+                return
+            method = "rename" if fast else "copy"; copied = None
+            try:
+                if fast:
+                    try: fs.rename(source, destination)
+                    except OSError as e:
+                        if not _is_cross_device_error(e): raise
+                        fast = False; method = "copy"
+                if not fast and target_name in existing_names.get(folder_path, ()): fs.move(source, destination) # Existing destination: nest or replace as before
+                elif not fast: # Cross-device: copy, verify, then delete the source; resumes an interrupted copy
+                    copied = fs.transfer(source, destination, checkpoint=lambda name, nbytes: journal.checkpoint(move_id, name, nbytes),
+                                      verify=TRANSFER_VERIFY, cancel=cancel)
+                    method = copied.method or "copy"
+                    if copied.bytes_resumed: log_action(f"Resumed interrupted copy of '{item_name}': {copied.bytes_resumed} of {copied.nbytes} bytes were already copied.")
+            except TransferCancelled:
+                with lock: result.cancelled = True
+                log_action(f"Copy of '{item_name}' cancelled; the partial copy is kept and the next run resumes it.")
+                return
+            except FileNotFoundError:
+                if fs.lexists(source): raise # Missing destination parent etc., not a vanished source
+                log_action(f"Warning: Source item '{source}' not found for moving. Already moved or deleted?")
+                return
+
+            try: journal.done(move_id)
+            except Exception as e: log_action(f"Warning: could not confirm move of '{item_name}' in undo journal: {e}") # The intent record still allows undo
+            entry = snapshot.get(source) if snapshot is not None else None
+            size = copied.nbytes if copied is not None else entry.size if entry is not None and entry.size is not None and not entry.is_dir else 0
+            with lock:
+                undo_mapping[destination] = source # Use absolute paths for robust undo
+                if fast: result.renamed += 1
+                else: result.copied += 1
+                result.bytes_moved += size
+            if copied is not None: log_event(op, "move", src=source, dst=destination, method=method, bytes=size, files=copied.files, resumed=copied.bytes_resumed)
+            else: log_event(op, "move", src=source, dst=destination, method=method, bytes=size)
+            if run is not None: run.record_move(time.perf_counter() - move_started, source, destination, method, size)
+            return size
+
+        except PermissionError as e:
+             error_msg = f"Permission denied moving {item_type} '{item_name}': {e}"
+             log_action(f"PermissionError: {error_msg}")
+             add_issue(source, destination, "permission", error_msg, fatal=True) # Stop on permission errors
+
+        except Exception as e:
+            error_msg = f"Error moving {item_type} '{item_name}': {e}"
+            # Specific check for the self-move error, although compute_moves should prevent it now.
+            if "into itself" in str(e):
+                log_action(f"Error (Self-Move Detected): {error_msg}") # Log specifically
+                add_issue(source, destination, "self_move", error_msg, fatal=False) # Skip to the next move
+            else:
+                 log_action(f"Error: {error_msg}")
+                 add_issue(source, destination, "move", error_msg, fatal=True) # Stop on other unexpected move errors
+
+    # --- Per batch: preflight, deduplicate, create the target folders ---
+    seen_sources = set(); moved_anything = False
+    def prepare(batch):
+        """The jobs of one batch, or None if it cannot be run (issues are recorded)."""
+        if check and batch:
+            from organizer_preflight import preflight
+            mark = metrics_mark(run)
+            report = result.preflight = preflight(batch, snapshot, fs)
+            metrics_phase(run, "preflight", mark, report.checked)
+            for problem in report.warnings: log_action(f"Preflight warning: {problem.message}")
+            if not report.ok:
+                for problem in report.errors:
+                    log_action(f"Preflight: {problem.message}")
+                    add_issue(problem.source, problem.destination, "preflight", problem.message, fatal=True)
+                return None
+            if not streamed: log_action(f"Preflight passed for {report.checked} move(s) ({len(report.warnings)} warning(s)).")
+            existing_names.update(report.listings); device_of_dir.update(report.devices)
+        if not moved_anything: flush_log() # Everything planned so far is on disk before the first move
+
+        pending = []; folders = {}
+        for source, destination in batch:
+            if source in seen_sources:
+                log_action(f"Skipping move for '{source}' as it appears to have already been processed in this batch.")
+                continue
+            seen_sources.add(source)
+            folder_path = os.path.dirname(destination) # This is the target folder (e.g., ".../Element")
+            folders.setdefault(folder_path, None)
+            pending.append((source, destination, folder_path))
+
+        # --- Pre-create every target folder and learn its volume ---
+        mark = metrics_mark(run)
+        for folder_path in folders:
+            if folder_path in prepared: continue # Handled for an earlier batch
+            try:
+                if not path_exists(folder_path):
+                    try:
+                        fs.makedirs(folder_path)
+                        log_action(f"Created folder: {folder_path}")
+                        log_event(op, "mkdir", path=folder_path)
+                        created_folders.append(folder_path) # Mark as created
+                    except FileExistsError:
+                        log_action(f"Folder already exists (race condition?): {folder_path}")
+                        existing_names[folder_path] = set(fs.listdir(folder_path))
+                elif folder_path not in existing_names: # Not listed by the preflight
+                    existing_names[folder_path] = set(fs.listdir(folder_path)) if fs.isdir(folder_path) else set()
+            except PermissionError as pe:
+                error_msg = f"Permission denied creating folder '{os.path.basename(folder_path)}': {pe}"
+                log_action(f"PermissionError: {error_msg}")
+                add_issue("", folder_path, "permission", error_msg, fatal=True)
+                break # Stop if we can't create a needed folder
+            except Exception as e_mkdir:
+                error_msg = f"Error creating folder '{os.path.basename(folder_path)}': {e_mkdir}"
+                log_action(f"Error: {error_msg}")
+                add_issue("", folder_path, "mkdir", error_msg, fatal=True)
+                break # Stop if folder creation fails critically
+            device(folder_path); prepared.add(folder_path)
+        metrics_phase(run, "mkdir", mark, len(folders))
+        return pending
+
+    history = None
+    def begin_history(first_source):
+        nonlocal history
+        root = snapshot.directory if snapshot is not None else os.path.dirname(first_source)
+        try:
+            history = undo_history()
+            if history is not None:
+                result.operation_id = history.begin_operation(root, prefix, suffix, planned=planned or 0)
+                journal.header["operation_id"] = result.operation_id # Links the journal to its history entry
+        except Exception as e:
+            history = None; log_action(f"Warning: could not record operation in undo history {HISTORY_FILE}: {e}")
+
+    # --- Move items: a bounded thread pool fed batch by batch ---
+    reporter = _ProgressReporter(progress, "move", 0) # Total grows batch by batch
+    jobs = queue.Queue(); threads = []
+    def cancelled():
+        if cancel is not None and cancel.is_set(): result.cancelled = True; return True
+        return False
+    def worker():
+        while True:
+            job = jobs.get()
+            if job is None: return
+            if stop.is_set() or cancelled(): continue # Drain what is queued
+            reporter.step(1, move_one(*job) or 0) # Bytes moved, None if the item was not moved
+    mark = metrics_mark(run)
+    try:
+        for batch in batches:
+            if stop.is_set() or cancelled(): break
+            batch = [(os.path.abspath(s), os.path.abspath(d)) for s, d in batch] # Journal and history paths must not depend on the cwd
+            pending = prepare(batch)
+            if pending is None or stop.is_set(): break
+            if not pending: continue
+            reporter.total += len(pending)
+            if streamed: result.planned += len(pending)
+            if not moved_anything:
+                moved_anything = True; begin_history(pending[0][0]); mark = metrics_mark(run)
+            if workers == 1 or (not streamed and len(pending) <= 1):
+                for job in pending:
+                    if stop.is_set() or cancelled(): break
+                    reporter.step(1, move_one(*job) or 0)
+                continue
+            if not threads:
+                threads = [threading.Thread(target=worker, name=f"move-{i}", daemon=True) for i in range(workers if streamed else min(workers, len(pending)))]
+                for t in threads: t.start()
+            for job in pending: jobs.put(job)
+    except OperationCancelled: result.cancelled = True # The planner of a stream noticed the cancel first
+    except OrganizerError as e: add_issue("", "", "plan", f"Planning failed: {e}", fatal=True)
+    finally:
+        for _ in threads: jobs.put(None)
+        for t in threads: t.join()
+
+    if not moved_anything and result.issues and result.preflight is not None and not result.preflight.ok:
+        result.elapsed = time.perf_counter() - started
+        log_action(f"Execution not started: preflight found {len(result.preflight.errors)} problem(s). Nothing was moved.")
+        log_event(op, "execute.end", moved=0, issues=len(result.issues), cancelled=False, preflight_failed=True, seconds=round(result.elapsed, 6))
+        result.metrics = metrics_end(run, planned=result.planned, moved=0, preflight_errors=len(result.preflight.errors))
+        flush_log()
+        return result
+
+    reporter.finish()
+    metrics_phase(run, "move", mark, len(undo_mapping)); mark = metrics_mark(run)
+    if result.cancelled: log_action(f"Execution cancelled by user after {len(undo_mapping)} of {result.planned} move(s).")
+
+    # Folders created up front that never received an item (run stopped early)
+    for folder_path in (list(reversed(created_folders)) if result.issues or result.cancelled else ()):
+        try:
+            if not fs.listdir(folder_path): fs.rmdir(folder_path); created_folders.remove(folder_path); log_action(f"Removed unused created folder: {folder_path}")
+        except OSError: pass
+
+    result.elapsed = time.perf_counter() - started
+    errors_encountered = bool(result.issues)
+
+    # --- Close Undo Journal ---
+    if journal.started:
+        try:
+            journal.close(moved=len(undo_mapping), errors=errors_encountered, cancelled=result.cancelled)
+            log_action(f"Undo information for {len(undo_mapping)} item(s) saved to {undo_file}")
+        except Exception as e:
+             errors_encountered = True
+             log_action(f"CRITICAL ERROR: Failed closing undo journal {undo_file}: {e}")
+             result.issues.append(MoveIssue("", undo_file, "undo_save", f"Could not finish the undo journal {undo_file}:\n{e}"))
+    result.undo_saved = bool(undo_mapping) and not any(i.kind == "undo_save" for i in result.issues)
+    if history is not None:
+        try:
+            history.finish_operation(result.operation_id, [(src, dst) for dst, src in undo_mapping.items()], errors=errors_encountered or result.cancelled)
+            log_action(f"Recorded as operation #{result.operation_id} in undo history.")
+        except Exception as e: log_action(f"Warning: could not record operation #{result.operation_id} in undo history: {e}")
+    metrics_phase(run, "finish", mark) # Cleanup, journal close and history
+
+    total_moves_planned = result.planned # Note: This count includes the skipped self-move if one occurred
+    actual_moves_logged = len(undo_mapping)
+    log_action(f"Execution finished. Planned(incl. potential skips)={total_moves_planned}, Succeeded/Logged={actual_moves_logged}, Errors Encountered={errors_encountered}")
+    log_action(f"Throughput: {result.renamed} renamed, {result.copied} copied across volumes in {result.elapsed:.3f}s with {workers} worker(s) "
+               f"({result.items_per_sec:.1f} items/s, {result.bytes_per_sec / 1048576:.1f} MiB/s)")
+    if total_moves_planned and not errors_encountered and actual_moves_logged:
+        log_action(f"Organization successful for {actual_moves_logged} item(s).")
+    elif errors_encountered:
+        log_action("Organization completed with errors.")
+    elif result.cancelled:
+        log_action("Organization cancelled; the moves made so far can be undone.")
+    log_event(op, "execute.end", history_id=result.operation_id, moved=actual_moves_logged, renamed=result.renamed, copied=result.copied,
+              bytes=result.bytes_moved, issues=len(result.issues), cancelled=result.cancelled, seconds=round(result.elapsed, 6))
+    result.metrics = metrics_end(run, planned=result.planned, moved=actual_moves_logged, renamed=result.renamed, copied=result.copied,
+                                 bytes=result.bytes_moved, workers=workers, issues=len(result.issues))
+    flush_log()
+    return result
+
+
+def undo_moves(undo_file=None, operation_id=None, progress=None, cancel=None, workers=None):
+    """
+    Undo the last plugin organization by replaying the undo journal in reverse.
+    Works for runs that stopped halfway or crashed: moves whose completion was
+    never confirmed are only reverted if they evidently happened. With
+    operation_id, any earlier operation is undone from the undo history instead.
+    progress/cancel work as for execute_moves; a cancelled undo keeps its undo
+    file, so running undo again reverts the rest. Same-volume items are renamed
+    back by up to workers threads (default MOVE_WORKERS); result.items tells
+    what happened to each recorded move.
+    Raises UndoUnavailableError if there is no readable undo file; returns an UndoResult.
+    """
+    op = new_operation("undo")
+    log_event(op, "undo.begin", undo_file=undo_file, undoes=operation_id)
+    run = metrics_begin("undo"); mark = metrics_mark(run)
+    try:
+        if operation_id is not None: result = _undo_operation(op, operation_id, undo_file, progress, cancel, workers)
+        else: result = _undo_journal(op, undo_file, progress, cancel, workers)
+    except UndoUnavailableError as e:
+        log_event(op, "undo.end", error="unavailable", message=str(e)); flush_log()
+        raise
+    result.event_op = op
+    metrics_phase(run, "undo", mark, result.attempted)
+    result.metrics = metrics_end(run, attempted=result.attempted, reverted=result.reverted, removed_folders=result.removed_folders, issues=len(result.issues))
+    log_event(op, "undo.end", attempted=result.attempted, reverted=result.reverted, issues=len(result.issues),
+              removed_folders=result.removed_folders, cancelled=result.cancelled)
+    flush_log()
+    return result
+
+def _undo_journal(op, undo_file=None, progress=None, cancel=None, workers=None):
+    """Undo the run recorded in the undo journal, most recent move first."""
+    if undo_file is None:
+        undo_file = UNDO_FILE
+        if not os.path.exists(undo_file) and os.path.exists(LEGACY_UNDO_FILE): undo_file = LEGACY_UNDO_FILE
+    log_action("Undo operation initiated by user.")
+    if not os.path.exists(undo_file):
+        log_action(f"Undo failed: {os.path.basename(undo_file)} not found."); flush_log()
+        raise UndoUnavailableError(f"No undo information found ({os.path.basename(undo_file)} missing). Cannot undo.")
+
+    try:
+        journal = read_journal(undo_file)
+    except Exception as e:
+         log_action(f"Undo Error: Failed reading/parsing {undo_file}: {e}"); flush_log()
+         raise UndoUnavailableError(f"Could not read or parse undo file {undo_file}:\n{e}") from e
+
+    result = UndoResult()
+    log_event(op, "undo.journal", path=undo_file, entries=len(journal.entries), complete=journal.complete, undoes=journal.header.get("operation_id"))
+    if journal.skipped_lines: log_action(f"Undo: ignored {journal.skipped_lines} unreadable line(s) in {undo_file} (interrupted write).")
+    if not journal.complete: log_action(f"Undo: {os.path.basename(undo_file)} has no end record; the run was interrupted. Reverting what was applied.")
+    if not journal.entries:
+        log_action(f"Undo: {os.path.basename(undo_file)} was empty.")
+        try:
+            if os.path.exists(undo_file): os.remove(undo_file); log_action(f"Removed empty undo file: {undo_file}")
+        except OSError as e: log_action(f"Could not remove empty undo file {undo_file}: {e}")
+        flush_log()
+        return result
+
+    reverted = _revert_entries(op, journal.entries[::-1], len(journal.entries), result, progress, cancel, workers) # Most recent move first
+    if journal.header.get("operation_id") is not None: _mark_history_reverted(journal.header["operation_id"], reverted, result)
+
+    # --- Remove Undo File ---
+    errors = result.issues
+    if result.cancelled:
+        log_action("Undo file preserved because the undo was cancelled."); result.undo_file_kept = True
+    elif result.attempted and not result.reverted: # E.g. every item missing where the journal says: nothing was undone, keep the record
+        log_action("Undo file preserved because none of its items could be reverted."); result.undo_file_kept = True
+    elif not errors and os.path.exists(undo_file):
+        try:
+            os.remove(undo_file); log_action("Undo file removed after successful undo operation.")
+        except OSError as e:
+            log_action(f"Error removing undo file {undo_file}: {e}"); result.undo_file_error = str(e)
+    elif errors:
+        log_action("Undo file preserved due to errors during undo process."); result.undo_file_kept = True
+    flush_log()
+    return result
+
+def _mark_history_reverted(operation_id, reverted, result):
+    try:
+        history = undo_history()
+        if history is not None: history.mark_reverted(operation_id, reverted)
+    except Exception as e: log_action(f"Warning: could not update operation #{operation_id} in undo history: {e}")
+
+def _undo_operation(op, operation_id, undo_file=None, progress=None, cancel=None, workers=None):
+    """Undo one operation from the undo history, streaming its moves newest first."""
+    log_action(f"Undo of operation #{operation_id} initiated by user.")
+    try:
+        history = undo_history()
+        operation = history.operation(operation_id) if history is not None else None
+    except Exception as e:
+        log_action(f"Undo Error: Failed reading undo history {HISTORY_FILE}: {e}"); flush_log()
+        raise UndoUnavailableError(f"Could not read the undo history {HISTORY_FILE}:\n{e}") from e
+    if operation is None:
+        log_action(f"Undo failed: operation #{operation_id} not found in undo history."); flush_log()
+        raise UndoUnavailableError(f"No operation #{operation_id} in the undo history. Cannot undo.")
+    if operation["state"] == "undone":
+        log_action(f"Undo failed: operation #{operation_id} was already undone."); flush_log()
+        raise UndoUnavailableError(f"Operation #{operation_id} was already undone.")
+    if operation["state"] == "running":
+        log_action(f"Undo failed: operation #{operation_id} never finished."); flush_log()
+        raise UndoUnavailableError(f"Operation #{operation_id} was interrupted before it was recorded. Undo it from its undo file instead.")
+
+    result = UndoResult()
+    entries = (JournalEntry(destination, source, True) for source, destination in history.iter_moves(operation_id))
+    reverted = _revert_entries(op, entries, operation["moved"], result, progress, cancel, workers)
+    _mark_history_reverted(operation_id, reverted, result)
+
+    # The undo file of this same run must not be replayed a second time
+    undo_file = undo_file or UNDO_FILE
+    if result.ok and (result.reverted or not result.attempted) and os.path.exists(undo_file):
+        try:
+            if read_journal(undo_file).header.get("operation_id") == operation_id:
+                os.remove(undo_file); log_action(f"Undo file {undo_file} belonged to operation #{operation_id}; removed.")
+        except (OSError, ValueError) as e: log_action(f"Could not check undo file {undo_file}: {e}")
+    flush_log()
+    return result
+
+
+def _revert_entries(op, entries, count, result, progress=None, cancel=None, workers=None):
+    """
+    Move items back for entries (JournalEntry, most recent first) and remove emptied folders. Returns the reverted destinations.
+
+    Entries are checked UNDO_BATCH at a time against one listing per folder
+    involved (kept current as items move back), never per-item exists calls.
+    Same-volume items are renamed back by a thread pool, others moved in this
+    thread. An item whose original location is taken is still skipped. An
+    entry that touches a path of an earlier entry in the same batch starts a
+    new batch, so dependent moves keep their journal order. Emptied folders
+    are removed deepest first from the listing counts, without listing again.
+    """
+    from organizer_preflight import CASE_INSENSITIVE
+    fs = FILESYSTEM
+    workers = max(1, workers or MOVE_WORKERS)
+    errors = result.issues; items = result.items; reverted = []
+    lock = threading.Lock()
+    listings = {} # Folder -> {name key: is_dir} of what is in it now; None if it could not be listed
+    missing_folders = set()
+    devices = {}
+    name_key = str.lower if CASE_INSENSITIVE else str # Existence checks ignore case where the filesystem does
+    log_action(f"Attempting to undo {count} item moves.")
+    flush_log() # Guaranteed on disk before anything is moved back
+
+    def listing(folder):
+        if folder not in listings:
+            try:
+                with fs.scandir(folder) as it: listings[folder] = {name_key(e.name): e.is_dir() for e in it}
+            except (FileNotFoundError, NotADirectoryError): listings[folder] = {}; missing_folders.add(folder)
+            except OSError: listings[folder] = None # Unlistable: checked item by item
+        return listings[folder]
+    def lookup(path): # True/False for a directory/file at path, None if nothing is there
+        names = listing(os.path.dirname(path))
+        if names is None: return fs.isdir(path) if fs.lexists(path) else None
+        return names.get(name_key(os.path.basename(path)))
+    def gone(path):
+        names = listings.get(os.path.dirname(path))
+        if names is not None: names.pop(name_key(os.path.basename(path)), None)
+    def device(folder):
+        if folder not in devices:
+            try: devices[folder] = fs.stat(folder).st_dev
+            except OSError: devices[folder] = None
+        return devices[folder]
+    def report(new_location, original_location, status, message=None):
+        item = UndoItem(new_location, original_location, status, message)
+        with lock:
+            items.append(item)
+            if message is not None and status != "missing": errors.append(message)
+        if message is not None and status != "missing": log_event(op, "issue", src=new_location, dst=original_location, message=message)
+
+    def revert(new_location, original_location, is_dir, rename):
+        item_type = "Folder" if is_dir else "File"
+        orig_dir = os.path.dirname(original_location)
+        log_action(f"Reverting {item_type}: '{os.path.basename(new_location)}' -> '{os.path.basename(original_location)}' in '{os.path.basename(orig_dir)}'")
+        try:
+            if rename:
+                try: fs.rename(new_location, original_location)
+                except OSError as e:
+                    if not _is_cross_device_error(e): raise
+                    fs.move(new_location, original_location)
+            else: fs.move(new_location, original_location)
+        except PermissionError as e:
+            log_action(f"Undo PermissionError: Permission denied reverting {item_type} '{os.path.basename(new_location)}': {e}")
+            report(new_location, original_location, "permission", f"{os.path.basename(new_location)} -> Permission Denied")
+            return
+        except Exception as e:
+            log_action(f"Undo Error: Error undoing move for {item_type} '{os.path.basename(new_location)}': {e}")
+            report(new_location, original_location, "error", f"{os.path.basename(new_location)} -> {e}")
+            return
+        with lock:
+            reverted.append(new_location); result.reverted += 1
+            gone(new_location)
+            names = listings.get(orig_dir)
+            if names is not None: names[name_key(os.path.basename(original_location))] = is_dir
+            items.append(UndoItem(new_location, original_location, "reverted"))
+        log_event(op, "revert", src=new_location, dst=original_location)
+
+    def not_run(count): # Checked, then left alone because of a cancel
+        with lock: result.attempted -= count
+    jobs = queue.Queue(); threads = []
+    def worker():
+        while True:
+            job = jobs.get()
+            try:
+                if job is None: return
+                if cancel is not None and cancel.is_set(): not_run(1)
+                else: revert(*job); reporter.step()
+            finally: jobs.task_done()
+
+    def check(entry):
+        """The revert job for entry, or None if it is handled (skipped, missing, never moved)."""
+        new_location, original_location = entry.destination, entry.source
+        is_dir = lookup(new_location)
+        if not entry.confirmed and entry.copied and is_dir is not None:
+            # A cross-volume copy was complete and in place; deleting the source was interrupted. Finish that, then revert.
+            if fs.isdir(original_location) and not fs.islink(original_location): fs.rmtree(original_location)
+            elif fs.lexists(original_location): fs.remove(original_location)
+            gone(original_location)
+        elif not entry.confirmed and (is_dir is None or lookup(original_location) is not None):
+            # Interrupted between journaling and finishing this move: it did not happen
+            if fs.discard_partial(new_location): log_action(f"Undo: removed the partial copy of '{os.path.basename(original_location)}' left by an interrupted move.")
+            else: log_trace(f"Undo: move of '{os.path.basename(original_location)}' was never completed. Nothing to revert.")
+            items.append(UndoItem(new_location, original_location, "not_moved"))
+            return None
+        result.attempted += 1
+        if is_dir is None:
+            log_action(f"Undo Warning: Item not found at expected location '{new_location}'. Skipping revert for this item.")
+            report(new_location, original_location, "missing", f"{os.path.basename(new_location)} -> Not found")
+            return None
+        orig_dir = os.path.dirname(original_location)
+        if lookup(original_location) is not None:
+            item_type = "Folder" if is_dir else "File"
+            log_action(f"Undo Warning: Target location '{original_location}' already exists. Skipping revert for {item_type} '{os.path.basename(new_location)}' to avoid data loss.")
+            report(new_location, original_location, "exists", f"{os.path.basename(new_location)} -> Skipped (Target Exists)")
+            return None
+        if orig_dir in missing_folders: # E.g. a plugin folder a flatten removed: recreate it
+            try:
+                fs.makedirs(orig_dir, exist_ok=True)
+                log_action(f"Undo: recreated missing original folder '{orig_dir}' for '{os.path.basename(original_location)}'.")
+                missing_folders.discard(orig_dir); listings[orig_dir] = {}
+                names = listings.get(os.path.dirname(orig_dir))
+                if names is not None: names[name_key(os.path.basename(orig_dir))] = True
+            except OSError as e:
+                log_action(f"Warning: Original parent directory '{orig_dir}' not found during undo for '{os.path.basename(original_location)}' and could not be created ({e}). Attempting move anyway.")
+        new_dev = device(os.path.dirname(new_location))
+        return (new_location, original_location, is_dir, new_dev is not None and new_dev == device(orig_dir))
+
+    def run_batch(batch):
+        """Rename the same-volume items in the pool while the others are moved here; wait for both."""
+        if workers == 1 or len(batch) <= 1:
+            for index, job in enumerate(batch):
+                if cancel is not None and cancel.is_set(): not_run(len(batch) - index); return
+                revert(*job); reporter.step()
+            return
+        if not threads:
+            threads.extend(threading.Thread(target=worker, name=f"undo-{i}", daemon=True) for i in range(workers))
+            for t in threads: t.start()
+        for job in batch:
+            if job[3]: jobs.put(job)
+        local = [job for job in batch if not job[3]]
+        for index, job in enumerate(local):
+            if cancel is not None and cancel.is_set(): not_run(len(local) - index); break
+            revert(*job); reporter.step()
+        jobs.join()
+
+    reporter = _ProgressReporter(progress, "undo", count)
+    batch = []; claimed = set(); parents = set()
+    try:
+        for entry in entries:
+            if cancel is not None and cancel.is_set(): break
+            new_location, original_location = entry.destination, entry.source
+            paths = (new_location, original_location); folders = (os.path.dirname(new_location), os.path.dirname(original_location))
+            if batch and (len(batch) >= UNDO_BATCH or any(p in claimed or p in parents for p in paths) or any(f in claimed for f in folders)):
+                run_batch(batch); batch = []; claimed.clear(); parents.clear() # Listings are current again for the next checks
+            try: job = check(entry)
+            except Exception as e:
+                result.attempted += 1
+                log_action(f"Undo Error: Error undoing move for Item '{os.path.basename(new_location)}': {e}")
+                report(new_location, original_location, "error", f"{os.path.basename(new_location)} -> {e}"); job = None
+            if job is None: reporter.step(); continue
+            batch.append(job); claimed.update(paths); parents.update(folders)
+        if batch: run_batch(batch)
+    finally:
+        for _ in threads: jobs.put(None)
+        for t in threads: t.join()
+    if cancel is not None and cancel.is_set():
+        result.cancelled = True; log_action(f"Undo cancelled by user after {result.reverted} item(s) were reverted.")
+    reporter.finish()
+
+    # --- Remove emptied folders: deepest first, from the listing counts ---
+    removed_folders_count = 0
+    folders_to_potentially_remove = {os.path.dirname(path) for path in reverted} # The folders the tool created, e.g. "Element"
+    log_action(f"Attempting removal of {len(folders_to_potentially_remove)} potentially empty created folders.")
+    for folder_path in sorted(folders_to_potentially_remove, key=lambda x: x.count(os.sep), reverse=True):
+        names = listings.get(folder_path)
+        try:
+            if names is None and fs.listdir(folder_path): names = True # Not listed: check the old way
+            if names:
+                log_action(f"Undo Info: Created folder '{folder_path}' was not empty after revert attempts. Did not remove.")
+                continue
+            fs.rmdir(folder_path); log_action(f"Removed empty created folder: {folder_path}"); removed_folders_count += 1
+            gone(folder_path) # Its parent may be emptied in turn
+        except OSError as e:
+            if e.errno in (errno.ENOTEMPTY, errno.EEXIST): log_action(f"Undo Info: Created folder '{folder_path}' was not empty after revert attempts. Did not remove.")
+            else: log_action(f"Undo Warning: Could not remove folder '{folder_path}': {e}")
+    result.removed_folders = removed_folders_count
+
+    success_count = result.reverted
+    if errors:
+        log_action(f"Undo completed with {len(errors)} errors/warnings. {success_count} items reverted. {removed_folders_count} folders removed.")
+    elif success_count > 0:
+        log_action(f"Undo successful: {success_count} items reverted, {removed_folders_count} folders removed.")
+    else:
+         log_action("Undo complete: No items required reverting or items were missing.")
+    return reverted
+
+
+def find_ae_plugin_dirs():
+    """Return the 'Support Files\\Plug-ins' folders of installed After Effects versions, newest first."""
+    program_files = os.environ.get('ProgramFiles', 'C:\\Program Files')
+    potential_ae_path = os.path.join(program_files, 'Adobe')
+    found = []
+    if not os.path.isdir(potential_ae_path): return found
+    try:
+        ae_folders = [d for d in os.listdir(potential_ae_path) if 'Adobe After Effects' in d and os.path.isdir(os.path.join(potential_ae_path, d))]
+        for ae_folder in sorted(ae_folders, reverse=True):
+            plugins_path = os.path.join(potential_ae_path, ae_folder, 'Support Files', 'Plug-ins')
+            if os.path.isdir(plugins_path): found.append(plugins_path)
+    except Exception as e:
+        log_action(f"Minor error guessing AE plugin path: {e}")
+    return found
@@ -0,0 +1,298 @@
+"""
+Duplicate and stale plugin detection.
+
+find_duplicates looks at the files of a Plug-ins tree (the root and, by
+default, one level of folders below it, where plugins and their files live)
+and finds the same content under different names:
+
+  1. Files are grouped by size. A file no other file shares its size with
+     cannot have a duplicate and is never read.
+  2. Files in a size collision are hashed (SHA-256) by a thread pool, unless
+     the fingerprint cache already knows them. FINGERPRINT_FILE maps path,
+     size and mtime to the digest, so a later run only hashes new or changed
+     files.
+  3. Files with the same digest form a DuplicateGroup. One copy is kept: a
+     name without a copy or version marker first, then a copy inside a
+     plugin folder (one holding an .aex named in the folder's name, as the
+     organizer makes them) or next to the .aex it belongs to, then the
+     shallowest, shortest path. The others are removal candidates.
+
+Stale plugins are .aex files whose names only differ by such a marker
+('Element 2.aex', 'Element_v1.3.aex', 'Element - Copy.aex', 'Element (1).aex')
+but whose content differs; all but the newest are candidates.
+
+Nothing is deleted: DuplicateReport.plan() moves the candidates into a
+'_Duplicates' folder in the root as a PlanResult, for the preview and
+execute_moves, so they are undone like any organization.
+"""
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import concurrent.futures
+
+import organizer_core as core
+from organizer_core import log_action, log_trace, flush_log
+from organizer_transfer import STAGING_SUFFIX
+
+FINGERPRINT_FILE = os.path.join(core.SCRIPT_DIR, "fingerprints.sqlite3") # None disables the cache
+QUARANTINE_FOLDER = "_Duplicates"
+HASH_WORKERS = 4
+HASH_CHUNK = 1024 * 1024
+RACY_SECONDS = 2.0 # Files modified this close to hashing are not cached (coarse timestamps)
+_MARKER = re.compile(r"(?:\s*-\s*copy(?:\s*\(\d+\))?|\s*\(\d+\)|(?:[\s_.-]+v?|v)\d+(?:[._]\d+)*)$") # Copy/version marker at the end of a name
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    path_key TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest   TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+def base_name(name):
+    """name without its extension and any trailing copy/version markers, lowercase: 'Element_v2 - Copy.aex' -> 'element'."""
+    stem = os.path.splitext(os.path.basename(name))[0].lower()
+    while True:
+        stripped = _MARKER.sub("", stem)
+        if stripped == stem or not stripped: return stem
+        stem = stripped
+
+
+class FingerprintCache:
+    """Digests by (path, size, mtime) in an SQLite file; each call uses its own short-lived connection."""
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL"); conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def lookup(self, files):
+        """{path: digest} for the DuplicateFiles whose size and mtime are unchanged since they were hashed."""
+        found = {}
+        by_key = {_key(f.path): f for f in files}
+        keys = list(by_key)
+        conn = self._connect()
+        try:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(f"SELECT path_key, size, mtime_ns, digest FROM fingerprints WHERE path_key IN ({','.join('?' * len(chunk))})", chunk)
+                for path_key, size, mtime_ns, digest in rows:
+                    f = by_key[path_key]
+                    if f.size == size and f.mtime_ns == mtime_ns: found[f.path] = digest
+        finally: conn.close()
+        return found
+
+    def store(self, files, root=None, depth=None, present=()):
+        """Remember the digests of files; with root, also drop entries up to depth levels below root whose key is not in present."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO fingerprints (path_key, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                                 [(_key(f.path), f.size, f.mtime_ns, f.digest) for f in files])
+                if root is not None:
+                    low = os.path.join(_key(root), ""); high = low[:-1] + chr(ord(low[-1]) + 1) # Every key below root
+                    stale = [(k,) for (k,) in conn.execute("SELECT path_key FROM fingerprints WHERE path_key >= ? AND path_key < ?", (low, high))
+                             if k not in present and (depth is None or k.count(os.sep, len(low)) <= depth)]
+                    conn.executemany("DELETE FROM fingerprints WHERE path_key = ?", stale)
+        finally: conn.close()
+
+
+class DuplicateFile:
+    __slots__ = ("path", "size", "mtime_ns", "digest")
+
+    def __init__(self, path, size, mtime_ns, digest=None):
+        self.path = path; self.size = size; self.mtime_ns = mtime_ns; self.digest = digest
+
+    def as_dict(self):
+        return {"path": self.path, "size": self.size, "mtime": self.mtime_ns / 1e9, "digest": self.digest}
+
+
+class DuplicateGroup:
+    """Files with the same content (kind 'duplicate') or versions of one plugin (kind 'stale'); keep is the one to leave in place."""
+    __slots__ = ("kind", "keep", "candidates")
+
+    def __init__(self, kind, keep, candidates):
+        self.kind = kind; self.keep = keep; self.candidates = candidates
+
+    @property
+    def wasted_bytes(self): return sum(f.size for f in self.candidates)
+
+    def as_dict(self):
+        return {"kind": self.kind, "keep": self.keep.as_dict(), "candidates": [f.as_dict() for f in self.candidates]}
+
+
+class DuplicateReport:
+    """Outcome of find_duplicates."""
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = 0      # Files looked at
+        self.hashed = 0     # Files read and hashed in this run
+        self.cached = 0     # Files whose digest came from the fingerprint cache
+        self.groups = []    # [DuplicateGroup, ...] duplicates first, largest waste first
+        self.elapsed = 0.0
+
+    @property
+    def duplicates(self): return [g for g in self.groups if g.kind == "duplicate"]
+    @property
+    def stale(self): return [g for g in self.groups if g.kind == "stale"]
+
+    def candidates(self, include_stale=False):
+        return [f for g in self.groups if g.kind == "duplicate" or include_stale for f in g.candidates]
+
+    def plan(self, include_stale=False):
+        """A PlanResult moving every candidate into QUARANTINE_FOLDER (names made unique), for preview_moves/execute_moves."""
+        folder_path = os.path.join(self.directory, QUARANTINE_FOLDER)
+        try: taken = {n.lower() for n in os.listdir(folder_path)}
+        except OSError: taken = set()
+        moves = []
+        for f in self.candidates(include_stale):
+            stem, ext = os.path.splitext(os.path.basename(f.path)); name = stem + ext; n = 1
+            while name.lower() in taken: n += 1; name = f"{stem} ({n}){ext}"
+            taken.add(name.lower())
+            moves.append((f.path, os.path.join(folder_path, name)))
+        return core.PlanResult(self.directory, "", "", moves)
+
+
+def _walk(directory, depth, skip):
+    """(DuplicateFile, (st_dev, st_ino)) for the regular files below directory, at most depth folder levels down (None: all)."""
+    pending = [(directory, 0)]
+    while pending:
+        folder, level = pending.pop()
+        try: it = os.scandir(folder)
+        except OSError as e:
+            if folder == directory: raise # Only an unreadable root fails the search
+            log_action(f"Duplicates: skipping folder '{folder}': {e}"); continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if (depth is None or level < depth) and entry.name not in skip: pending.append((entry.path, level + 1))
+                    elif entry.is_file(follow_symlinks=False) and not entry.name.endswith(STAGING_SUFFIX):
+                        st = entry.stat(follow_symlinks=False)
+                        yield DuplicateFile(entry.path, st.st_size, st.st_mtime_ns), (st.st_dev, st.st_ino)
+                except OSError as e: log_action(f"Duplicates: skipping '{entry.path}': {e}")
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""): digest.update(chunk)
+    return digest.hexdigest()
+
+def _placement(path, directory, aex_bases):
+    """0 inside a plugin folder below directory, 1 next to an .aex the name starts with, 2 anywhere else; aex_bases maps folders to their .aex base names."""
+    folder = os.path.dirname(path); bases = aex_bases.get(folder, ())
+    if not bases: return 2
+    folder_name = os.path.basename(folder).lower()
+    if os.path.normpath(folder) != os.path.normpath(directory) and any(b in folder_name for b in bases): return 0
+    name = os.path.basename(path).lower()
+    if not name.endswith(".aex") and any(name.startswith(b) for b in bases): return 1
+    return 2
+
+def _keep_order(f, placement=2):
+    """Sort key: the file to keep first (no copy/version marker, best placement, shallowest, shortest path)."""
+    return (base_name(f.path) != os.path.splitext(os.path.basename(f.path))[0].lower(), placement, f.path.count(os.sep), len(f.path), f.path)
+
+
+def find_duplicates(directory, depth=1, workers=None, use_cache=True, progress=None, cancel=None):
+    """
+    Find duplicate and stale files below directory (see the module docstring).
+    depth is how many folder levels below the root are searched (None: all).
+    progress is called with Progress events ('hash' phase); setting the cancel
+    Event raises OperationCancelled. Returns a DuplicateReport.
+    """
+    if not os.path.isdir(directory): raise core.InvalidDirectoryError(f"Directory not found or invalid:\n{directory}")
+    report = DuplicateReport(directory)
+    op = core.new_operation("duplicates")
+    core.log_event(op, "duplicates.begin", root=directory, depth=depth)
+    log_action(f"Looking for duplicate files in '{directory}' ({'all levels' if depth is None else f'{depth} folder level(s) deep'}).")
+    run = core.metrics_begin("duplicates"); mark = core.metrics_mark(run)
+    started = time.perf_counter()
+
+    # --- Sizes: only files that share theirs with another file can be duplicates ---
+    by_size = {}; inodes = set(); aex_bases = {} # Folder -> base names of the .aex files in it
+    try:
+        for f, inode in _walk(directory, depth, {QUARANTINE_FOLDER}):
+            if cancel is not None and cancel.is_set(): raise core.OperationCancelled("Duplicate search was cancelled.")
+            report.files += 1
+            if f.path.lower().endswith(".aex"): aex_bases.setdefault(os.path.dirname(f.path), set()).add(base_name(f.path))
+            if not f.size: continue # Empty files are all alike
+            if inode[1] and inode in inodes: continue # Another name of a file already seen (hard link)
+            inodes.add(inode)
+            by_size.setdefault(f.size, []).append(f)
+    except PermissionError as e: raise core.ScanPermissionError(f"Permission denied scanning directory:\n{directory}\n{e}") from e
+    except OSError as e: raise core.ScanError(f"Could not scan directory {directory}:\n{e}") from e
+    colliding = [f for files in by_size.values() if len(files) > 1 for f in files]
+    core.metrics_phase(run, "scan", mark, report.files); mark = core.metrics_mark(run)
+    log_action(f"Duplicates: {report.files} file(s), {len(colliding)} share a size with another file.")
+
+    # --- Digests: from the cache, else hashed in parallel ---
+    cache = FingerprintCache(FINGERPRINT_FILE) if use_cache and FINGERPRINT_FILE else None
+    if cache is not None and colliding:
+        try: known = cache.lookup(colliding)
+        except sqlite3.Error as e: log_action(f"Warning: could not read fingerprint cache {FINGERPRINT_FILE}: {e}"); known = {}
+        for f in colliding: f.digest = known.get(f.path)
+        report.cached = len(known)
+    to_hash = [f for f in colliding if f.digest is None]
+    reporter = core._ProgressReporter(progress, "hash", len(to_hash))
+    def hash_one(f):
+        if cancel is not None and cancel.is_set(): return
+        try: f.digest = _sha256(f.path)
+        except OSError as e: log_action(f"Duplicates: could not read '{f.path}': {e}")
+        reporter.step(1, f.size)
+    if to_hash:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers or HASH_WORKERS)) as pool:
+            for _ in pool.map(hash_one, to_hash): pass
+    reporter.finish()
+    if cancel is not None and cancel.is_set(): raise core.OperationCancelled("Duplicate search was cancelled.")
+    hashed = [f for f in to_hash if f.digest is not None]
+    report.hashed = len(hashed)
+    core.metrics_phase(run, "hash", mark, len(to_hash)); mark = core.metrics_mark(run)
+    if cache is not None:
+        now_ns = time.time_ns(); racy_ns = int(RACY_SECONDS * 1e9)
+        try: cache.store([f for f in hashed if f.mtime_ns < now_ns - racy_ns], directory, depth, {_key(f.path) for files in by_size.values() for f in files})
+        except sqlite3.Error as e: log_action(f"Warning: could not update fingerprint cache {FINGERPRINT_FILE}: {e}")
+
+    # --- Groups ---
+    keep_order = lambda f: _keep_order(f, _placement(f.path, directory, aex_bases))
+    by_digest = {}
+    for f in colliding:
+        if f.digest is not None: by_digest.setdefault(f.digest, []).append(f)
+    duplicate_of = {} # Candidate path -> the kept file
+    for files in by_digest.values():
+        if len(files) < 2: continue
+        files.sort(key=keep_order)
+        report.groups.append(DuplicateGroup("duplicate", files[0], files[1:]))
+        for f in files[1:]: duplicate_of[f.path] = files[0]
+    versions = {} # Plugin base -> one .aex per distinct content
+    for files in by_size.values():
+        for f in files:
+            if f.path.lower().endswith(".aex") and f.path not in duplicate_of:
+                versions.setdefault(base_name(f.path), []).append(f)
+    for files in versions.values():
+        if len(files) < 2: continue
+        files.sort(key=lambda f: (-f.mtime_ns, keep_order(f)))
+        report.groups.append(DuplicateGroup("stale", files[0], files[1:]))
+    report.groups.sort(key=lambda g: (g.kind != "duplicate", -g.wasted_bytes, g.keep.path))
+    for g in report.groups:
+        for f in g.candidates: log_trace(f"Duplicates: {g.kind} '{f.path}' (keep '{g.keep.path}')")
+    core.metrics_phase(run, "group", mark, len(colliding))
+
+    report.elapsed = time.perf_counter() - started
+    wasted = sum(g.wasted_bytes for g in report.duplicates)
+    log_action(f"Duplicates: {len(report.duplicates)} group(s) of identical files ({wasted / 1048576:.1f} MiB in extra copies), "
+               f"{len(report.stale)} plugin(s) with older versions; {report.hashed} file(s) hashed, {report.cached} from the cache, in {report.elapsed:.3f}s.")
+    core.log_event(op, "duplicates.end", files=report.files, hashed=report.hashed, cached=report.cached,
+                   duplicates=len(report.duplicates), stale=len(report.stale), wasted=wasted, seconds=round(report.elapsed, 6))
+    core.metrics_end(run, files=report.files, hashed=report.hashed, cached=report.cached, groups=len(report.groups))
+    flush_log()
+    return report
@@ -0,0 +1,194 @@
+"""
+Structured operation log: one JSON record per event, next to the text log.
+
+    {"t": "2026-01-01T12:00:00", "op": "20260101T120000-1a2b-1", "ev": "execute.begin", "planned": 12, ...}
+
+Every plan, execute and undo gets an operation id; its records carry phases
+('plan.begin', 'move', 'execute.end', ...) and item counts. Records are
+buffered and appended to numbered segments (plugin_organizer.events.000001.jsonl).
+When a segment grows past max_bytes it is gzip-compressed in place and a new
+one is started; only the newest `keep` archives are kept.
+
+A sidecar index (plugin_organizer.events.idx, one JSON line per entry) maps
+operation ids, and the undo history id of executions, to the segment and byte
+offset of the operation's first record, so reading one operation is a seek,
+not a scan.
+"""
+import os
+import re
+import json
+import datetime
+import itertools
+import threading
+
+SEGMENT_RE = re.compile(r"\.(\d{6})\.jsonl(\.gz)?$")
+
+
+_ids = itertools.count(1)
+
+def new_operation_id():
+    """A new operation id, unique across processes and runs: time, pid, counter."""
+    return f"{datetime.datetime.now():%Y%m%dT%H%M%S}-{os.getpid():x}-{next(_ids)}"
+
+def _record(op, event, fields):
+    record = {"t": datetime.datetime.now().isoformat(timespec="milliseconds"), "op": op, "ev": event}
+    record.update(fields)
+    return record
+
+
+class EventLog:
+    def __init__(self, directory, name="plugin_organizer.events", max_bytes=4 * 1024 * 1024, keep=10, buffer_records=256):
+        self.directory = directory
+        self.name = name
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.buffer_records = buffer_records
+        self.index_path = os.path.join(directory, f"{name}.idx")
+        self._lock = threading.Lock()
+        self._buffer = []; self._pending = 0 # Encoded records not yet written, and their size
+        self._index_buffer = []
+        self._segment = None; self._size = 0  # Active segment number and size, found on first use
+
+    # --- Segments ---
+
+    def segment_path(self, segment, compressed=False):
+        return os.path.join(self.directory, f"{self.name}.{segment:06d}.jsonl" + (".gz" if compressed else ""))
+
+    def segments(self):
+        """[(number, path, compressed), ...] of existing segments, oldest first."""
+        found = []
+        try: names = os.listdir(self.directory)
+        except OSError: return found
+        for file_name in names:
+            if not file_name.startswith(self.name + "."): continue
+            match = SEGMENT_RE.search(file_name)
+            if match: found.append((int(match.group(1)), os.path.join(self.directory, file_name), bool(match.group(2))))
+        return sorted(found)
+
+    def _open_segment(self):
+        if self._segment is not None: return
+        existing = self.segments()
+        if existing and not existing[-1][2]: # Continue an uncompressed last segment
+            self._segment = existing[-1][0]; self._size = os.path.getsize(existing[-1][1])
+        else:
+            self._segment = existing[-1][0] + 1 if existing else 1; self._size = 0
+
+    # --- Writing ---
+
+    def new_operation(self, kind): return new_operation_id()
+
+    def emit(self, op, event, **fields):
+        self.write(_record(op, event, fields))
+
+    def write(self, record):
+        """Append a record made elsewhere (e.g. collected by an EventBuffer in a worker process)."""
+        op = record["op"]; event = record["ev"]
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+        with self._lock:
+            self._open_segment()
+            if event.endswith(".begin"):
+                self._index_buffer.append({"op": op, "kind": event[:-len(".begin")], "seg": self._segment, "off": self._size + self._pending})
+            if record.get("history_id") is not None: self._index_buffer.append({"op": op, "history_id": record["history_id"]})
+            self._buffer.append(data); self._pending += len(data)
+            if len(self._buffer) >= self.buffer_records: self._flush_locked()
+
+    def flush(self):
+        with self._lock: self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer: return
+        with open(self.segment_path(self._segment), "ab") as f: f.write(b"".join(self._buffer))
+        self._size += self._pending; self._buffer = []; self._pending = 0
+        if self._index_buffer:
+            with open(self.index_path, "a", encoding='utf-8') as f: f.write("".join(json.dumps(e) + "\n" for e in self._index_buffer))
+            self._index_buffer = []
+        if self._size >= self.max_bytes: self._rotate_locked()
+
+    def _rotate_locked(self):
+        import gzip, shutil
+        path = self.segment_path(self._segment)
+        with open(path, "rb") as src, gzip.open(self.segment_path(self._segment, compressed=True), "wb") as dst: shutil.copyfileobj(src, dst)
+        os.remove(path)
+        self._segment += 1; self._size = 0
+        archives = [s for s in self.segments() if s[2]]
+        if len(archives) > self.keep:
+            for _, old_path, _ in archives[:-self.keep]: os.remove(old_path)
+            oldest = archives[-self.keep][0]
+            entries = [e for e in self._read_index_lines() if e.get("seg", oldest) >= oldest]
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding='utf-8') as f: f.write("".join(json.dumps(e) + "\n" for e in entries))
+            os.replace(tmp_path, self.index_path)
+
+    # --- Reading ---
+
+    def _read_index_lines(self):
+        entries = []
+        try:
+            with open(self.index_path, "r", encoding='utf-8') as f:
+                for line in f:
+                    try: entries.append(json.loads(line))
+                    except ValueError: pass # Torn last line after a crash
+        except FileNotFoundError: pass
+        return entries
+
+    def index(self):
+        """op id -> {"kind", "seg", "off", "history_id"?}, oldest operation first."""
+        self.flush()
+        ops = {}
+        for entry in self._read_index_lines():
+            if "seg" in entry: ops[entry["op"]] = entry
+            elif entry["op"] in ops: ops[entry["op"]]["history_id"] = entry["history_id"]
+        return ops
+
+    def history_ids(self, index=None):
+        """Undo history id -> op id of the executions that have one, from one read of the index."""
+        return {entry["history_id"]: op for op, entry in (index if index is not None else self.index()).items() if "history_id" in entry}
+
+    def operation_for_history_id(self, history_id):
+        return self.history_ids().get(history_id)
+
+    def _open_for_reading(self, segment):
+        path = self.segment_path(segment)
+        if os.path.exists(path): return open(path, "rb")
+        if os.path.exists(self.segment_path(segment, compressed=True)):
+            import gzip
+            return gzip.open(self.segment_path(segment, compressed=True), "rb")
+        return None
+
+    def read_operation(self, op, index=None):
+        """The records of one operation, seeking straight to its first record. Empty if unknown or rotated away.
+        Pass index (from index()) when reading several operations, to read it only once."""
+        entry = (index if index is not None else self.index()).get(op)
+        if entry is None: return []
+        records = []; segment = entry["seg"]; offset = entry["off"]
+        last_segment = max([s[0] for s in self.segments()] or [segment])
+        while segment <= last_segment:
+            f = self._open_for_reading(segment)
+            if f is not None:
+                with f:
+                    f.seek(offset)
+                    for line in f:
+                        try: record = json.loads(line)
+                        except ValueError: continue
+                        if record.get("op") != op: continue # Other operations running at the same time
+                        records.append(record)
+                        if record["ev"].endswith(".end"): return records
+            segment += 1; offset = 0
+        return records
+
+
+class EventBuffer:
+    """Keeps records in memory; batch worker processes hand them to the parent's EventLog."""
+    def __init__(self): self.records = []
+    def new_operation(self, kind): return new_operation_id()
+    def emit(self, op, event, **fields): self.records.append(_record(op, event, fields))
+    def write(self, record): self.records.append(record)
+    def flush(self): pass
+
+
+class NullEventLog:
+    """Discards events."""
+    def new_operation(self, kind): return ""
+    def emit(self, op, event, **fields): pass
+    def write(self, record): pass
+    def flush(self): pass
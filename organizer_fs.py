@@ -0,0 +1,482 @@
+"""
+Filesystem backends for the organizer core.
+
+plan_moves, execute_moves, undo_moves and the preflight reach the Plug-ins
+tree only through organizer_core.FILESYSTEM, an object with this interface:
+
+    scandir(path)                 DirEntry-like objects (name, path, is_dir(), is_file(), stat())
+    listdir(path), stat(path), lstat(path)
+    exists, lexists, isdir, islink (path)
+    walk(top)                     as os.walk (top-down, symlinks not followed)
+    makedirs(path, exist_ok=False), mkdir(path), rmdir(path)
+    rename(src, dst), move(src, dst)   move as shutil.move: copies across volumes
+    copy(src, dst)                copy a file or folder tree (timestamps kept)
+    remove(path), rmtree(path)
+    access(path, mode), disk_usage(path)
+    create_file(path, size=0, mtime=None)
+    transfer(src, dst, checkpoint, verify, cancel), discard_partial(dst)   see organizer_transfer
+
+Three implementations:
+
+  RealFileSystem     os, os.path and shutil (the default)
+  MemoryFileSystem   a thread-safe tree in memory; files have a size and an
+                     mtime but no content. mount() makes a folder another
+                     volume (rename raises EXDEV across it, with its own free
+                     space); set_read_only() makes a folder refuse changes.
+  FaultyFileSystem   wraps another one, sleeps a configurable time in every
+                     call (time.sleep releases the GIL, like waiting on a
+                     network share), counts calls and raises injected errors
+                     for matching operations and paths.
+
+The organizer's own files (log, undo journal, undo history, snapshots) always
+stay on the real filesystem.
+
+    fs = organizer_fs.MemoryFileSystem()
+    fs.makedirs("/share/Plug-ins"); fs.create_file("/share/Plug-ins/Element.aex", 4096)
+    slow = organizer_fs.FaultyFileSystem(fs, latency=0.002, seed=1)
+    slow.fail("rename", "*Element*", errno.EACCES, count=1)
+    organizer_core.FILESYSTEM = slow
+"""
+import os
+import stat
+import time
+import errno
+import fnmatch
+import random
+import shutil
+import threading
+import collections
+
+import organizer_transfer
+from organizer_transfer import TransferResult, TransferCancelled, staging_path
+
+DiskUsage = collections.namedtuple("DiskUsage", "total used free")
+
+
+class FileSystem:
+    """Base class: the derived checks in terms of stat/lstat, and a generic copy-based transfer."""
+
+    def exists(self, path):
+        try: self.stat(path)
+        except (OSError, ValueError): return False
+        return True
+
+    def lexists(self, path):
+        try: self.lstat(path)
+        except (OSError, ValueError): return False
+        return True
+
+    def isdir(self, path):
+        try: return stat.S_ISDIR(self.stat(path).st_mode)
+        except (OSError, ValueError): return False
+
+    def islink(self, path):
+        try: return stat.S_ISLNK(self.lstat(path).st_mode)
+        except (OSError, ValueError): return False
+
+    def transfer(self, source, destination, checkpoint=None, verify="size", cancel=None):
+        """Copy source to a staging name, check its size, rename it into place and delete the source."""
+        if verify not in organizer_transfer.VERIFY_MODES: raise ValueError(f"verify must be one of {organizer_transfer.VERIFY_MODES}")
+        if cancel is not None and cancel.is_set(): raise TransferCancelled()
+        result = TransferResult(); result.method = "copy"
+        staging = staging_path(destination)
+        if self.lexists(staging): self.discard_partial(destination)
+        self.copy(source, staging)
+        copied = self._files(staging)
+        for rel, size in copied:
+            result.files += 1; result.bytes_copied += size
+            if checkpoint is not None: checkpoint(os.path.basename(source) if rel == os.curdir else rel, size)
+        if sorted(copied) != sorted(self._files(source)):
+            raise organizer_transfer.TransferError(errno.EIO, f"Copy of '{source}' does not match the source")
+        if self.lexists(destination): raise FileExistsError(errno.EEXIST, "Destination appeared during the transfer", destination)
+        self.rename(staging, destination)
+        if checkpoint is not None: checkpoint(None, result.nbytes)
+        if self.isdir(source) and not self.islink(source): self.rmtree(source)
+        else: self.remove(source)
+        return result
+
+    def discard_partial(self, destination):
+        path = staging_path(destination)
+        if self.isdir(path) and not self.islink(path): self.rmtree(path)
+        elif self.lexists(path): self.remove(path)
+        else: return False
+        return True
+
+    def _files(self, path):
+        """[(relative path, size), ...] of the files in the tree at path ([('.', size)] for a file)."""
+        if not self.isdir(path): return [(os.curdir, self.lstat(path).st_size)]
+        return [(os.path.relpath(os.path.join(parent, name), path), self.lstat(os.path.join(parent, name)).st_size)
+                for parent, _, files in self.walk(path) for name in files]
+
+    def walk(self, top):
+        if not self.isdir(top): return
+        pending = [top]
+        while pending:
+            parent = pending.pop()
+            dirs = []; files = []
+            with self.scandir(parent) as it:
+                for entry in it:
+                    (dirs if entry.is_dir(follow_symlinks=False) else files).append(entry.name)
+            yield parent, dirs, files
+            pending.extend(os.path.join(parent, d) for d in reversed(dirs))
+
+
+class RealFileSystem(FileSystem):
+    """The local filesystem through os, os.path and shutil."""
+    scandir = staticmethod(os.scandir)
+    listdir = staticmethod(os.listdir)
+    exists = staticmethod(os.path.exists)
+    lexists = staticmethod(os.path.lexists)
+    isdir = staticmethod(os.path.isdir)
+    islink = staticmethod(os.path.islink)
+    makedirs = staticmethod(os.makedirs)
+    mkdir = staticmethod(os.mkdir)
+    rmdir = staticmethod(os.rmdir)
+    rename = staticmethod(os.rename)
+    move = staticmethod(shutil.move)
+    remove = staticmethod(os.remove)
+    rmtree = staticmethod(shutil.rmtree)
+    walk = staticmethod(os.walk)
+    access = staticmethod(os.access)
+    disk_usage = staticmethod(shutil.disk_usage)
+    transfer = staticmethod(organizer_transfer.transfer)
+    discard_partial = staticmethod(organizer_transfer.discard_partial)
+
+    # os.stat/os.lstat are looked up per call: organizer_metrics.CallCounter replaces them while it counts
+    @staticmethod
+    def stat(path, **kwargs): return os.stat(path, **kwargs)
+
+    @staticmethod
+    def lstat(path, **kwargs): return os.lstat(path, **kwargs)
+
+    @staticmethod
+    def copy(source, destination):
+        if os.path.isdir(source) and not os.path.islink(source): shutil.copytree(source, destination, symlinks=True)
+        else: shutil.copy2(source, destination, follow_symlinks=False)
+
+    @staticmethod
+    def create_file(path, size=0, mtime=None):
+        with open(path, "wb") as f:
+            if size: f.truncate(size)
+        if mtime is not None: os.utime(path, (mtime, mtime))
+
+
+# --- In memory ---
+
+class _Node:
+    __slots__ = ("children", "size", "mtime_ns", "dev", "ino", "read_only")
+
+    def __init__(self, children, size, mtime_ns, dev, ino):
+        self.children = children # name -> _Node for folders, None for files
+        self.size = size; self.mtime_ns = mtime_ns; self.dev = dev; self.ino = ino
+        self.read_only = False
+
+class _Stat:
+    __slots__ = ("st_mode", "st_ino", "st_dev", "st_nlink", "st_size", "st_mtime", "st_mtime_ns", "st_atime", "st_ctime")
+
+    def __init__(self, node):
+        self.st_mode = (stat.S_IFDIR | 0o755) if node.children is not None else (stat.S_IFREG | 0o644)
+        self.st_ino = node.ino; self.st_dev = node.dev; self.st_nlink = 1
+        self.st_size = node.size; self.st_mtime_ns = node.mtime_ns
+        self.st_mtime = self.st_atime = self.st_ctime = node.mtime_ns / 1e9
+
+class _Entry:
+    """os.DirEntry stand-in for MemoryFileSystem.scandir."""
+    __slots__ = ("name", "path", "_node")
+
+    def __init__(self, name, path, node):
+        self.name = name; self.path = path; self._node = node
+
+    def is_dir(self, follow_symlinks=True): return self._node.children is not None
+    def is_file(self, follow_symlinks=True): return self._node.children is None
+    def is_symlink(self): return False
+    def inode(self): return self._node.ino
+    def stat(self, follow_symlinks=True): return _Stat(self._node)
+
+class _ScandirIterator:
+    def __init__(self, entries): self._it = iter(entries)
+    def __iter__(self): return self._it
+    def __next__(self): return next(self._it)
+    def __enter__(self): return self
+    def __exit__(self, *exc): self._it = iter(())
+    def close(self): self._it = iter(())
+
+
+class MemoryFileSystem(FileSystem):
+    """
+    A filesystem tree in memory with os-like errors (FileNotFoundError,
+    FileExistsError, EXDEV across mounts, ENOTEMPTY, PermissionError in
+    read-only folders). Paths are absolute paths in this platform's syntax.
+    """
+    def __init__(self, free=1 << 40):
+        self._lock = threading.RLock()
+        self._inodes = 0
+        self._roots = {}           # Path anchor ('/' or 'C:\\') -> folder node
+        self._free = {0: free}     # Device -> free bytes
+        self._capacity = {0: free}
+
+    def _new(self, children, size, dev, mtime_ns=None):
+        self._inodes += 1
+        return _Node(children, size, time.time_ns() if mtime_ns is None else mtime_ns, dev, self._inodes)
+
+    def _parts(self, path):
+        path = os.path.abspath(path)
+        drive, rest = os.path.splitdrive(path)
+        anchor = drive + os.sep
+        if anchor not in self._roots: self._roots[anchor] = self._new({}, 0, 0)
+        return self._roots[anchor], [p for p in rest.split(os.sep) if p]
+
+    def _lookup(self, path):
+        node, parts = self._parts(path)
+        for part in parts:
+            if node.children is None: raise NotADirectoryError(errno.ENOTDIR, "Not a directory", path)
+            node = node.children.get(part)
+            if node is None: raise FileNotFoundError(errno.ENOENT, "No such file or directory", path)
+        return node
+
+    def _parent(self, path, writing=True):
+        """(folder node, name) for path, whose parent must exist."""
+        parent = self._lookup(os.path.dirname(os.path.abspath(path)))
+        if parent.children is None: raise NotADirectoryError(errno.ENOTDIR, "Not a directory", path)
+        if writing and parent.read_only: raise PermissionError(errno.EACCES, "Permission denied", path)
+        return parent, os.path.basename(os.path.abspath(path))
+
+    def _tree_size(self, node):
+        if node.children is None: return node.size
+        return sum(self._tree_size(child) for child in node.children.values())
+
+    # --- Setting up ---
+
+    def mount(self, path, free=1 << 40):
+        """Make path (created if needed) the root of another volume with `free` bytes of space."""
+        with self._lock:
+            self.makedirs(path, exist_ok=True)
+            node = self._lookup(path)
+            dev = max(self._free) + 1
+            if node.children: raise OSError(errno.EBUSY, "Mount point is not empty", path)
+            node.dev = dev; self._free[dev] = self._capacity[dev] = free
+        return dev
+
+    def set_read_only(self, path, read_only=True):
+        """Refuse (or allow again) creating, renaming and removing entries in the folder at path."""
+        with self._lock: self._lookup(path).read_only = read_only
+
+    def create_file(self, path, size=0, mtime=None):
+        with self._lock:
+            parent, name = self._parent(path)
+            existing = parent.children.get(name)
+            if existing is not None and existing.children is not None: raise IsADirectoryError(errno.EISDIR, "Is a directory", path)
+            if size - (existing.size if existing is not None else 0) > self._free[parent.dev]: raise OSError(errno.ENOSPC, "No space left on device", path)
+            self._free[parent.dev] -= size - (existing.size if existing is not None else 0)
+            parent.children[name] = self._new(None, size, parent.dev, None if mtime is None else int(mtime * 1e9))
+            parent.mtime_ns = time.time_ns()
+
+    # --- Reading ---
+
+    def scandir(self, path):
+        with self._lock:
+            node = self._lookup(path)
+            if node.children is None: raise NotADirectoryError(errno.ENOTDIR, "Not a directory", path)
+            return _ScandirIterator([_Entry(name, os.path.join(path, name), child) for name, child in node.children.items()])
+
+    def listdir(self, path):
+        with self._lock:
+            node = self._lookup(path)
+            if node.children is None: raise NotADirectoryError(errno.ENOTDIR, "Not a directory", path)
+            return list(node.children)
+
+    def stat(self, path):
+        with self._lock: return _Stat(self._lookup(path))
+    lstat = stat # No symlinks
+
+    def access(self, path, mode):
+        with self._lock:
+            try: node = self._lookup(path)
+            except OSError: return False
+            return not (mode & os.W_OK and node.read_only)
+
+    def disk_usage(self, path):
+        with self._lock:
+            dev = self._lookup(path).dev
+            return DiskUsage(self._capacity[dev], self._capacity[dev] - self._free[dev], self._free[dev])
+
+    # --- Changing ---
+
+    def mkdir(self, path):
+        with self._lock:
+            parent, name = self._parent(path)
+            if name in parent.children: raise FileExistsError(errno.EEXIST, "File exists", path)
+            parent.children[name] = self._new({}, 0, parent.dev); parent.mtime_ns = time.time_ns()
+
+    def makedirs(self, path, exist_ok=False):
+        with self._lock:
+            path = os.path.abspath(path)
+            try: node = self._lookup(path)
+            except FileNotFoundError: node = None
+            if node is not None:
+                if exist_ok and node.children is not None: return
+                raise FileExistsError(errno.EEXIST, "File exists", path)
+            parent = os.path.dirname(path)
+            if parent != path: self.makedirs(parent, exist_ok=True)
+            self.mkdir(path)
+
+    def rmdir(self, path):
+        with self._lock:
+            parent, name = self._parent(path)
+            node = self._lookup(path)
+            if node.children is None: raise NotADirectoryError(errno.ENOTDIR, "Not a directory", path)
+            if node.children: raise OSError(errno.ENOTEMPTY, "Directory not empty", path)
+            del parent.children[name]; parent.mtime_ns = time.time_ns()
+
+    def remove(self, path):
+        with self._lock:
+            parent, name = self._parent(path)
+            node = self._lookup(path)
+            if node.children is not None: raise IsADirectoryError(errno.EISDIR, "Is a directory", path)
+            del parent.children[name]; parent.mtime_ns = time.time_ns()
+            self._free[node.dev] += node.size
+
+    def rmtree(self, path):
+        with self._lock:
+            parent, name = self._parent(path)
+            node = self._lookup(path)
+            if node.children is None: raise NotADirectoryError(errno.ENOTDIR, "Not a directory", path)
+            del parent.children[name]; parent.mtime_ns = time.time_ns()
+            self._free[node.dev] += self._tree_size(node)
+
+    def rename(self, source, destination):
+        with self._lock:
+            source = os.path.abspath(source); destination = os.path.abspath(destination)
+            src_parent, src_name = self._parent(source)
+            node = self._lookup(source)
+            dst_parent, dst_name = self._parent(destination)
+            if src_parent.dev != dst_parent.dev or (node.children is not None and node.dev != dst_parent.dev):
+                raise OSError(errno.EXDEV, "Invalid cross-device link", source)
+            if (destination + os.sep).startswith(source + os.sep) and destination != source:
+                raise OSError(errno.EINVAL, "Invalid argument", destination)
+            existing = dst_parent.children.get(dst_name)
+            if existing is not None and existing is not node:
+                if os.name == 'nt': raise FileExistsError(errno.EEXIST, "File exists", destination)
+                if existing.children is not None and node.children is None: raise IsADirectoryError(errno.EISDIR, "Is a directory", destination)
+                if existing.children is None and node.children is not None: raise NotADirectoryError(errno.ENOTDIR, "Not a directory", destination)
+                if existing.children: raise OSError(errno.ENOTEMPTY, "Directory not empty", destination)
+                self._free[existing.dev] += existing.size
+            del src_parent.children[src_name]
+            dst_parent.children[dst_name] = node
+            src_parent.mtime_ns = dst_parent.mtime_ns = time.time_ns()
+
+    def _copy_node(self, node, dev):
+        if node.children is None:
+            if node.size > self._free[dev]: raise OSError(errno.ENOSPC, "No space left on device")
+            self._free[dev] -= node.size
+            return self._new(None, node.size, dev, node.mtime_ns)
+        copied = self._new({}, 0, dev, node.mtime_ns)
+        for name, child in node.children.items(): copied.children[name] = self._copy_node(child, dev)
+        return copied
+
+    def copy(self, source, destination):
+        with self._lock:
+            node = self._lookup(source)
+            parent, name = self._parent(destination)
+            if name in parent.children: raise FileExistsError(errno.EEXIST, "File exists", destination)
+            parent.children[name] = self._copy_node(node, parent.dev); parent.mtime_ns = time.time_ns()
+
+    def move(self, source, destination):
+        """shutil.move: into destination if it is a folder; copy and delete across volumes."""
+        with self._lock:
+            if self.isdir(destination):
+                destination = os.path.join(destination, os.path.basename(source.rstrip(os.sep)))
+                if self.lexists(destination): raise shutil.Error(f"Destination path '{destination}' already exists")
+            try: self.rename(source, destination)
+            except OSError as e:
+                if e.errno != errno.EXDEV: raise
+                if self.lexists(destination) and not self.isdir(source): self.remove(destination)
+                self.copy(source, destination)
+                if self.isdir(source): self.rmtree(source)
+                else: self.remove(source)
+            return destination
+
+    # --- For tests and benchmarks ---
+
+    def tree(self, path):
+        """Sorted relative paths of everything below path (folders end with os.sep)."""
+        found = []
+        for parent, dirs, files in self.walk(path):
+            rel = os.path.relpath(parent, path)
+            found += [os.path.normpath(os.path.join(rel, d)) + os.sep for d in dirs] + [os.path.normpath(os.path.join(rel, f)) for f in files]
+        return sorted(found)
+
+
+# --- Latency and fault injection ---
+
+class _Fault:
+    __slots__ = ("operations", "pattern", "error", "count", "probability", "after")
+
+    def __init__(self, operations, pattern, error, count, probability, after):
+        self.operations = operations; self.pattern = pattern; self.error = error
+        self.count = count; self.probability = probability; self.after = after
+
+
+class FaultyFileSystem:
+    """
+    Wraps a filesystem. Every call of one of CALLS first sleeps latency
+    seconds (plus up to jitter, or latencies[operation] for that operation),
+    is counted in calls, and raises an injected error if a fail() rule
+    matches. Derived calls of the wrapped filesystem are not delayed again.
+    """
+    CALLS = ("scandir", "listdir", "stat", "lstat", "exists", "lexists", "isdir", "islink", "walk", "makedirs", "mkdir", "rmdir",
+             "rename", "move", "copy", "remove", "rmtree", "access", "disk_usage", "create_file", "transfer", "discard_partial")
+
+    def __init__(self, inner, latency=0.0, jitter=0.0, latencies=None, seed=None):
+        self.inner = inner
+        self.latency = latency; self.jitter = jitter
+        self.latencies = dict(latencies or {}) # operation -> seconds, instead of latency
+        self.calls = collections.Counter()
+        self.injected = collections.Counter()  # operation -> errors raised
+        self._faults = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def fail(self, operations="*", pattern="*", error=errno.EIO, count=None, probability=1.0, after=0):
+        """
+        Make calls of operations (a name, a tuple of names or '*') on paths
+        matching the glob pattern raise error: an errno (raised as the matching
+        OSError subclass) or an exception instance or class. count limits how
+        often, probability makes it random (seeded), after skips that many
+        matching calls first. Returns the rule; clear_faults() removes all.
+        """
+        operations = None if operations == "*" else {operations} if isinstance(operations, str) else set(operations)
+        fault = _Fault(operations, pattern, error, count, probability, after)
+        with self._lock: self._faults.append(fault)
+        return fault
+
+    def clear_faults(self):
+        with self._lock: self._faults.clear()
+
+    def _check(self, operation, path):
+        with self._lock:
+            self.calls[operation] += 1
+            delay = self.latencies.get(operation, self.latency)
+            if self.jitter: delay += self._random.random() * self.jitter
+            raised = None
+            for fault in self._faults:
+                if fault.operations is not None and operation not in fault.operations: continue
+                if not fnmatch.fnmatchcase(path, fault.pattern): continue
+                if fault.after: fault.after -= 1; continue
+                if fault.count is not None and fault.count <= 0: continue
+                if fault.probability < 1.0 and self._random.random() >= fault.probability: continue
+                if fault.count is not None: fault.count -= 1
+                self.injected[operation] += 1
+                error = fault.error
+                raised = OSError(error, f"Injected {os.strerror(error)}", path) if isinstance(error, int) else error
+                break
+        if delay: time.sleep(delay)
+        if raised is not None: raise raised
+
+    def __getattr__(self, name):
+        attr = getattr(self.inner, name)
+        if name not in self.CALLS: return attr
+        def call(*args, **kwargs):
+            self._check(name, os.fspath(args[0]) if args else "")
+            return attr(*args, **kwargs)
+        return call
@@ -0,0 +1,555 @@
+"""
+Tk front-end for Plugin Organizer. Imported lazily by plugin_organizer.py only
+when the GUI is started; all planning and moving is done by organizer_core.
+"""
+import os
+import sys
+import queue
+import bisect
+import ctypes
+import threading
+import tkinter as tk
+from tkinter import filedialog, messagebox, scrolledtext, ttk
+
+import organizer_core as core
+import organizer_snapshot
+from organizer_logreader import LogReader
+from organizer_core import log_action, log_trace, flush_log
+
+ADMIN_HINT = "\n\nEnsure the application is running as Administrator."
+
+# Widgets created by build_app()
+app = None
+entry_directory = entry_prefix = entry_suffix = None
+
+# Auto-elevation
+def is_admin():
+    try: return ctypes.windll.shell32.IsUserAnAdmin() != 0
+    except Exception: return False
+
+def relaunch_as_admin():
+    """Restart this program elevated (UAC prompt) and exit the current process."""
+    try:
+        script_path = os.path.abspath(sys.argv[0])
+        params = " ".join([f'"{arg}"' for arg in sys.argv[1:]])
+        ret = ctypes.windll.shell32.ShellExecuteW(None, "runas", sys.executable, f'"{script_path}" {params}', None, 1)
+        if ret <= 32: print(f"Failed to elevate privileges (Error code: {ret}).")
+    except Exception as e: print(f"Error requesting admin privileges: {e}")
+    finally: sys.exit()
+
+
+# --- Background Work ---
+
+PHASE_LABELS = {"scan": "Scanning", "plan": "Planning", "move": "Moving", "undo": "Reverting", "hash": "Comparing files"}
+
+def _progress_text(event):
+    text = f"{PHASE_LABELS.get(event.phase, event.phase)}: {event.done} of {event.total} item(s)"
+    if event.bytes_done: text += f", {event.bytes_done / 1048576:.1f} MiB"
+    if event.eta is not None: text += f"\nAbout {int(event.eta) + 1}s left"
+    return text
+
+def run_with_progress(title, work, on_done):
+    """
+    Run work(progress, cancel) on a worker thread behind a small modal progress
+    window, so the main window keeps responding. Progress events come back
+    through a queue polled with after(). on_done(result, error) is called on the
+    Tk thread when the work has finished (error is the exception, if any).
+    """
+    events = queue.Queue(); cancel = threading.Event(); outcome = [None, None]
+
+    win = tk.Toplevel(app); win.title(title)
+    win.geometry("420x150"); win.resizable(False, False)
+    win.transient(app); win.grab_set()
+    status = tk.Label(win, text=f"{title}...", anchor="w", justify=tk.LEFT)
+    status.pack(fill=tk.X, padx=15, pady=(15, 5))
+    bar = ttk.Progressbar(win, mode="indeterminate", length=390)
+    bar.pack(padx=15, pady=5); bar.start(15)
+    def request_cancel():
+        if cancel.is_set(): return
+        cancel.set(); log_action(f"User requested cancel: {title}")
+        btn_cancel.configure(state="disabled", text="Cancelling...")
+    btn_cancel = tk.Button(win, text="Cancel", command=request_cancel, width=10)
+    btn_cancel.pack(pady=10)
+    win.protocol("WM_DELETE_WINDOW", request_cancel) # Closing the window cancels
+
+    def worker():
+        try: outcome[0] = work(events.put, cancel)
+        except Exception as e: outcome[1] = e
+        events.put(None) # Finished
+
+    def poll():
+        latest = None; finished = False
+        try:
+            while True:
+                event = events.get_nowait()
+                if event is None: finished = True
+                else: latest = event
+        except queue.Empty: pass
+        if latest is not None:
+            if latest.total:
+                if str(bar.cget("mode")) != "determinate": bar.stop(); bar.configure(mode="determinate")
+                bar.configure(maximum=latest.total, value=min(latest.done, latest.total))
+            status.configure(text=_progress_text(latest))
+        if not finished: win.after(50, poll); return
+        bar.stop(); win.grab_release(); win.destroy()
+        on_done(*outcome)
+
+    threading.Thread(target=worker, name="organizer-work", daemon=True).start()
+    win.after(50, poll)
+
+
+# --- Result Dialogs ---
+
+def show_execution_result(result):
+    """Turn an ExecutionResult into the same dialogs the organizer has always shown."""
+    if result.preflight is not None and not result.preflight.ok:
+        errors = result.preflight.errors
+        details = "\n".join(f"- {p.message}" for p in errors[:15]) + (f"\n... and {len(errors) - 15} more" if len(errors) > 15 else "")
+        messagebox.showerror("Cannot Organize", f"Nothing was moved. The plan has {len(errors)} problem(s) to resolve first:\n\n{details}"
+                             + (ADMIN_HINT if any(p.kind == "permission" for p in errors) else ""))
+        return
+    if result.cancelled and not result.issues:
+        messagebox.showinfo("Cancelled", f"Organization cancelled. {result.moved_count} of {result.planned} item(s) were moved before it stopped.\n\nUse 'Undo Last' to move them back.")
+        return
+    for issue in result.issues:
+        if issue.kind == "self_move":
+            messagebox.showerror("Move Error", f"Cannot move '{os.path.basename(issue.source)}' into itself. This usually means a folder with the same name as the plugin already exists. The move for this folder has been skipped.")
+        elif issue.kind == "permission":
+            messagebox.showerror("Permission Error", issue.message + ADMIN_HINT)
+        elif issue.kind == "mkdir":
+            messagebox.showerror("Folder Creation Error", issue.message)
+        elif issue.kind == "move":
+            messagebox.showerror("Move Error", issue.message)
+        elif issue.kind == "undo_save":
+            messagebox.showerror("Critical Error", issue.message + "\n\nUNDO WILL NOT BE POSSIBLE for this operation.")
+
+    total_moves_planned = result.planned
+    actual_moves_logged = result.moved_count
+    errors_encountered = bool(result.issues)
+
+    if actual_moves_logged == 0 and not errors_encountered and total_moves_planned > 0:
+         # Handle case where only moves skipped were self-moves
+         messagebox.showinfo("Information", "Organization complete. No files/folders needed moving (or only self-moves were skipped).")
+    elif total_moves_planned == 0: # No .aex files found initially
+         messagebox.showinfo("Information", "No plugin (.aex) files found directly in the selected directory to organize.")
+    elif not errors_encountered:
+        messagebox.showinfo("Success", f"Successfully organized {actual_moves_logged} item(s) (files/folders) into subfolders!")
+    else:
+        error_summary = f"Organization attempted for {total_moves_planned} potential item moves, but errors occurred."
+        if actual_moves_logged > 0: error_summary += f" {actual_moves_logged} item(s) may have been moved."
+        else: error_summary += " No items appear to have been successfully moved."
+
+        undo_save_failed = not result.undo_saved and actual_moves_logged > 0
+        if undo_save_failed :
+             error_summary += "\n\nCRITICAL: Undo information could not be saved. Manual reversal may be required."
+             messagebox.showerror("Completed with Critical Errors", error_summary + "\n\nCheck the log file for details.")
+        else:
+             messagebox.showwarning("Completed with Errors", error_summary + "\n\nCheck the log file ('plugin_organizer.log') for details.")
+
+
+# preview_moves function
+def _show_no_moves(aex_count):
+    if aex_count == 0:
+        messagebox.showinfo("Preview", "No plugin (.aex) files found directly in the selected directory to organize.")
+    else:
+         messagebox.showinfo("Preview", "No associated files or folders need moving for the found .aex plugins (or moves were skipped, see log).")
+    log_action("Preview requested: No moves to preview.")
+
+def preview_moves(plan, stream=None):
+    """
+    Show a preview window with planned moves. On confirmation, execute moves.
+    Given a MoveStream instead of a plan, the window opens at once and fills in
+    while the directory is classified in the background; Proceed is enabled when
+    planning has finished.
+    """
+    if plan is not None and not plan.moves: _show_no_moves(plan.aex_count); return
+
+    preview_win = tk.Toplevel(app)
+    preview_win.title("Preview Planned Moves")
+    preview_win.geometry("650x500") # Wider/taller for more info
+    preview_win.minsize(500, 400)
+    preview_win.grab_set() # Make preview modal
+    preview_win.transient(app) # Associate with main window
+
+    run = core.metrics_begin("preview")
+    groups = []
+    def summary(moves_count):
+        total_folders = sum(g.folder_count for g in groups)
+        return (f"{moves_count} item(s) ({moves_count - total_folders} file(s), {total_folders} folder(s)) "
+                f"will be moved into {len(groups)} folder(s):")
+    lbl = tk.Label(preview_win, text="Planning...")
+    lbl.pack(pady=5)
+
+    tree_frame = tk.Frame(preview_win, borderwidth=1, relief="solid")
+    tree_frame.pack(padx=10, pady=5, expand=True, fill=tk.BOTH)
+    tree = ttk.Treeview(tree_frame, columns=("contents",), selectmode="browse")
+    tree.heading("#0", text="Target folder / item"); tree.heading("contents", text="Contents")
+    tree.column("#0", width=430, stretch=True); tree.column("contents", width=170, stretch=False)
+    scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
+    tree.configure(yscrollcommand=scrollbar.set)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y); tree.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+
+    group_of_node = {}
+    def add_rows(new_groups):
+        mark = core.metrics_mark(run)
+        for group in new_groups:
+            contents = f"{group.file_count} file(s), {group.folder_count} folder(s)"
+            node = tree.insert("", tk.END, text=f"📁 Into Folder: .\\{group.name}\\", values=(contents,))
+            tree.insert(node, tk.END) # Placeholder so the row can be expanded
+            group_of_node[node] = group
+        core.metrics_phase(run, "render", mark, len(new_groups))
+    def insert_groups(start=0, chunk=500):
+        """Insert folder rows a chunk at a time so the window appears immediately."""
+        if not tree.winfo_exists(): return
+        add_rows(groups[start:start + chunk])
+        if start + chunk < len(groups): preview_win.after(1, insert_groups, start + chunk, chunk)
+        else: core.metrics_end(run, moves=len(plan.moves), groups=len(groups))
+    def expand_group(event=None):
+        node = tree.focus()
+        group = group_of_node.pop(node, None) # Filled on first expansion only
+        if group is None: return
+        tree.delete(*tree.get_children(node))
+        for item_basename, is_folder in group.items:
+            tree.insert(node, tk.END, text=f"{'📁' if is_folder else '📄'} Move: '{item_basename}'")
+    tree.bind("<<TreeviewOpen>>", expand_group)
+
+    def shown():
+        log_action(f"Preview window shown: {len(plan.moves)} planned move(s) into {len(groups)} folder(s).")
+        for group in groups: log_trace(f"  Preview Target Folder: {group.name} ({len(group.items)} item(s))")
+        flush_log()
+
+    # --- Buttons ---
+    def proceed():
+        log_action("User confirmed preview. Proceeding with moves.")
+        preview_win.destroy()
+        def done(result, error):
+            if error is not None: messagebox.showerror("Error", f"An unexpected error occurred while moving:\n{error}"); return
+            show_execution_result(result)
+        # Execute the moves passed to this preview instance
+        def work(progress, cancel):
+            result = core.execute_moves(plan.moves, plan.snapshot, prefix=plan.prefix, suffix=plan.suffix, progress=progress, cancel=cancel)
+            organizer_snapshot.remember_applied(plan, result)
+            return result
+        run_with_progress("Organizing", work, done)
+    def cancel():
+        log_action("User cancelled operation from preview.")
+        if stream is not None: stream.cancel.set() # Stops the planner if it is still running
+        preview_win.destroy()
+
+    btn_frame = tk.Frame(preview_win); btn_frame.pack(pady=10)
+    btn_proceed = tk.Button(btn_frame, text="Proceed", command=proceed, width=10, bg="#D0E0D0", activebackground="#B0C0B0")
+    btn_proceed.grid(row=0, column=0, padx=10)
+    btn_cancel = tk.Button(btn_frame, text="Cancel", command=cancel, width=10, bg="#F0D0D0", activebackground="#D0B0B0")
+    btn_cancel.grid(row=0, column=1, padx=10)
+    preview_win.protocol("WM_DELETE_WINDOW", cancel)
+
+    if stream is None:
+        # Grouped in one pass from the plan's snapshot; rows are only created when shown
+        mark = core.metrics_mark(run)
+        groups[:] = core.group_moves(plan.moves, plan.snapshot)
+        core.metrics_phase(run, "model", mark, len(plan.moves))
+        lbl.configure(text=summary(len(plan.moves)))
+        insert_groups(); shown()
+        btn_proceed.focus_set() # Set focus to Proceed button
+    else:
+        # Groups arrive from a planner thread as each plugin's items are resolved
+        btn_proceed.configure(state="disabled")
+        updates = queue.Queue()
+        def plan_in_background():
+            try:
+                for group in stream: updates.put(group)
+                updates.put(None)
+            except Exception as e: updates.put(e)
+        def poll():
+            nonlocal plan
+            if not preview_win.winfo_exists(): return
+            new_groups = []; finished = False; error = None
+            while len(new_groups) < 500: # Keep the window responsive with huge plans
+                try: item = updates.get_nowait()
+                except queue.Empty: break
+                if item is None or isinstance(item, Exception): finished = True; error = item; break
+                new_groups.append(item)
+            if new_groups:
+                groups.extend(new_groups); add_rows(new_groups)
+                lbl.configure(text=f"Planning... {stream.moves} item(s) into {len(groups)} folder(s) so far")
+            if not finished: preview_win.after(50, poll); return
+            if error is not None:
+                preview_win.destroy()
+                if isinstance(error, core.ScanPermissionError): messagebox.showerror("Permission Error", str(error))
+                elif not isinstance(error, core.OperationCancelled): messagebox.showerror("Error", str(error))
+                return
+            plan = stream.plan_result(groups)
+            organizer_snapshot.remember_plan(plan, stream.scanned_at) # The next preview of this folder is incremental
+            core.metrics_end(run, moves=len(plan.moves), groups=len(groups))
+            if not plan.moves: preview_win.destroy(); _show_no_moves(plan.aex_count); return
+            lbl.configure(text=summary(len(plan.moves)))
+            btn_proceed.configure(state="normal"); btn_proceed.focus_set()
+            shown()
+        threading.Thread(target=plan_in_background, name="organizer-plan", daemon=True).start()
+        preview_win.after(50, poll)
+    preview_win.wait_window() # Wait for the preview window to close
+
+
+def undo_moves():
+    """Undo the last organization in the background and report the outcome."""
+    run_with_progress("Undoing", lambda progress, cancel: core.undo_moves(progress=progress, cancel=cancel), show_undo_result)
+
+def show_undo_result(result, error):
+    if isinstance(error, core.UndoUnavailableError):
+        if os.path.exists(core.UNDO_FILE): messagebox.showerror("Undo Error", str(error))
+        else: messagebox.showinfo("Undo", str(error))
+        return
+    if error is not None: messagebox.showerror("Undo Error", f"An unexpected error occurred during undo:\n{error}"); return
+
+    if result.cancelled:
+        messagebox.showinfo("Undo Cancelled", f"Undo cancelled after {result.reverted} item(s) were moved back.\nClick 'Undo Last' again to revert the rest.")
+        return
+    if result.attempted == 0:
+        messagebox.showinfo("Undo", "Undo information file is empty. Nothing to revert.")
+        return
+
+    errors = result.issues
+    if errors:
+        err_preview = "\n".join(errors[:5]) + ('\n...' if len(errors)>5 else '')
+        messagebox.showerror("Undo Completed with Errors", f"Undo process finished, but {len(errors)} item(s) had issues (see log):\n\n{err_preview}\n\nSuccessfully reverted {result.reverted} item(s).\n{result.removed_folders} empty created folder(s) removed.\nCheck log for full details.")
+    elif result.reverted > 0:
+        messagebox.showinfo("Undo Successful", f"{result.reverted} item(s) (files/folders) have been successfully moved back.\n{result.removed_folders} empty created folder(s) removed.")
+    else:
+         messagebox.showinfo("Undo Information", "Undo process completed. No items required reverting (or items were missing).")
+
+    if result.undo_file_error:
+        messagebox.showwarning("File Warning", f"Could not remove the undo file:\n{result.undo_file_error}")
+    elif result.undo_file_kept:
+        messagebox.showwarning("Undo Log Kept", f"Errors occurred during undo. The undo file '{os.path.basename(core.UNDO_FILE)}' has been kept.")
+
+# select_directory function
+def select_directory():
+    """Open a directory selection dialog and update the entry field."""
+    initial_dir = os.path.expanduser("~") # Start in user's home directory as default
+    plugin_dirs = core.find_ae_plugin_dirs()
+    if plugin_dirs: initial_dir = plugin_dirs[0] # Newest After Effects install
+
+    directory = filedialog.askdirectory(initialdir=initial_dir, title="Select After Effects Plug-ins Directory")
+    if directory:
+        entry_directory.delete(0, tk.END)
+        entry_directory.insert(0, directory)
+        log_action(f"User selected directory: {directory}")
+
+# run_preview function
+def run_preview():
+    """Get inputs, compute planned moves, and show the preview window."""
+    directory = entry_directory.get().strip()
+    if not directory: messagebox.showerror("Error", "Please select a directory first."); return
+    if not os.path.isdir(directory): messagebox.showerror("Error", f"Invalid or inaccessible directory path:\n{directory}"); log_action(f"Preview aborted: Invalid directory path: {directory}"); return
+
+    prefix = entry_prefix.get(); suffix = entry_suffix.get()
+    log_action(f"Preview initiated for directory: '{directory}', Prefix: '{prefix}', Suffix: '{suffix}'")
+    if not os.path.exists(organizer_snapshot.snapshot_file(directory)): # First visit: show groups while they are planned
+        preview_moves(None, core.stream_moves(directory, prefix, suffix, cancel=threading.Event())); return
+    def done(plan, error):
+        if isinstance(error, core.OperationCancelled): return
+        if isinstance(error, core.ScanPermissionError): messagebox.showerror("Permission Error", str(error)); return
+        if error is not None: messagebox.showerror("Error", str(error)); return
+        preview_moves(plan)
+    run_with_progress("Scanning", lambda progress, cancel: organizer_snapshot.plan_incremental(directory, prefix, suffix, progress=progress, cancel=cancel), done)
+
+def find_duplicates():
+    """Look for duplicate files in the selected directory and preview moving the extra copies aside."""
+    directory = entry_directory.get().strip()
+    if not directory: messagebox.showerror("Error", "Please select a directory first."); return
+    if not os.path.isdir(directory): messagebox.showerror("Error", f"Invalid or inaccessible directory path:\n{directory}"); return
+    import organizer_duplicates
+    log_action(f"Duplicate search initiated for directory: '{directory}'")
+    def done(report, error):
+        if isinstance(error, core.OperationCancelled): return
+        if error is not None: messagebox.showerror("Error", str(error)); return
+        stale = f"\n\n{len(report.stale)} plugin(s) also have older versions (see log; 'duplicates --stale' on the command line moves them)." if report.stale else ""
+        plan = report.plan()
+        if not plan.moves: messagebox.showinfo("Duplicates", f"No duplicate files found among {report.files} file(s).{stale}"); return
+        if stale: messagebox.showinfo("Duplicates", f"{len(plan.moves)} extra copies found; the preview moves them into '{organizer_duplicates.QUARANTINE_FOLDER}'.{stale}")
+        preview_moves(plan)
+    run_with_progress("Finding duplicates", lambda progress, cancel: organizer_duplicates.find_duplicates(directory, progress=progress, cancel=cancel), done)
+
+# show_help function (no changes)
+def show_help():
+    """Show the help/guide information in a message box."""
+    help_text = (
+    "📌 Plugin Organizer - User Guide\n\n"
+    "Plugin Organizer helps you manage and organize your After Effects plugin files by grouping associated files into neat folders for easier management and access.\n\n"
+    "🔹 1. Select Directory: Browse for the folder with your After Effects plugin files \n (e.g., ...\\Adobe After Effects XXXX\\Support Files\\Plug-ins).\n\n"
+    "🔹 2. Folder Naming: Optionally add a prefix/suffix for the created folders. \nExample: files like 'Plugin.aex', 'PluginLicense.dll', and 'Plugin Presets' will be grouped in '[Prefix]Plugin[Suffix]'.\n\n"
+    "🔹 3. Preview & Organize: Click 'Preview & Organize' to see planned moves. \n\n"
+    "🔹 4. Undo Last Action: Click 'Undo Last' to revert the most recent change and remove empty folders.\n\n"
+    "🔹 5. View History: Click 'View History' to check the action log.\n\n"
+    "🔹 6. Logging: Logs are saved in 'plugin_organizer.log'.\n\n"
+    "🔹 7. Find Duplicates: Finds identical copies of plugin files left by repeated installs and previews moving them into a '_Duplicates' folder (undoable).\n\n"
+    "⚠️ IMPORTANT: Requires Administrator rights for system folders. Backup your plugins folder before making big changes. Undo relies on 'undo_log.jsonl', which records every move as it happens."
+)
+
+
+    messagebox.showinfo("Help / Guide", help_text)
+    log_action("Help window displayed.")
+
+# show_history_log function
+HISTORY_PAGE_LINES = 500 # Lines read from the log per page
+
+def show_history_log():
+    """
+    Show the log, newest lines first. Older and newer pages are read from the
+    file on demand and search streams it backwards, so the log is never loaded
+    as a whole.
+    """
+    log_action("User requested to view history log.")
+    flush_log()
+    LOG_FILE = core.LOG_FILE
+    if not os.path.exists(LOG_FILE):
+        messagebox.showinfo("History Log", f"Log file ('{os.path.basename(LOG_FILE)}') not found."); log_action("History view aborted: Log file not found."); return
+    reader = LogReader(LOG_FILE)
+    try:
+        log_win = tk.Toplevel(app); log_win.title(f"Action History - {os.path.basename(LOG_FILE)}")
+        log_win.geometry("700x500"); log_win.minsize(400, 300); log_win.grab_set(); log_win.transient(app)
+
+        find_frame = tk.Frame(log_win); find_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        tk.Label(find_frame, text="Find:").pack(side=tk.LEFT)
+        entry_find = tk.Entry(find_frame); entry_find.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=5)
+        btn_find = tk.Button(find_frame, text="Find Older", width=10); btn_find.pack(side=tk.LEFT)
+
+        log_text_area = scrolledtext.ScrolledText(log_win, wrap=tk.WORD, borderwidth=1, relief="solid", font=("Consolas", 9))
+        log_text_area.pack(padx=10, pady=(5, 5), expand=True, fill=tk.BOTH)
+        log_text_area.tag_configure("match", background="#FFE08A")
+        status = tk.Label(log_win, anchor="w", fg="grey"); status.pack(fill=tk.X, padx=10)
+
+        offsets = [] # Byte offset of every line shown, in order
+        view = {"end": 0, "match": None} # Offset just past the last shown line; last search hit
+        def update_status(note=""):
+            shown = view["end"] - (offsets[0] if offsets else view["end"])
+            status.configure(text=f"Showing {len(offsets)} line(s), {shown // 1024} of {reader.size // 1024} KiB. {note}")
+        def fill(lines, at_end=True):
+            log_text_area.configure(state="normal")
+            text = "\n".join(line for _, line in lines)
+            if at_end: log_text_area.insert(tk.END, ("\n" if offsets else "") + text); offsets.extend(o for o, _ in lines)
+            else: log_text_area.insert("1.0", text + ("\n" if offsets else "")); offsets[:0] = [o for o, _ in lines]
+            log_text_area.configure(state="disabled")
+        def load_older():
+            lines = reader.lines_before(offsets[0] if offsets else view["end"], HISTORY_PAGE_LINES)
+            if not lines: update_status("Beginning of the log."); return
+            fill(lines, at_end=False); log_text_area.see(f"{len(lines) + 1}.0"); update_status()
+        def load_newer():
+            lines, end = reader.lines_after(view["end"], HISTORY_PAGE_LINES)
+            if not lines: update_status("End of the log."); return
+            fill(lines); view["end"] = end; update_status()
+        def find_older(event=None):
+            needle = entry_find.get()
+            if not needle: return
+            offset = reader.find(needle, view["match"] if view["match"] is not None else reader.size)
+            if offset is None: update_status(f"No older line contains '{needle}'."); return
+            view["match"] = offset
+            if not offsets or offset < offsets[0]: # Not loaded: show a page starting just before the hit
+                before = reader.lines_before(offset, 20)
+                after, view["end"] = reader.lines_after(offset, HISTORY_PAGE_LINES)
+                offsets.clear(); log_text_area.configure(state="normal"); log_text_area.delete("1.0", tk.END)
+                fill(before + after)
+            line_no = bisect.bisect_left(offsets, offset) + 1
+            log_text_area.tag_remove("match", "1.0", tk.END)
+            log_text_area.tag_add("match", f"{line_no}.0", f"{line_no}.end"); log_text_area.see(f"{line_no}.0")
+            update_status(f"Match at byte {offset}.")
+        btn_find.configure(command=find_older); entry_find.bind("<Return>", find_older)
+
+        button_frame = tk.Frame(log_win); button_frame.pack(pady=(5, 10))
+        tk.Button(button_frame, text="Load Older", command=load_older, width=10).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Load Newer", command=load_newer, width=10).pack(side=tk.LEFT, padx=5)
+        close_button = tk.Button(button_frame, text="Close", command=log_win.destroy, width=10); close_button.pack(side=tk.LEFT, padx=5)
+
+        view["end"] = reader.size # Start with the newest page
+        load_older(); log_text_area.see(tk.END)
+        log_win.wait_window()
+    except Exception as e:
+        messagebox.showerror("Error", f"Could not read or display log file:\n{e}"); log_action(f"History view error: {e}")
+
+
+# --- GUI Setup ---
+def build_app():
+    """Create the main window and its widgets."""
+    global app, entry_directory, entry_prefix, entry_suffix
+    app = tk.Tk()
+    app.title("Plugin Organizer for AE")
+    # +++ Add Icon Code (Method 1: .ico) +++
+    # Determine if running as a bundled executable or as a script
+    if getattr(sys, 'frozen', False):  # Check if running from a bundled .exe
+        # Path inside the bundle
+        icon_path = os.path.join(sys._MEIPASS, 'app-icon', 'app_icon.ico') # <--- Path to check
+    else:
+        # Path when running as script (assuming 'app-icon' folder exists next to script)
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        icon_path = os.path.join(script_dir, 'app-icon', 'app_icon.ico') # <--- Path to check
+
+    try:
+        if os.path.exists(icon_path):
+            app.iconbitmap(icon_path)
+            print(f"Loaded window icon from {icon_path}")
+        else:
+            print(f"Warning: Icon file not found at {icon_path}")
+    except tk.TclError as e:
+        print(f"Warning: Could not load icon '{icon_path}'. Ensure it's a valid .ico file.")
+    except Exception as e:
+        print(f"Warning: An unexpected error occurred setting the icon: {e}")
+    # +++ End Icon Code +++
+
+    app.geometry("690x290")
+    app.minsize(500, 270)
+
+    frame = tk.Frame(app, padx=15, pady=15)
+    frame.pack(expand=True, fill=tk.BOTH)
+    frame.columnconfigure(1, weight=1)
+
+    lbl_dir = tk.Label(frame, text="Plugin Directory:")
+    lbl_dir.grid(row=0, column=0, sticky="w", pady=(0, 5))
+    entry_directory = tk.Entry(frame, width=50)
+    entry_directory.grid(row=0, column=1, padx=(5, 5), sticky="ew", pady=(0, 5))
+    btn_browse = tk.Button(frame, text="Browse...", command=select_directory)
+    btn_browse.grid(row=0, column=2, padx=(0, 5), pady=(0, 5))
+
+    lbl_prefix = tk.Label(frame, text="Folder Prefix:")
+    lbl_prefix.grid(row=1, column=0, sticky="w", pady=(0, 5))
+    entry_prefix = tk.Entry(frame, width=25)
+    entry_prefix.grid(row=1, column=1, padx=5, sticky="w", pady=(0, 5))
+
+    lbl_suffix = tk.Label(frame, text="Folder Suffix:")
+    lbl_suffix.grid(row=2, column=0, sticky="w", pady=(0, 15))
+    entry_suffix = tk.Entry(frame, width=25)
+    entry_suffix.grid(row=2, column=1, padx=5, sticky="w", pady=(0, 15))
+
+    button_frame = tk.Frame(frame)
+    button_frame.grid(row=3, column=0, columnspan=3, pady=(10, 10))
+    btn_help = tk.Button(button_frame, text="Help / Guide", command=show_help, width=12)
+    btn_help.pack(side=tk.LEFT, padx=5, pady=5)
+    btn_history = tk.Button(button_frame, text="View History", command=show_history_log, width=12)
+    btn_history.pack(side=tk.LEFT, padx=5, pady=5)
+    btn_preview = tk.Button(button_frame, text="Preview & Organize", command=run_preview, width=15, font=('Segoe UI', 9, 'bold'))
+    btn_preview.pack(side=tk.LEFT, padx=5, pady=5)
+    btn_undo = tk.Button(button_frame, text="Undo Last", command=undo_moves, width=12)
+    btn_undo.pack(side=tk.LEFT, padx=5, pady=5)
+    btn_duplicates = tk.Button(button_frame, text="Find Duplicates", command=find_duplicates, width=14)
+    btn_duplicates.pack(side=tk.LEFT, padx=5, pady=5)
+
+    credit_label = tk.Label(frame, text="Developed by chal7z", font=("Arial", 8), fg="grey")
+    credit_label.grid(row=4, column=0, columnspan=3, pady=(15, 0))
+    return app
+
+# --- Run the application ---
+def run_gui():
+    """Elevate if needed, then build the window and run the Tk main loop. Returns an exit code."""
+    if not is_admin(): relaunch_as_admin()
+    if is_admin():
+        build_app()
+        log_action("--- Application session started ---")
+        app.mainloop()
+        log_action("--- Application session finished ---")
+        flush_log()
+        return 0
+    else:
+        print("Application requires Administrator privileges.")
+        try:
+            root = tk.Tk(); root.withdraw(); messagebox.showerror("Admin Rights Required", "Please restart as Administrator."); root.destroy()
+        except Exception: pass
+        return 1
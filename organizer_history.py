@@ -0,0 +1,153 @@
+"""
+Persistent undo history (SQLite).
+
+Every execute_moves run is stored as an operation with all of its moves, so
+any past operation can be undone, not just the last one, and the origin of a
+file can be looked up. Moves are indexed by operation, by root directory and
+by destination/source path; undo streams them from a cursor instead of loading
+the whole operation.
+
+    operations(id, started, finished, root, prefix, suffix, planned, moved, errors, state)
+    moves(op_id, seq, source, destination, dest_key, source_key, reverted)
+
+state is 'running' (never finished: crashed), 'applied', 'partial' (stopped on
+an error), 'undone' or 'partially_undone'.
+"""
+import os
+import datetime
+import sqlite3
+import threading
+
+HISTORY_FILE_NAME = "undo_history.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    started  TEXT NOT NULL,
+    finished TEXT,
+    root     TEXT,
+    root_key TEXT,
+    prefix   TEXT,
+    suffix   TEXT,
+    planned  INTEGER DEFAULT 0,
+    moved    INTEGER DEFAULT 0,
+    errors   INTEGER DEFAULT 0,
+    state    TEXT NOT NULL DEFAULT 'running'
+);
+CREATE INDEX IF NOT EXISTS operations_root ON operations(root_key, id);
+CREATE TABLE IF NOT EXISTS moves (
+    op_id       INTEGER NOT NULL REFERENCES operations(id),
+    seq         INTEGER NOT NULL,
+    source      TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    source_key  TEXT NOT NULL,
+    dest_key    TEXT NOT NULL,
+    reverted    INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (op_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS moves_dest ON moves(dest_key);
+CREATE INDEX IF NOT EXISTS moves_source ON moves(source_key);
+"""
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+class UndoHistory:
+    """Access to one history database. Cheap to create; each call uses its own short-lived connection."""
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        with _schema_lock:
+            if self.path not in _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                _schema_ready.add(self.path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # --- Writing ---
+
+    def begin_operation(self, root, prefix="", suffix="", planned=0):
+        """Create an operation row in state 'running'. Returns its id."""
+        conn = self._connect()
+        try:
+            with conn:
+                cur = conn.execute("INSERT INTO operations(started, root, root_key, prefix, suffix, planned) VALUES (?, ?, ?, ?, ?, ?)",
+                                   (_now(), root, _key(root) if root else None, prefix, suffix, planned))
+            return cur.lastrowid
+        finally: conn.close()
+
+    def finish_operation(self, op_id, moves, errors=False):
+        """Store the completed moves ([(source, destination), ...] in the order they happened) and close the operation."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO moves(op_id, seq, source, destination, source_key, dest_key) VALUES (?, ?, ?, ?, ?, ?)",
+                                 ((op_id, seq, src, dst, _key(src), _key(dst)) for seq, (src, dst) in enumerate(moves)))
+                moved = conn.execute("SELECT COUNT(*) FROM moves WHERE op_id = ?", (op_id,)).fetchone()[0]
+                conn.execute("UPDATE operations SET finished = ?, moved = ?, errors = ?, state = ? WHERE id = ?",
+                             (_now(), moved, int(bool(errors)), "partial" if errors else "applied", op_id))
+        finally: conn.close()
+
+    def mark_reverted(self, op_id, destinations):
+        """
+        Flag the moves to these destinations as reverted. The operation becomes
+        'undone' once every one of its moves is flagged, 'partially_undone' while
+        only some are; with none flagged its state is left as it was.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("UPDATE moves SET reverted = 1 WHERE op_id = ? AND dest_key = ?", ((op_id, _key(d)) for d in destinations))
+                total, done = conn.execute("SELECT COUNT(*), COALESCE(SUM(reverted), 0) FROM moves WHERE op_id = ?", (op_id,)).fetchone()
+                if done: conn.execute("UPDATE operations SET state = ? WHERE id = ?", ("undone" if done == total else "partially_undone", op_id))
+        finally: conn.close()
+
+    # --- Reading ---
+
+    def operation(self, op_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM operations WHERE id = ?", (op_id,)).fetchone()
+            return dict(row) if row else None
+        finally: conn.close()
+
+    def operations(self, root=None, limit=20):
+        """Most recent operations first, optionally only those for one root directory."""
+        conn = self._connect()
+        try:
+            if root: rows = conn.execute("SELECT * FROM operations WHERE root_key = ? ORDER BY id DESC LIMIT ?", (_key(root), limit))
+            else: rows = conn.execute("SELECT * FROM operations ORDER BY id DESC LIMIT ?", (limit,))
+            return [dict(r) for r in rows]
+        finally: conn.close()
+
+    def iter_moves(self, op_id, newest_first=True, include_reverted=False):
+        """Stream (source, destination) pairs of one operation from a cursor."""
+        conn = self._connect()
+        try:
+            sql = "SELECT source, destination FROM moves WHERE op_id = ?"
+            if not include_reverted: sql += " AND reverted = 0"
+            sql += " ORDER BY seq DESC" if newest_first else " ORDER BY seq"
+            for row in conn.execute(sql, (op_id,)): yield row["source"], row["destination"]
+        finally: conn.close()
+
+    def origin_of(self, path):
+        """Where did the item now (or once) at `path` come from? Newest operation first."""
+        conn = self._connect()
+        try:
+            key = _key(path)
+            rows = conn.execute("""SELECT m.op_id, o.started, o.state, m.source, m.destination, m.reverted
+                                   FROM moves m JOIN operations o ON o.id = m.op_id
+                                   WHERE m.dest_key = ? OR m.source_key = ? ORDER BY m.op_id DESC""", (key, key))
+            return [dict(r) for r in rows]
+        finally: conn.close()
@@ -0,0 +1,133 @@
+"""
+Append-only undo journal (JSON lines).
+
+execute_moves writes an intent record just before each move and a done record
+right after it, so the journal describes every move that may have happened,
+even if the run stopped halfway or the process died. Records are flushed to the
+OS immediately; fsync is batched (every fsync_every records or fsync_interval
+seconds, and on close).
+
+    {"t": "begin", "time": ..., "planned": N}
+    {"t": "mv", "i": 0, "src": "...", "dst": "..."}
+    {"t": "ck", "i": 0, "f": "Textures/a.png", "n": 1234}   (cross-volume copies: one per verified file)
+    {"t": "ck", "i": 0, "f": null, "n": 56789}              (the whole copy is in place; the source is deleted next)
+    {"t": "ok", "i": 0}
+    {"t": "end", "moved": n, "errors": false}
+
+read_journal also accepts the older undo_log.json format (one JSON object
+mapping destination -> source).
+"""
+import os
+import json
+import time
+import datetime
+import threading
+
+
+class UndoJournal:
+    """Writer side. The file is only created (and a previous journal replaced) when the first move is recorded."""
+    def __init__(self, path, header=None, fsync_every=64, fsync_interval=1.0):
+        self.path = path
+        self.header = dict(header or {})
+        self.fsync_every = fsync_every; self.fsync_interval = fsync_interval
+        self.recorded = 0 # Completed moves
+        self._file = None; self._next_id = 0; self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def started(self): return self._file is not None
+
+    def _write(self, record):
+        if self._file is None:
+            self._file = open(self.path, "w", encoding='utf-8')
+            header = {"t": "begin", "time": datetime.datetime.now().isoformat(timespec="seconds")}
+            header.update(self.header)
+            self._file.write(json.dumps(header) + "\n")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush() # In the OS cache right away: survives a crash of this process
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval: self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0; self._last_sync = time.monotonic()
+
+    def intent(self, source, destination):
+        """Record a move about to happen. Returns the id to pass to done()."""
+        with self._lock:
+            move_id = self._next_id; self._next_id += 1
+            self._write({"t": "mv", "i": move_id, "src": source, "dst": destination})
+            return move_id
+
+    def checkpoint(self, move_id, name, nbytes):
+        """Record progress of a cross-volume copy (name None: the copy is complete and in place)."""
+        with self._lock: self._write({"t": "ck", "i": move_id, "f": name, "n": nbytes})
+
+    def done(self, move_id):
+        """Record that the move with this id completed."""
+        with self._lock:
+            self._write({"t": "ok", "i": move_id})
+            self.recorded += 1
+
+    def close(self, **footer):
+        """Write the end record (if anything was journaled) and fsync."""
+        with self._lock:
+            if self._file is None: return
+            try:
+                record = {"t": "end"}; record.update(footer)
+                self._write(record)
+                self._sync()
+            finally:
+                self._file.close(); self._file = None
+
+
+class JournalEntry:
+    """One move read back from a journal."""
+    __slots__ = ("destination", "source", "confirmed", "checkpoints", "copied")
+
+    def __init__(self, destination, source, confirmed):
+        self.destination = destination; self.source = source
+        self.confirmed = confirmed # False: the run stopped between the intent and done records
+        self.checkpoints = 0       # Files of a cross-volume copy that were verified
+        self.copied = False        # The copy was complete and in place (the source may be partly deleted)
+
+class JournalContents:
+    def __init__(self):
+        self.header = {}
+        self.entries = []      # [JournalEntry, ...] in the order the moves were made
+        self.complete = False  # The end record was written
+        self.skipped_lines = 0 # Torn or unreadable lines that were ignored
+        self.legacy = False    # Read from the old single-object undo_log.json format
+
+
+def read_journal(path):
+    """Read a journal (or a legacy undo_log.json). Raises OSError/ValueError if it cannot be read at all."""
+    contents = JournalContents()
+    with open(path, "r", encoding='utf-8') as f: text = f.read()
+    try: legacy = json.loads(text) # A journal with more than one record is not a single JSON document
+    except ValueError: legacy = None
+    if isinstance(legacy, dict) and "t" not in legacy:
+        contents.legacy = True; contents.complete = True
+        contents.entries = [JournalEntry(dst, src, True) for dst, src in legacy.items()]
+        return contents
+
+    by_id = {}
+    for line in text.splitlines():
+        if not line.strip(): continue
+        try: record = json.loads(line)
+        except ValueError: record = None
+        if not isinstance(record, dict): contents.skipped_lines += 1; continue # Torn write at the moment of a crash
+        kind = record.get("t")
+        if kind == "begin": contents.header = record
+        elif kind == "mv":
+            entry = JournalEntry(record["dst"], record["src"], False)
+            by_id[record["i"]] = entry; contents.entries.append(entry)
+        elif kind == "ok" and record.get("i") in by_id: by_id[record["i"]].confirmed = True
+        elif kind == "ck" and record.get("i") in by_id:
+            if record.get("f") is None: by_id[record["i"]].copied = True
+            else: by_id[record["i"]].checkpoints += 1
+        elif kind == "end": contents.complete = True
+    if text.strip() and not contents.header and not contents.entries:
+        raise ValueError(f"'{os.path.basename(path)}' is not an undo journal")
+    return contents
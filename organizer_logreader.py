@@ -0,0 +1,89 @@
+"""
+Reading plugin_organizer.log without loading it into memory.
+
+The log only grows, so the history viewer reads it from the end: pages of
+lines are read backwards in fixed-size blocks from any line boundary, and
+forwards again with the normal buffered reader. Search streams the file the
+same way, newest line first, keeping one block in memory at a time. Lines are
+addressed by the byte offset where they start.
+"""
+import os
+
+BLOCK_SIZE = 64 * 1024
+
+
+def _decode(raw):
+    return raw.rstrip(b"\r\n").decode('utf-8', 'replace')
+
+
+class LogReader:
+    def __init__(self, path, block_size=BLOCK_SIZE):
+        self.path = path
+        self.block_size = block_size
+
+    @property
+    def size(self):
+        try: return os.path.getsize(self.path)
+        except OSError: return 0
+
+    def iter_reverse(self, before=None):
+        """(offset, raw line) pairs, newest first, for lines starting before `before` (a line boundary; default: end of file)."""
+        with open(self.path, "rb") as f:
+            pos = f.seek(0, os.SEEK_END) if before is None else before
+            buf = b""; end = 0 # buf holds file[pos:pos + len(buf)]; lines from `end` on were already yielded
+            while True:
+                idx = buf.rfind(b"\n", 0, end - 1) if end > 1 else -1 # Newline ending the line before the last one
+                if idx == -1:
+                    if pos == 0:
+                        if end: yield 0, buf[:end]
+                        return
+                    read = min(self.block_size, pos); pos -= read
+                    f.seek(pos); buf = f.read(read) + buf[:end]; end = len(buf)
+                    continue
+                yield pos + idx + 1, buf[idx + 1:end]
+                end = idx + 1
+
+    def iter_forward(self, start=0):
+        """(offset, raw line) pairs from the line boundary `start` to the end of the file."""
+        with open(self.path, "rb") as f:
+            f.seek(start); offset = start
+            for raw in f:
+                yield offset, raw
+                offset += len(raw)
+
+    def lines_before(self, before=None, count=500):
+        """Up to `count` lines ending at `before`, as [(offset, line), ...] oldest first."""
+        lines = []
+        for offset, raw in self.iter_reverse(before):
+            lines.append((offset, _decode(raw)))
+            if len(lines) >= count: break
+        lines.reverse()
+        return lines
+
+    def lines_after(self, start, count=500):
+        """Up to `count` lines from `start`. Returns ([(offset, line), ...], offset just past the last line)."""
+        lines = []; end = start
+        for offset, raw in self.iter_forward(start):
+            lines.append((offset, _decode(raw))); end = offset + len(raw)
+            if len(lines) >= count: break
+        return lines, end
+
+    def search(self, text, before=None, case_sensitive=False):
+        """(offset, line) for every line containing text, newest first, starting before `before`."""
+        if not text: return
+        needle = text if case_sensitive else text.lower()
+        raw_needle = needle.encode('utf-8')
+        ascii_only = needle.isascii() # bytes.lower() is exact for ASCII, so lines can be filtered without decoding
+        for offset, raw in self.iter_reverse(before):
+            if case_sensitive:
+                if raw_needle in raw: yield offset, _decode(raw)
+            elif ascii_only:
+                if raw_needle in raw.lower(): yield offset, _decode(raw)
+            else:
+                line = _decode(raw)
+                if needle in line.lower(): yield offset, line
+
+    def find(self, text, before=None, case_sensitive=False):
+        """Offset of the newest line containing text that starts before `before`, or None."""
+        for offset, _ in self.search(text, before, case_sensitive): return offset
+        return None
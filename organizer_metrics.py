@@ -0,0 +1,187 @@
+"""
+Opt-in instrumentation: where did the time of a run go?
+
+    PLUGIN_ORGANIZER_METRICS=1              summary lines in the log (and on stderr from the CLI)
+    PLUGIN_ORGANIZER_METRICS=metrics.json   ... and every run written to this JSON file at exit
+    PLUGIN_ORGANIZER_CPROFILE=run.prof      cProfile the main thread, dumped at exit (pstats format)
+
+or `plugin_organizer.py --metrics [FILE] --cprofile FILE <command> ...`.
+
+Every plan, execute, undo and GUI preview becomes a run with phases (scan,
+pass1, pass2, preflight, mkdir, move, undo, model, render, ...). A phase has
+wall time, item count and the filesystem calls made during it (os.stat and
+os.lstat plus the audited os.* events, counted process-wide, so concurrent
+batch runs share counts). A run also records bytes moved, time spent in the
+log sinks and its slowest individual moves.
+
+When instrumentation is off, organizer_core.METRICS is None and the
+instrumented code only pays for that check.
+"""
+import os
+import sys
+import json
+import time
+import heapq
+import atexit
+import threading
+
+import organizer_core as core
+
+METRICS_ENV = "PLUGIN_ORGANIZER_METRICS"
+CPROFILE_ENV = "PLUGIN_ORGANIZER_CPROFILE"
+SLOWEST_MOVES = 10
+
+
+class CallCounter:
+    """Counts os.stat/os.lstat calls and audited os.* events while active."""
+    def __init__(self):
+        self.active = False
+        self.counts = {}
+        self._hooked = False
+
+    def _audit(self, event, args):
+        if self.active and (event.startswith("os.") or event in ("open", "shutil.move", "shutil.copyfile")):
+            self.counts[event] = self.counts.get(event, 0) + 1
+
+    def _wrap(self, name):
+        real = getattr(os, name)
+        def counted(*args, **kwargs):
+            if self.active: self.counts[f"os.{name}"] = self.counts.get(f"os.{name}", 0) + 1
+            return real(*args, **kwargs)
+        counted.real = real
+        setattr(os, name, counted)
+
+    def __enter__(self):
+        if not self._hooked: sys.addaudithook(self._audit); self._hooked = True # Audit hooks cannot be removed; they stay idle
+        self._wrap("stat"); self._wrap("lstat")
+        self.counts = {}; self.active = True
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+        os.stat = os.stat.real; os.lstat = os.lstat.real
+
+
+class _TimedSink:
+    """Wraps a log sink or event log and adds the time spent in it to Metrics.log_seconds."""
+    TIMED = ("write", "flush", "emit")
+
+    def __init__(self, target, metrics):
+        self.target = target; self.metrics = metrics
+
+    def __getattr__(self, name):
+        attr = getattr(self.target, name)
+        if name not in self.TIMED: return attr
+        metrics = self.metrics
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try: return attr(*args, **kwargs)
+            finally: metrics.log_seconds += time.perf_counter() - started # Races only blur a total
+        return timed
+
+
+class RunMetrics:
+    """Measurements of one plan, execute, undo or preview."""
+    def __init__(self, metrics, kind):
+        self.metrics = metrics
+        self.kind = kind
+        self.started = time.time()
+        self.phases = {}  # name -> {"seconds", "items", "calls"}
+        self.fields = {}  # Counts given when the run ended (moves, bytes, ...)
+        self.seconds = 0.0
+        self.log_seconds = 0.0
+        self._slowest = [] # Min-heap of (seconds, source, destination, method, bytes)
+        self._lock = threading.Lock()
+        self._perf_start = time.perf_counter(); self._log_start = metrics.log_seconds
+
+    def mark(self):
+        return time.perf_counter(), dict(self.metrics.counter.counts)
+
+    def phase(self, name, mark, items=0):
+        """Close the phase started at mark (several closes of one name add up)."""
+        started, counts_before = mark
+        elapsed = time.perf_counter() - started
+        counts = dict(self.metrics.counter.counts) # Copy first: worker threads may add keys meanwhile
+        calls = {k: v - counts_before.get(k, 0) for k, v in counts.items() if v != counts_before.get(k, 0)}
+        with self._lock:
+            phase = self.phases.setdefault(name, {"seconds": 0.0, "items": 0, "calls": {}})
+            phase["seconds"] += elapsed; phase["items"] += items
+            for k, v in calls.items(): phase["calls"][k] = phase["calls"].get(k, 0) + v
+
+    def record_move(self, seconds, source, destination, method, nbytes):
+        with self._lock:
+            item = (seconds, source, destination, method, nbytes)
+            if len(self._slowest) < SLOWEST_MOVES: heapq.heappush(self._slowest, item)
+            elif seconds > self._slowest[0][0]: heapq.heapreplace(self._slowest, item)
+
+    def as_dict(self):
+        return {"kind": self.kind, "started": self.started, "seconds": round(self.seconds, 6), "log_seconds": round(self.log_seconds, 6),
+                "fields": self.fields,
+                "phases": {n: dict(p, seconds=round(p["seconds"], 6)) for n, p in self.phases.items()},
+                "slowest_moves": [{"seconds": round(s, 6), "source": src, "destination": dst, "method": m, "bytes": b}
+                                  for s, src, dst, m, b in sorted(self._slowest, reverse=True)]}
+
+    def summary_lines(self):
+        fields = ", ".join(f"{k}={v}" for k, v in self.fields.items())
+        lines = [f"Metrics: {self.kind} took {self.seconds:.3f}s ({fields}); {self.log_seconds:.3f}s in logging."]
+        for name, p in self.phases.items():
+            calls = ", ".join(f"{k[3:] if k.startswith('os.') else k}={v}" for k, v in sorted(p["calls"].items()))
+            lines.append(f"Metrics:   {name:<10} {p['seconds']:8.3f}s {p['items']:>8} item(s)" + (f"  {calls}" if calls else ""))
+        for s, src, dst, method, nbytes in sorted(self._slowest, reverse=True)[:3]:
+            lines.append(f"Metrics:   slow move {s * 1000:.1f} ms ({method}, {nbytes} bytes): {os.path.basename(src)}")
+        return lines
+
+
+class Metrics:
+    """Collects RunMetrics; see enable()."""
+    def __init__(self, json_path=None, echo=None):
+        self.json_path = json_path
+        self.echo = echo # Callable taking summary lines (the CLI prints them)
+        self.runs = []
+        self.log_seconds = 0.0
+        self.counter = CallCounter()
+
+    def begin(self, kind):
+        return RunMetrics(self, kind)
+
+    def end(self, run, **fields):
+        run.seconds = time.perf_counter() - run._perf_start
+        run.log_seconds = self.log_seconds - run._log_start
+        run.fields.update(fields)
+        self.runs.append(run)
+        lines = run.summary_lines()
+        for line in lines: core.log_action(line)
+        if self.echo is not None: self.echo(lines)
+        return run.as_dict()
+
+    def dump(self):
+        if not self.json_path: return
+        with open(self.json_path, "w", encoding='utf-8') as f:
+            json.dump({"pid": os.getpid(), "argv": sys.argv, "runs": [r.as_dict() for r in self.runs]}, f, indent=2)
+
+
+def enable(json_path=None, cprofile_path=None, echo=None):
+    """Turn instrumentation on for the rest of the process. Returns the Metrics."""
+    if core.METRICS is not None: return core.METRICS
+    metrics = Metrics(json_path, echo)
+    metrics.counter.__enter__()
+    log_sink = _TimedSink(core.LOG_SINK, metrics)
+    trace_sink = log_sink if core.TRACE_SINK is core.LOG_SINK else _TimedSink(core.TRACE_SINK, metrics)
+    core.configure_logging(log_sink=log_sink, trace_sink=trace_sink, event_log=_TimedSink(core.EVENT_LOG, metrics))
+    core.METRICS = metrics
+    atexit.register(metrics.dump)
+    if cprofile_path:
+        import cProfile
+        profiler = cProfile.Profile(); profiler.enable()
+        def dump_profile():
+            profiler.disable(); profiler.dump_stats(cprofile_path)
+        atexit.register(dump_profile)
+    core.log_action("Instrumentation enabled" + (f", JSON to {json_path}" if json_path else "") + (f", cProfile to {cprofile_path}" if cprofile_path else "") + ".")
+    return metrics
+
+def enable_from_env(echo=None):
+    """enable() if PLUGIN_ORGANIZER_METRICS or PLUGIN_ORGANIZER_CPROFILE is set."""
+    value = os.environ.get(METRICS_ENV, ""); cprofile_path = os.environ.get(CPROFILE_ENV) or None
+    if not value and not cprofile_path: return None
+    json_path = value if value and value.lower() not in ("1", "true", "yes", "on") else None
+    return enable(json_path, cprofile_path, echo)
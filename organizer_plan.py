@@ -0,0 +1,175 @@
+"""
+Saved move plans: review a plan, compare it with another one and apply it later.
+
+A MovePlan holds the same moves as a PlanResult, but stores the root once and
+groups the items by target folder, each with the reason it was matched. Plan
+files are JSON with one item per line, folders and items sorted by name, so
+two plan files also diff well with ordinary tools:
+
+    {"version": 1, "root": "C:\\...\\Plug-ins", "prefix": "", "suffix": "", ..., "folders": {
+      "Element": [
+        ["Element.aex", false, "Plugin file (.aex)", 1234, 1700000000.0],
+        ["Element Presets", true, "Followed by non-letter (' ')", null, null]
+      ]
+    }}
+
+apply_plan rescans the root first and refuses to run a stale plan: an item
+that vanished or changed, or a directory (or association rules file) that
+changed in a way that would change the plan, raises StalePlanError.
+"""
+import os
+import sys
+import json
+import time
+
+import organizer_core as core
+from organizer_core import log_action, flush_log
+
+PLAN_VERSION = 1
+AEX_REASON = "Plugin file (.aex)"
+RACY_SECONDS = 2.0 # Directory mtimes this close to the planning time are not trusted (coarse timestamps)
+
+
+class PlanEntry:
+    """One item to move into its target folder."""
+    __slots__ = ("name", "is_dir", "reason", "size", "mtime")
+
+    def __init__(self, name, is_dir, reason, size=None, mtime=None):
+        self.name = name; self.is_dir = is_dir; self.reason = reason; self.size = size; self.mtime = mtime
+
+
+class MovePlan:
+    """Planned moves for one root, grouped by target folder name."""
+    def __init__(self, root, prefix="", suffix="", created=None, root_mtime_ns=None, rules=None):
+        self.root = root
+        self.prefix = prefix; self.suffix = suffix
+        self.created = created if created is not None else time.time()
+        self.root_mtime_ns = root_mtime_ns # Root directory mtime when it was scanned for this plan
+        self.rules = rules                 # Fingerprint of the association rules the plan was made with
+        self.folders = {}                  # target folder name -> [PlanEntry, ...]
+
+    def __len__(self): return sum(len(entries) for entries in self.folders.values())
+
+    def add(self, folder_name, entry):
+        self.folders.setdefault(folder_name, []).append(entry)
+
+    def moves(self):
+        """[(source, destination), ...] for execute_moves."""
+        base = os.path.join(self.root, ""); sep = os.sep
+        return [(base + e.name, base + folder + sep + e.name) for folder, entries in self.folders.items() for e in entries]
+
+    def targets(self):
+        """item name -> target folder name."""
+        return {e.name: folder for folder, entries in self.folders.items() for e in entries}
+
+    @classmethod
+    def from_result(cls, plan):
+        """Build a MovePlan from a PlanResult, recovering the reason of every match."""
+        root = os.path.abspath(plan.directory)
+        rules = plan.rules or core.current_rules()
+        move_plan = cls(root, plan.prefix, plan.suffix, root_mtime_ns=plan.dir_mtime_ns, rules=rules.fingerprint)
+        aex_targets = {} # aex base (lower) -> target folder path, for classify_entry
+        for source, destination in plan.moves: # Pass 1 .aex moves come first
+            entry = plan.snapshot.get(source)
+            base = os.path.splitext(entry.name)[0]
+            folder_path = os.path.dirname(destination)
+            if entry.is_file and entry.name_lower.endswith('.aex') and base.lower() not in aex_targets \
+                    and os.path.basename(folder_path) == f"{plan.prefix}{base}{plan.suffix}":
+                aex_targets[base.lower()] = folder_path
+        aex_targets = rules.expand_targets(aex_targets) # Aliases share their plugin's folder
+        base_trie = core.BaseNameTrie(aex_targets.keys())
+        reasons = {} # Few distinct reason strings: share them
+        for source, destination in plan.moves:
+            entry = plan.snapshot.get(source)
+            folder_name = os.path.basename(os.path.dirname(destination))
+            if aex_targets.get(os.path.splitext(entry.name)[0].lower()) == os.path.dirname(destination) and entry.name_lower.endswith('.aex'):
+                reason = AEX_REASON
+            else:
+                decision = core.classify_entry(entry, base_trie, aex_targets, rules)
+                reason = decision[2] if decision is not None and decision[2] else "Unknown"
+            reason = reasons.setdefault(reason, reason)
+            move_plan.add(folder_name, PlanEntry(entry.name, entry.is_dir, reason, entry.size, entry.mtime))
+        return move_plan
+
+    # --- Plan files ---
+
+    def save(self, path):
+        header = {"version": PLAN_VERSION, "root": self.root, "prefix": self.prefix, "suffix": self.suffix,
+                  "created": self.created, "root_mtime_ns": self.root_mtime_ns, "rules": self.rules, "moves": len(self)}
+        lines = ["{" + json.dumps(header, ensure_ascii=False)[1:-1] + ', "folders": {']
+        folders = sorted(self.folders.items())
+        for index, (folder, entries) in enumerate(folders):
+            lines.append(f"  {json.dumps(folder, ensure_ascii=False)}: [")
+            rows = [json.dumps([e.name, e.is_dir, e.reason, e.size, e.mtime], ensure_ascii=False) for e in sorted(entries, key=lambda e: e.name)]
+            lines.append(",\n".join("    " + row for row in rows))
+            lines.append("  ]" + ("," if index < len(folders) - 1 else ""))
+        lines.append("}}")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding='utf-8') as f: f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a plan file. Raises OrganizerError if it is missing or not a plan file."""
+        try:
+            with open(path, "r", encoding='utf-8') as f: data = json.load(f)
+            if data.get("version") != PLAN_VERSION: raise core.OrganizerError(f"Unsupported plan file version in {path}.")
+            move_plan = cls(data["root"], data["prefix"], data["suffix"], data["created"], data["root_mtime_ns"], data.get("rules"))
+            intern = sys.intern
+            for folder, rows in data["folders"].items():
+                move_plan.folders[folder] = [PlanEntry(name, is_dir, intern(reason), size, mtime) for name, is_dir, reason, size, mtime in rows]
+            return move_plan
+        except OSError as e: raise core.OrganizerError(f"Could not read plan file {path}:\n{e}") from e
+        except (ValueError, KeyError, TypeError, AttributeError) as e: raise core.OrganizerError(f"Not a valid plan file: {path} ({e})") from e
+
+    # --- Validation and applying ---
+
+    def validate(self, snapshot=None):
+        """
+        Compare the plan with the directory (scanned now unless a snapshot is given).
+        Returns (snapshot, problems); problems is empty when the plan can be applied.
+        """
+        if snapshot is None:
+            if not core.FILESYSTEM.isdir(self.root): raise core.InvalidDirectoryError(f"Directory not found or invalid:\n{self.root}")
+            try: mtime_ns = core.FILESYSTEM.stat(self.root).st_mtime_ns; snapshot = core.scan_directory(self.root, with_stat=(os.name == 'nt'))
+            except OSError as e: raise core.ScanError(f"Could not scan directory {self.root}:\n{e}") from e
+        else: mtime_ns = None
+        problems = []
+        for entries in self.folders.values():
+            for e in entries:
+                current = snapshot.entries.get(e.name)
+                if current is None: problems.append(f"'{e.name}' is gone.")
+                elif current.is_dir != e.is_dir: problems.append(f"'{e.name}' changed type.")
+                elif not e.is_dir and None not in (e.size, current.size) and (e.size, e.mtime) != (current.size, current.mtime):
+                    problems.append(f"'{e.name}' was modified.")
+        # The listing or the rules changed (or cannot be trusted): the plan must still be what planning now would produce
+        if not problems and (mtime_ns is None or mtime_ns != self.root_mtime_ns or self.root_mtime_ns / 1e9 >= self.created - RACY_SECONDS
+                             or self.rules != core.current_rules().fingerprint):
+            fresh = MovePlan.from_result(core.plan_moves(self.root, self.prefix, self.suffix, snapshot=snapshot))
+            changes = diff_plans(self, fresh)
+            if changes: problems.append(f"The directory or the association rules changed: planning now gives {len(changes)} different move(s).")
+        return snapshot, problems
+
+
+def diff_plans(old, new):
+    """[(name, old folder or None, new folder or None), ...] for every item planned differently, sorted by name."""
+    old_targets = old.targets(); new_targets = new.targets()
+    return [(name, old_targets.get(name), new_targets.get(name)) for name in sorted(old_targets.keys() | new_targets.keys())
+            if old_targets.get(name) != new_targets.get(name)]
+
+
+def apply_plan(move_plan, undo_file=None, workers=None, progress=None, cancel=None):
+    """
+    Validate a (saved) plan against the directory and execute it with
+    core.execute_moves. Raises StalePlanError if the directory changed since
+    the plan was made; returns the ExecutionResult.
+    """
+    log_action(f"Applying saved plan for '{move_plan.root}' ({len(move_plan)} move(s), made {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(move_plan.created))}).")
+    snapshot, problems = move_plan.validate()
+    if problems:
+        for problem in problems: log_action(f"Stale plan: {problem}")
+        flush_log()
+        raise core.StalePlanError(f"The plan no longer matches {move_plan.root}:\n" + "\n".join(problems[:10])
+                                  + (f"\n... and {len(problems) - 10} more" if len(problems) > 10 else ""), problems)
+    return core.execute_moves(move_plan.moves(), snapshot, undo_file=undo_file, workers=workers,
+                              prefix=move_plan.prefix, suffix=move_plan.suffix, progress=progress, cancel=cancel)
@@ -0,0 +1,160 @@
+"""
+Preflight: check a whole plan before the first move, so a run either starts
+cleanly or does not start at all.
+
+Every target folder that already exists is listed once (no per-item exists
+calls); the listings and device numbers are handed to execute_moves, which
+reuses them. Checked:
+
+  * collisions: two items planned to the same destination, or to names that
+    differ only in case;
+  * destinations that already exist in their target folder;
+  * target folders that are an existing file, or that are themselves moved;
+  * moves of a folder into itself;
+  * write permission on every distinct source and target parent folder;
+  * free space on the target volume for items that have to be copied
+    across volumes.
+
+Sources that no longer exist are only warnings: execute_moves skips them.
+"""
+import os
+import sys
+
+from organizer_fs import RealFileSystem
+
+CASE_INSENSITIVE = os.name == 'nt' or sys.platform == 'darwin' # Default filesystems there ignore case
+
+
+class PreflightProblem:
+    """kind: 'collision', 'case_clash', 'exists', 'target_is_file', 'target_moved', 'self_move', 'permission', 'space' or 'missing'."""
+    __slots__ = ("kind", "source", "destination", "message", "fatal")
+
+    def __init__(self, kind, source, destination, message, fatal=True):
+        self.kind = kind; self.source = source; self.destination = destination; self.message = message; self.fatal = fatal
+
+    def as_dict(self):
+        return {"kind": self.kind, "source": self.source, "destination": self.destination, "message": self.message, "fatal": self.fatal}
+
+
+class PreflightReport:
+    """Outcome of preflight()."""
+    def __init__(self):
+        self.problems = []     # [PreflightProblem, ...]
+        self.listings = {}     # Existing target folder -> set of names inside it
+        self.devices = {}      # Folder -> st_dev (None if it could not be stat-ed)
+        self.copy_bytes = 0    # Bytes that have to be copied across volumes
+        self.checked = 0       # Moves checked
+
+    def add(self, kind, source, destination, message, fatal=True):
+        self.problems.append(PreflightProblem(kind, source, destination, message, fatal))
+
+    @property
+    def errors(self): return [p for p in self.problems if p.fatal]
+    @property
+    def warnings(self): return [p for p in self.problems if not p.fatal]
+    @property
+    def ok(self): return not self.errors
+
+
+def _tree_size(path, fs):
+    """Bytes in a file or folder tree (best effort)."""
+    try:
+        if not fs.isdir(path): return fs.lstat(path).st_size
+    except OSError: return 0
+    total = 0
+    try:
+        for parent, _, files in fs.walk(path):
+            for name in files:
+                try: total += fs.lstat(os.path.join(parent, name)).st_size
+                except OSError: pass
+    except OSError: pass
+    return total
+
+
+def preflight(moves, snapshot=None, fs=None):
+    """
+    Check [(source, destination), ...] as execute_moves would run them.
+    snapshot (the DirectorySnapshot the moves were planned from) answers
+    existence and type questions about the root without extra calls. fs is
+    the filesystem to check (default: the real one; see organizer_fs).
+    Returns a PreflightReport.
+    """
+    fs = fs or RealFileSystem()
+    report = PreflightReport()
+    devices = report.devices
+    def device(path):
+        if path not in devices:
+            try: devices[path] = fs.stat(path).st_dev
+            except OSError: devices[path] = None
+        return devices[path]
+    def scanned(path): # (known, entry): whether the snapshot can answer for path
+        if snapshot is None: return False, None
+        entry = snapshot.get(path)
+        return entry is not None or os.path.dirname(path) == snapshot.directory, entry
+
+    # --- Per item: self-moves, collisions, missing sources ---
+    folders = {}; destinations = {}; folded = {}; seen_sources = set(); parents = set()
+    for source, destination in moves:
+        if source in seen_sources: continue # execute_moves skips repeats
+        seen_sources.add(source); report.checked += 1
+        known, entry = scanned(source)
+        parent = snapshot.directory if entry is not None else os.path.dirname(source)
+        parents.add(parent)
+        folder_path = os.path.dirname(destination)
+        folders.setdefault(folder_path, []).append((source, destination, parent))
+        if os.path.normcase(destination).startswith(os.path.normcase(source) + os.sep):
+            report.add("self_move", source, destination, f"Cannot move '{os.path.basename(source)}' into itself ('{destination}')."); continue
+        key = os.path.normcase(destination)
+        if key in destinations:
+            report.add("collision", source, destination, f"'{os.path.basename(source)}' and '{os.path.basename(destinations[key])}' would both be moved to '{destination}'."); continue
+        destinations[key] = source
+        other = folded.setdefault(key.lower(), destination)
+        if other != destination:
+            report.add("case_clash", source, destination, f"'{destination}' and '{other}' differ only in case.", fatal=CASE_INSENSITIVE)
+        if (entry is None) if known else not fs.lexists(source):
+            report.add("missing", source, destination, f"'{source}' no longer exists; it will be skipped.", fatal=False)
+
+    # --- Per target folder: one listing; existing names, files in the way ---
+    source_keys = {os.path.normcase(s) for s in seen_sources}
+    for folder_path, items in folders.items():
+        folder_name = os.path.basename(folder_path)
+        if os.path.normcase(folder_path) in source_keys:
+            report.add("target_moved", "", folder_path, f"Target folder '{folder_name}' is itself planned to be moved.")
+        known, entry = scanned(folder_path)
+        exists = entry is not None if known else fs.lexists(folder_path)
+        if not exists: parents.add(os.path.dirname(folder_path)); continue # Created by execute_moves
+        if not (entry.is_dir if entry is not None else fs.isdir(folder_path)):
+            report.add("target_is_file", "", folder_path, f"Target folder '{folder_name}' cannot be created: a file with that name exists."); continue
+        try: names = report.listings[folder_path] = set(fs.listdir(folder_path))
+        except OSError as e: report.add("permission", "", folder_path, f"Cannot list target folder '{folder_name}': {e}"); continue
+        parents.add(folder_path)
+        lower_names = {n.lower(): n for n in names} if CASE_INSENSITIVE else {}
+        for source, destination, _ in items:
+            name = os.path.basename(destination)
+            existing = name if name in names else lower_names.get(name.lower())
+            if existing is not None:
+                report.add("exists", source, destination, f"'{existing}' already exists in '{folder_name}'; moving '{name}' there would replace or nest it.")
+
+    # --- Write permission on every distinct parent ---
+    for parent in sorted(parents):
+        if fs.isdir(parent) and not fs.access(parent, os.W_OK):
+            report.add("permission", "", parent, f"No write permission in '{parent}'.")
+
+    # --- Free space for cross-volume copies ---
+    needed = {} # device -> (bytes, a folder on it)
+    for folder_path, items in folders.items():
+        folder_dev = device(folder_path) if folder_path in report.listings else device(os.path.dirname(folder_path))
+        if folder_dev is None: continue
+        for source, _, parent in items:
+            if device(parent) == folder_dev: continue # Plain rename, no space needed
+            entry = snapshot.get(source) if snapshot is not None else None
+            size = entry.size if entry is not None and entry.size is not None and not entry.is_dir else _tree_size(source, fs)
+            total, _ = needed.get(folder_dev, (0, None))
+            needed[folder_dev] = (total + size, folder_path if folder_path in report.listings else os.path.dirname(folder_path))
+    for folder_dev, (size, folder_path) in needed.items():
+        report.copy_bytes += size
+        try: free = fs.disk_usage(folder_path).free
+        except OSError: continue
+        if size > free:
+            report.add("space", "", folder_path, f"Copying across volumes needs {size / 1048576:.1f} MiB but only {free / 1048576:.1f} MiB is free at '{folder_path}'.")
+    return report
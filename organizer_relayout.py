@@ -0,0 +1,236 @@
+"""
+Flatten or re-layout organized folders without the undo information.
+
+The organizer puts a plugin's .aex and its associated items into a folder
+named '{prefix}{base}{suffix}' in the Plug-ins root. find_organized
+recognizes such folders again from the tree alone: a folder whose name fits
+the scheme and that holds '{base}.aex'. Its items are classified with the
+same base-name rules as plan_moves (classify_entry with that one base and its
+aliases); items the organizer would not have moved there are strays and stay.
+
+plan_flatten moves every recognized item back to the root, and apply_relayout
+then removes the folders it emptied. plan_relayout renames each folder to a
+new scheme with one directory rename; only when a folder of the new name
+already exists are the items moved into it one by one. Either way the run is
+an ordinary execute_moves operation, so undo reverts it (recreating removed
+folders).
+
+detect_scheme guesses the prefix and suffix in use when they are not known.
+"""
+import os
+import collections
+
+import organizer_core as core
+from organizer_core import log_action, log_trace, log_event, flush_log
+
+
+class OrganizedFolder:
+    """A plugin folder the organizer created: its base name, the items that belong to the plugin and the strays."""
+    __slots__ = ("path", "name", "base", "items", "strays")
+
+    def __init__(self, path, name, base):
+        self.path = path; self.name = name; self.base = base
+        self.items = []  # [ScannedEntry, ...] the organizer would have moved here
+        self.strays = [] # [ScannedEntry, ...] anything else
+
+    def as_dict(self):
+        return {"path": self.path, "base": self.base, "items": [e.name for e in self.items], "strays": [e.name for e in self.strays]}
+
+
+class RelayoutPlan:
+    """Moves that flatten (new_prefix None) or rename the organized folders of one root."""
+    def __init__(self, directory, prefix, suffix, new_prefix=None, new_suffix=None):
+        self.directory = directory
+        self.prefix = prefix; self.suffix = suffix
+        self.new_prefix = new_prefix; self.new_suffix = new_suffix
+        self.snapshot = None    # DirectorySnapshot of the root
+        self.folders = []       # [OrganizedFolder, ...]
+        self.moves = []         # [(source, destination), ...] for execute_moves
+        self.renamed = 0        # Folders moved with one directory rename
+        self.unchanged = 0      # Folders that already have their new name
+        self.conflicts = []     # [(source, destination, message), ...] left in place
+        self.remove_after = []  # Folders emptied by the moves, removed by apply_relayout
+        self.event_op = None
+
+    @property
+    def flatten(self): return self.new_prefix is None
+
+    def as_plan_result(self):
+        """The moves as a PlanResult, for preview_moves and group_moves."""
+        plan = core.PlanResult(self.directory, self.new_prefix or "", self.new_suffix or "", self.moves, len(self.folders), self.snapshot)
+        plan.event_op = self.event_op
+        return plan
+
+    def as_dict(self):
+        return {"directory": self.directory, "prefix": self.prefix, "suffix": self.suffix, "flatten": self.flatten,
+                "new_prefix": self.new_prefix, "new_suffix": self.new_suffix, "folders": len(self.folders), "renamed": self.renamed,
+                "unchanged": self.unchanged, "moves": [{"source": s, "destination": d} for s, d in self.moves],
+                "conflicts": [{"source": s, "destination": d, "message": m} for s, d, m in self.conflicts], "remove_after": self.remove_after}
+
+
+def _name_key():
+    from organizer_preflight import CASE_INSENSITIVE
+    return str.lower if CASE_INSENSITIVE else str
+
+def _scan(directory):
+    if not core.FILESYSTEM.isdir(directory): raise core.InvalidDirectoryError(f"Directory not found or invalid:\n{directory}")
+    try: return core.scan_directory(directory, with_stat=(os.name == 'nt'))
+    except PermissionError as e: raise core.ScanPermissionError(f"Permission denied scanning directory:\n{directory}") from e
+    except OSError as e: raise core.ScanError(f"Could not scan directory {directory}:\n{e}") from e
+
+def _list(folder_path):
+    """[ScannedEntry, ...] of a folder, or None if it cannot be listed."""
+    try:
+        with core.FILESYSTEM.scandir(folder_path) as it: return [core.ScannedEntry(entry) for entry in it]
+    except OSError as e: log_action(f"Relayout: skipping folder '{folder_path}': {e}"); return None
+
+def _plugins_in(entries, rules):
+    """.aex base names (as spelled) among entries that the rules organize."""
+    return [os.path.splitext(e.name)[0] for e in entries
+            if e.is_file and e.name_lower.endswith('.aex') and not rules.ignores(e.name) and not rules.ignores_plugin(os.path.splitext(e.name)[0])]
+
+
+def detect_scheme(directory, snapshot=None, rules=None):
+    """
+    The (prefix, suffix) most folders of directory are named with, judged by
+    the .aex they hold ('[FX] Element/Element.aex' -> ('[FX] ', '')), or None
+    if no folder holds a plugin named within the folder's name.
+    """
+    rules = rules or core.current_rules()
+    snapshot = snapshot or _scan(directory)
+    schemes = collections.Counter()
+    for entry in snapshot.entries.values():
+        if not entry.is_dir: continue
+        for base in _plugins_in(_list(entry.path) or (), rules):
+            at = entry.name_lower.find(base.lower())
+            if at >= 0: schemes[(entry.name[:at], entry.name[at + len(base):])] += 1; break
+    if not schemes: return None
+    return schemes.most_common(1)[0][0]
+
+
+def find_organized(directory, prefix="", suffix="", snapshot=None, rules=None):
+    """
+    The folders of directory the organizer made with prefix and suffix, as
+    [OrganizedFolder, ...] sorted by name. One listing per folder whose name
+    fits the scheme; nothing else is read.
+    """
+    rules = rules or core.current_rules()
+    snapshot = snapshot or _scan(directory)
+    found = []
+    for entry in snapshot.entries.values():
+        name = entry.name
+        if not entry.is_dir or len(name) <= len(prefix) + len(suffix) or not name.startswith(prefix) or not name.endswith(suffix): continue
+        base = name[len(prefix):len(name) - len(suffix)]
+        if rules.ignores_plugin(base) or rules.ignores(name): continue
+        contents = _list(entry.path)
+        if contents is None or base.lower() not in {b.lower() for b in _plugins_in(contents, rules)}: continue
+
+        folder = OrganizedFolder(entry.path, name, base)
+        targets = rules.expand_targets({base.lower(): entry.path}) # Aliases belong to the same folder
+        base_trie = core.BaseNameTrie(targets.keys())
+        for item in contents:
+            decision = core.classify_entry(item, base_trie, targets, rules)
+            (folder.items if decision is not None and decision[2] is not None else folder.strays).append(item)
+        log_trace(f"Recognized organized folder '{name}' (plugin '{base}'): {len(folder.items)} item(s), {len(folder.strays)} other(s).")
+        found.append(folder)
+    found.sort(key=lambda f: f.name)
+    return found
+
+
+def _begin(plan, kind, rules):
+    plan.event_op = core.new_operation(kind)
+    log_event(plan.event_op, f"{kind}.begin", directory=plan.directory, prefix=plan.prefix, suffix=plan.suffix,
+              **({} if plan.flatten else {"new_prefix": plan.new_prefix, "new_suffix": plan.new_suffix}))
+    plan.snapshot = _scan(plan.directory)
+    plan.folders = find_organized(plan.directory, plan.prefix, plan.suffix, plan.snapshot, rules)
+
+def _end(plan, kind):
+    for source, destination, message in plan.conflicts: log_action(f"Relayout: leaving '{source}' in place: {message}")
+    log_event(plan.event_op, f"{kind}.end", folders=len(plan.folders), moves=len(plan.moves), renamed=plan.renamed, conflicts=len(plan.conflicts))
+    flush_log()
+    return plan
+
+def plan_flatten(directory, prefix="", suffix="", rules=None):
+    """
+    Moves that put the items of every organized folder back into directory.
+    Items whose name is taken in the root stay where they are (conflicts);
+    folders left empty are listed in remove_after. Returns a RelayoutPlan.
+    """
+    rules = rules or core.current_rules()
+    plan = RelayoutPlan(directory, prefix, suffix)
+    _begin(plan, "flatten", rules)
+    key = _name_key()
+    taken = {key(name) for name in plan.snapshot.entries} # Root names, then the names being moved there
+    for folder in plan.folders:
+        complete = not folder.strays
+        for item in folder.items:
+            destination = os.path.join(directory, item.name)
+            if key(item.name) in taken:
+                plan.conflicts.append((item.path, destination, f"'{item.name}' already exists in the root.")); complete = False; continue
+            taken.add(key(item.name))
+            plan.moves.append((item.path, destination))
+        if complete: plan.remove_after.append(folder.path)
+        elif folder.strays: log_action(f"Relayout: '{folder.name}' keeps {len(folder.strays)} item(s) that do not belong to '{folder.base}'.")
+    log_action(f"Flatten planned for '{directory}': {len(plan.moves)} item(s) from {len(plan.folders)} organized folder(s), {len(plan.conflicts)} conflict(s).")
+    return _end(plan, "flatten")
+
+def plan_relayout(directory, prefix, suffix, new_prefix, new_suffix, rules=None):
+    """
+    Moves that rename every organized folder from prefix/suffix to
+    new_prefix/new_suffix: one directory rename per folder, or, if a folder
+    with the new name already exists, its items moved into that folder one by
+    one (the emptied old folder is then listed in remove_after). Returns a
+    RelayoutPlan.
+    """
+    rules = rules or core.current_rules()
+    plan = RelayoutPlan(directory, prefix, suffix, new_prefix, new_suffix)
+    _begin(plan, "relayout", rules)
+    key = _name_key()
+    renaming = {key(folder.name) for folder in plan.folders}
+    taken = {key(name) for name in plan.snapshot.entries}
+    for folder in plan.folders:
+        new_name = f"{new_prefix}{folder.base}{new_suffix}"
+        destination = os.path.join(directory, new_name)
+        if new_name == folder.name: plan.unchanged += 1; continue
+        if key(new_name) == key(folder.name):
+            plan.conflicts.append((folder.path, destination, "The new name only differs in case.")); continue
+        if key(new_name) not in taken: # The usual case: one rename moves the whole folder
+            taken.add(key(new_name))
+            plan.moves.append((folder.path, destination)); plan.renamed += 1
+            log_trace(f"Relayout: '{folder.name}' -> '{new_name}'")
+            continue
+        existing = plan.snapshot.entries.get(new_name)
+        if key(new_name) in renaming or existing is None or not existing.is_dir: # Taken by another organized folder, a file or a name of this plan
+            plan.conflicts.append((folder.path, destination, f"'{new_name}' already exists in the root.")); continue
+        try: inside = {key(name) for name in core.FILESYSTEM.listdir(destination)}
+        except OSError as e: plan.conflicts.append((folder.path, destination, f"Cannot list '{new_name}': {e}")); continue
+        complete = not folder.strays
+        for item in folder.items: # Merge into the existing folder
+            if key(item.name) in inside:
+                plan.conflicts.append((item.path, os.path.join(destination, item.name), f"'{item.name}' already exists in '{new_name}'.")); complete = False; continue
+            plan.moves.append((item.path, os.path.join(destination, item.name)))
+        if complete: plan.remove_after.append(folder.path)
+    log_action(f"Relayout planned for '{directory}': {len(plan.folders)} organized folder(s), {plan.renamed} renamed whole, "
+               f"{len(plan.moves) - plan.renamed} item(s) merged into existing folders, {plan.unchanged} unchanged, {len(plan.conflicts)} conflict(s).")
+    return _end(plan, "relayout")
+
+
+def apply_relayout(plan, undo_file=None, workers=None, progress=None, cancel=None):
+    """
+    Execute a RelayoutPlan with core.execute_moves, then remove the folders it
+    emptied (result.removed_folders). The run is recorded and undone like any
+    organization. Returns the ExecutionResult.
+    """
+    result = core.execute_moves(plan.moves, plan.snapshot, undo_file=undo_file, workers=workers, prefix=plan.new_prefix or "",
+                                suffix=plan.new_suffix or "", progress=progress, cancel=cancel)
+    fs = core.FILESYSTEM
+    for folder_path in plan.remove_after:
+        try:
+            if fs.listdir(folder_path): continue # An item could not be moved
+            fs.rmdir(folder_path); result.removed_folders.append(folder_path)
+            log_action(f"Removed emptied folder: {folder_path}")
+        except OSError as e: log_action(f"Relayout: could not remove folder '{folder_path}': {e}")
+    import organizer_snapshot
+    organizer_snapshot.forget(plan.directory) # Its folder names changed
+    flush_log()
+    return result
@@ -0,0 +1,144 @@
+"""
+Association rules: which items belong to which plugin.
+
+Built-in rules: an item belongs to the plugin whose base name prefixes it when
+the base is followed by the end of the name, the file extension, a non-letter
+or a known suffix ('presets', 'lib', ...); .aex files whose base starts with
+'_' are not organized. organizer_rules.json next to the program extends them
+(every key is optional):
+
+    {
+      "suffixes": ["fx", "assets"],
+      "aliases": {"Particular": ["TC_Particular", "TCParticular"]},
+      "mappings": {"RSMB_shared.dll": "RSMB"},
+      "ignore": ["*.tmp", "Thumbs.db"],
+      "ignore_plugins": ["_*", "Beta*"]
+    }
+
+  suffixes        extra known suffixes
+  aliases         other name prefixes of a plugin's items, per plugin base name
+  mappings        item name -> plugin base name, for items no prefix rule finds
+  ignore          item names (globs, case-insensitive) that are never moved
+  ignore_plugins  .aex base names (globs) that are not organized; replaces the default ["_*"]
+
+Rules are compiled once: all known suffixes into one character trie, walked
+once per item (the cost depends on the item name, not on the number of
+suffixes), and each glob list into a single regex. load_rules keeps the
+compiled Rules per config file and only rebuilds them when the file changes.
+"""
+import os
+import re
+import json
+import fnmatch
+import hashlib
+import threading
+
+KNOWN_SUFFIXES = ["license", "presets", "textures", "data", "config",
+                  "key", "lib", "sdk", "settings", "pack", "bundle",
+                  "docs", "help", "support", "extra", "install"]
+DEFAULT_IGNORE_PLUGINS = ["_*"] # Internal/temp plugins
+CONFIG_KEYS = ("suffixes", "aliases", "mappings", "ignore", "ignore_plugins")
+_END = "" # Terminal key in the suffix trie
+
+
+def _compile_globs(patterns):
+    """One case-insensitive regex matching any of the glob patterns, or None."""
+    if not patterns: return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns), re.IGNORECASE)
+
+
+class Rules:
+    """Compiled association rules. Rules() are the built-in ones."""
+    def __init__(self, suffixes=(), aliases=None, mappings=None, ignore=(), ignore_plugins=None):
+        self.config = {"suffixes": list(suffixes), "aliases": dict(aliases or {}), "mappings": dict(mappings or {}),
+                       "ignore": list(ignore), "ignore_plugins": list(DEFAULT_IGNORE_PLUGINS if ignore_plugins is None else ignore_plugins)}
+        self.suffixes = list(KNOWN_SUFFIXES) + [s.lower() for s in suffixes if s.lower() not in KNOWN_SUFFIXES]
+        self._suffix_trie = {}
+        for known in self.suffixes:
+            node = self._suffix_trie
+            for ch in known: node = node.setdefault(ch, {})
+            node[_END] = known
+        self.aliases = {alias.lower(): base.lower() for base, names in self.config["aliases"].items() for alias in names} # alias -> base
+        self.mappings = {name.lower(): base.lower() for name, base in self.config["mappings"].items()}                     # item -> base
+        self._ignore = _compile_globs(self.config["ignore"])
+        self._ignore_plugins = _compile_globs(self.config["ignore_plugins"])
+        self.fingerprint = hashlib.sha1(json.dumps(self.config, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def from_config(cls, data):
+        """Rules from a parsed config dict. Raises ValueError if it is malformed."""
+        if not isinstance(data, dict): raise ValueError("the top level must be an object")
+        unknown = set(data) - set(CONFIG_KEYS)
+        if unknown: raise ValueError(f"unknown key(s): {', '.join(sorted(unknown))}")
+        def strings(key):
+            value = data.get(key, [])
+            if not isinstance(value, list) or not all(isinstance(v, str) and v for v in value): raise ValueError(f"'{key}' must be a list of names")
+            return value
+        aliases = data.get("aliases", {}); mappings = data.get("mappings", {})
+        if not isinstance(aliases, dict) or not all(isinstance(v, list) and all(isinstance(a, str) and a for a in v) for v in aliases.values()):
+            raise ValueError("'aliases' must map plugin names to lists of names")
+        if not isinstance(mappings, dict) or not all(isinstance(v, str) and v for v in mappings.values()):
+            raise ValueError("'mappings' must map item names to plugin names")
+        return cls(strings("suffixes"), aliases, mappings, strings("ignore"),
+                   strings("ignore_plugins") if "ignore_plugins" in data else None)
+
+    def ignores(self, name):
+        """True for items that are never moved."""
+        return self._ignore is not None and self._ignore.match(name) is not None
+
+    def ignores_plugin(self, base_name):
+        """True for .aex base names that are not organized."""
+        return self._ignore_plugins is not None and self._ignore_plugins.match(base_name) is not None
+
+    def expand_targets(self, base_to_target):
+        """base -> target folder, plus every alias of a present base (real bases win)."""
+        if not self.aliases: return base_to_target
+        expanded = dict(base_to_target)
+        for alias, base in self.aliases.items():
+            if base in base_to_target: expanded.setdefault(alias, base_to_target[base])
+        return expanded
+
+    def reason(self, item_name_lower, base_lower):
+        """
+        Why item_name_lower belongs to base_lower (which must prefix it), or None
+        if it is not related.
+        """
+        match_len = len(base_lower)
+        item_len = len(item_name_lower)
+
+        if item_len == match_len: return "Exact name match" # Likely a folder
+        if os.path.splitext(item_name_lower)[0] == base_lower: return "Exact base name match (file)"
+
+        follow_char = item_name_lower[match_len]
+        if not follow_char.isalpha(): return f"Followed by non-letter ('{follow_char}')"
+
+        node = self._suffix_trie; found = None # One walk finds every known suffix at match_len
+        for index in range(match_len, item_len):
+            node = node.get(item_name_lower[index])
+            if node is None: break
+            if _END in node and (index + 1 == item_len or not item_name_lower[index + 1].isalpha()): found = node[_END]
+        return f"Followed by known suffix ('{found}')" if found else None
+
+
+DEFAULT_RULES = Rules()
+_cache = {} # path -> ((mtime_ns, size), Rules)
+_cache_lock = threading.Lock()
+
+def load_rules(path):
+    """
+    Compiled rules for the config file at path (the built-in rules if it does
+    not exist). Cached until the file's mtime or size changes. Raises ValueError
+    (with the file name) if the file cannot be used.
+    """
+    try: st = os.stat(path)
+    except FileNotFoundError: return DEFAULT_RULES
+    except OSError as e: raise ValueError(f"Could not read rules file {path}: {e}") from e
+    key = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == key: return cached[1]
+    try:
+        with open(path, "r", encoding='utf-8') as f: rules = Rules.from_config(json.load(f))
+    except (OSError, ValueError) as e: raise ValueError(f"Invalid rules file {path}: {e}") from e
+    with _cache_lock: _cache[path] = (key, rules)
+    return rules
@@ -0,0 +1,238 @@
+"""
+Incremental re-organization.
+
+After each plan (and after a successful apply) the entries of the root, their
+types and the plan decisions are saved to a per-root snapshot file. The next
+plan_incremental call for the same root and prefix/suffix:
+
+  * reuses the saved plan without listing the directory at all when the
+    directory's mtime is unchanged (and was not "racy", i.e. too close to the
+    moment the snapshot was taken to be trusted);
+  * otherwise lists the directory once and only classifies entries that were
+    added or changed type, plus old entries that a new or removed .aex base
+    could affect. Everything else keeps its saved decision.
+
+Anything unusual (no snapshot, other prefix/suffix or association rules, a
+new .aex sharing a base name with an existing one, unreadable snapshot) falls back to a full
+core.plan_moves, whose result is then saved.
+"""
+import os
+import json
+import time
+import hashlib
+
+import organizer_core as core
+from organizer_core import log_action, flush_log
+
+SNAPSHOT_DIR = os.path.join(core.SCRIPT_DIR, "snapshots")
+SNAPSHOT_VERSION = 1
+RACY_SECONDS = 2.0 # Directory mtimes this close to the snapshot time are not trusted (coarse timestamps)
+
+
+def snapshot_file(directory):
+    """Snapshot file inside SNAPSHOT_DIR, keyed by the normalized root path."""
+    key = os.path.normcase(os.path.abspath(directory))
+    return os.path.join(SNAPSHOT_DIR, f"snapshot_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.json")
+
+
+class SavedSnapshot:
+    """What was known about a root the last time it was planned or organized."""
+    def __init__(self, directory, prefix, suffix, dir_mtime_ns, taken_at, rows, bases, targets, rules=None):
+        self.directory = directory
+        self.prefix = prefix; self.suffix = suffix
+        self.rules = rules     # Fingerprint of the association rules the decisions were made with
+        self.dir_mtime_ns = dir_mtime_ns
+        self.taken_at = taken_at
+        self.rows = rows       # [[name, is_dir, is_file, size, mtime], ...] in listing order
+        self.bases = bases     # aex base (lower) -> name of the .aex file that defines it
+        self.targets = targets # item name -> target folder name, for every planned move
+
+    def scanned_entries(self):
+        base = os.path.join(self.directory, "") # Same paths os.scandir would produce
+        from_values = core.ScannedEntry.from_values
+        return [from_values(name, base + name, is_dir, is_file, size, mtime) for name, is_dir, is_file, size, mtime in self.rows]
+
+    @property
+    def racy(self):
+        return self.dir_mtime_ns / 1e9 >= self.taken_at - RACY_SECONDS
+
+    def save(self):
+        path = snapshot_file(self.directory)
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        data = {"version": SNAPSHOT_VERSION, "directory": self.directory, "prefix": self.prefix, "suffix": self.suffix, "rules": self.rules,
+                "dir_mtime_ns": self.dir_mtime_ns, "taken_at": self.taken_at,
+                "entries": self.rows,
+                "bases": self.bases, "targets": self.targets}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding='utf-8') as f: f.write(json.dumps(data)) # One C-encoder pass, not json.dump's chunked writes
+        os.replace(tmp_path, path) # Never leave a half-written snapshot behind
+
+    @classmethod
+    def load(cls, directory):
+        """The saved snapshot of directory, or None if there is none or it cannot be used."""
+        try:
+            with open(snapshot_file(directory), "r", encoding='utf-8') as f: data = json.load(f)
+            if data.get("version") != SNAPSHOT_VERSION: return None
+            return cls(directory, data["prefix"], data["suffix"], data["dir_mtime_ns"], data["taken_at"],
+                       data["entries"], data["bases"], data["targets"], data.get("rules"))
+        except FileNotFoundError: return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log_action(f"Ignoring unreadable snapshot for '{directory}': {e}"); return None
+
+def forget(directory):
+    """Drop the saved snapshot of directory (the next plan is a full one)."""
+    try: os.remove(snapshot_file(directory))
+    except FileNotFoundError: pass
+    except OSError as e: log_action(f"Could not remove snapshot for '{directory}': {e}")
+
+
+def _aex_base(entry, rules):
+    """Base name if entry is a .aex file that defines a target folder in pass 1, else None."""
+    if not (entry.is_file and entry.name_lower.endswith('.aex')): return None
+    base = os.path.splitext(entry.name)[0]
+    return None if rules.ignores_plugin(base) or rules.ignores(entry.name) else base
+
+def _plan_from(snapshot, prefix, suffix, bases, targets, rules):
+    """Build a PlanResult in the same order as plan_moves: pass 1 .aex files first, then associated items."""
+    plan = core.PlanResult(snapshot.directory, prefix, suffix, aex_count=len(bases), snapshot=snapshot)
+    plan.rules = rules
+    if not targets: return plan
+    base = os.path.join(snapshot.directory, ""); sep = os.sep
+    aex_names = set(bases.values())
+    movers = [e for e in snapshot.entries.values() if e.name in targets]
+    plan.moves = [(e.path, base + targets[e.name] + sep + e.name) for e in movers if e.name in aex_names]
+    plan.moves += [(e.path, base + targets[e.name] + sep + e.name) for e in movers if e.name not in aex_names]
+    return plan
+
+def _rows(entries):
+    return [[e.name, e.is_dir, e.is_file, e.size, e.mtime] for e in entries]
+
+def _save(directory, prefix, suffix, dir_mtime_ns, taken_at, entries, bases, targets, rules):
+    try: SavedSnapshot(directory, prefix, suffix, dir_mtime_ns, taken_at, _rows(entries), bases, targets, rules.fingerprint).save()
+    except OSError as e: log_action(f"Could not save snapshot for '{directory}': {e}")
+
+def _full_plan(directory, prefix, suffix, progress, cancel, rules):
+    taken_at = time.time()
+    plan = core.plan_moves(directory, prefix, suffix, progress=progress, cancel=cancel, rules=rules) # Raises the usual typed errors
+    remember_plan(plan, taken_at)
+    return plan
+
+def remember_plan(plan, taken_at):
+    """Save the snapshot of a full plan (from plan_moves or a finished MoveStream) scanned at taken_at."""
+    if plan.dir_mtime_ns is None: return # Planned from a snapshot given by the caller
+    rules = plan.rules or core.current_rules(); prefix = plan.prefix; suffix = plan.suffix
+    # Recover the plan decisions: the .aex file defining a base has that base's folder name
+    bases = {}; targets = {}
+    for source, destination in plan.moves:
+        entry = plan.snapshot.get(source); name = entry.name; folder_name = os.path.basename(os.path.dirname(destination))
+        targets[name] = folder_name
+        base = _aex_base(entry, rules)
+        if base is not None and base.lower() not in bases and folder_name == f"{prefix}{base}{suffix}": bases[base.lower()] = name
+    _save(plan.directory, prefix, suffix, plan.dir_mtime_ns, taken_at, list(plan.snapshot.entries.values()), bases, targets, rules)
+
+
+def _log_plan_events(plan, added, removed):
+    op = plan.event_op = core.new_operation("plan")
+    core.log_event(op, "plan.begin", directory=plan.directory, prefix=plan.prefix, suffix=plan.suffix, incremental=True)
+    core.log_event(op, "plan.end", entries=len(plan.snapshot.entries), aex=plan.aex_count, moves=len(plan.moves),
+                   added=added, removed=removed, classified=plan.changed)
+
+def plan_incremental(directory, prefix, suffix, progress=None, cancel=None):
+    """
+    Like core.plan_moves, but only (re)classifies what changed since the saved
+    snapshot of directory. plan.changed is the number of entries classified
+    (None after a full plan). Raises the same errors as plan_moves.
+    """
+    directory = os.path.abspath(directory)
+    rules = core.current_rules()
+    saved = SavedSnapshot.load(directory)
+    if saved is None or saved.prefix != prefix or saved.suffix != suffix or saved.rules != rules.fingerprint:
+        return _full_plan(directory, prefix, suffix, progress, cancel, rules)
+    try: st = core.FILESYSTEM.stat(directory); taken_at = time.time()
+    except OSError: return _full_plan(directory, prefix, suffix, progress, cancel, rules)
+    run = core.metrics_begin("plan"); mark = core.metrics_mark(run)
+
+    if st.st_mtime_ns == saved.dir_mtime_ns and not saved.racy:
+        plan = _plan_from(core.DirectorySnapshot.from_entries(directory, saved.scanned_entries()), prefix, suffix, saved.bases, saved.targets, rules)
+        plan.changed = 0; plan.dir_mtime_ns = st.st_mtime_ns
+        log_action(f"Directory unchanged since its snapshot: reusing {len(plan.moves)} planned move(s) for '{directory}'.")
+        _log_plan_events(plan, added=0, removed=0)
+        plan.metrics = core.metrics_end(run, entries=len(saved.rows), moves=len(plan.moves), incremental=True, classified=0)
+        flush_log()
+        return plan
+
+    try: current = core.scan_directory(directory, with_stat=(os.name == 'nt'))
+    except OSError: return _full_plan(directory, prefix, suffix, progress, cancel, rules)
+    core.metrics_phase(run, "scan", mark, len(current.entries)); mark = core.metrics_mark(run)
+    old = {row[0]: (row[1], row[2]) for row in saved.rows} # name -> (is_dir, is_file)
+    added = [e for e in current.entries.values() if old.get(e.name) != (e.is_dir, e.is_file)]
+    removed = (old.keys() - current.entries.keys()) | {e.name for e in added if e.name in old} # Gone, or changed type
+
+    # --- Base names that appear or disappear ---
+    bases = {b: name for b, name in saved.bases.items() if name not in removed}
+    removed_bases = set(saved.bases) - set(bases)
+    new_bases = {}
+    for entry in added:
+        base = _aex_base(entry, rules)
+        if base is None: continue
+        if base.lower() in bases or base.lower() in new_bases: return _full_plan(directory, prefix, suffix, progress, cancel, rules) # First-one-wins order matters
+        new_bases[base.lower()] = entry.name
+    bases.update(new_bases)
+
+    # --- Entries to classify: new ones, and old ones a changed base (or its alias or mapping) matches ---
+    affected = {e.name: e for e in added}
+    changed_bases = set(new_bases) | removed_bases
+    if changed_bases:
+        changed_trie = core.BaseNameTrie(changed_bases | {a for a, b in rules.aliases.items() if b in changed_bases})
+        mapped = {name for name, b in rules.mappings.items() if b in changed_bases}
+        for entry in current.entries.values():
+            if entry.name in affected or not (entry.name_lower in mapped or changed_trie.prefixes_of(entry.name_lower)): continue
+            base = _aex_base(entry, rules)
+            if base is not None and base.lower() in removed_bases: return _full_plan(directory, prefix, suffix, progress, cancel, rules) # Another .aex takes over this base
+            affected[entry.name] = entry
+
+    targets = {name: folder for name, folder in saved.targets.items() if name not in removed and name not in affected}
+    base_to_target = {b: os.path.join(directory, f"{prefix}{os.path.splitext(name)[0]}{suffix}") for b, name in bases.items()}
+    base_to_target = rules.expand_targets(base_to_target) # Aliases share their plugin's folder
+    base_trie = core.BaseNameTrie(base_to_target.keys())
+    aex_names = set(bases.values())
+    for index, entry in enumerate(affected.values()):
+        if cancel is not None and not index & 255 and cancel.is_set(): raise core.OperationCancelled("Planning was cancelled.")
+        if entry.name in aex_names: targets[entry.name] = os.path.basename(base_to_target[entry.name_lower[:-4]]); continue
+        decision = core.classify_entry(entry, base_trie, base_to_target, rules)
+        if decision is not None and decision[2] is not None: targets[entry.name] = os.path.basename(decision[1])
+
+    entries = current.entries.values()
+    core.metrics_phase(run, "classify", mark, len(affected))
+    plan = _plan_from(current, prefix, suffix, bases, targets, rules)
+    plan.changed = len(affected); plan.dir_mtime_ns = st.st_mtime_ns
+    if progress is not None: progress(core.Progress("plan", len(entries), len(entries)))
+    log_action(f"Incremental plan for '{directory}': {len(added)} new/changed and {len(removed)} removed entries, "
+               f"{len(affected)} of {len(entries)} classified; {len(plan.moves)} move(s).")
+    _log_plan_events(plan, added=len(added), removed=len(removed))
+    plan.metrics = core.metrics_end(run, entries=len(entries), moves=len(plan.moves), incremental=True, classified=len(affected))
+    if added or removed or st.st_mtime_ns != saved.dir_mtime_ns or saved.racy: # Otherwise the saved snapshot is still exact
+        _save(directory, prefix, suffix, st.st_mtime_ns, taken_at, entries, bases, targets, rules)
+    flush_log()
+    return plan
+
+
+def remember_applied(plan, result):
+    """
+    Update the snapshot after execute_moves. A fully successful run leaves no
+    .aex files (and so nothing to plan) in the root; the snapshot then holds the
+    remaining entries plus the created folders. Any other outcome drops it.
+    """
+    if not result.moved_count: return
+    if plan.snapshot is None: forget(plan.directory); return # Not planned from a scan (e.g. moving duplicates aside)
+    if not result.ok or len(result.undo_mapping) != len({source for source, _ in plan.moves}):
+        forget(plan.directory); return
+    moved = set(result.undo_mapping.values())
+    entries = [e for e in plan.snapshot.entries.values() if e.path not in moved]
+    known = {e.name for e in entries}
+    for folder_path in {os.path.dirname(destination) for _, destination in plan.moves}:
+        name = os.path.basename(folder_path)
+        if name not in known: entries.append(core.ScannedEntry.from_values(name, folder_path, True, False)); known.add(name)
+    try: st = core.FILESYSTEM.stat(plan.directory)
+    except OSError: forget(plan.directory); return
+    _save(plan.directory, plan.prefix, plan.suffix, st.st_mtime_ns, time.time(), entries, {}, {}, plan.rules or core.current_rules())
@@ -0,0 +1,193 @@
+"""
+Cross-volume moves: copy, verify, then delete the source, resumably.
+
+A rename cannot cross volumes, so execute_moves hands such items to
+transfer(). The item is copied into a staging name next to its destination
+('Textures.organizer-partial'), file by file with the kernel's copy
+primitives where there are any (os.copy_file_range, then os.sendfile on
+Linux) and large-buffer reads and writes elsewhere. Every copied file is
+verified (size, or size and SHA-256 with verify="hash") and then gets the
+source's timestamps, which marks it complete; the checkpoint callback is
+called for it (execute_moves records it in the undo journal). Only when the
+whole tree has been checked against the source again is the staging copy
+renamed to the destination and the source deleted.
+
+An interrupted transfer leaves the staging copy behind. The next transfer
+of the same item skips files that are complete (same size and mtime as the
+source) and continues a partially copied file from where it stopped, unless
+the source file changed since.
+"""
+import os
+import stat
+import errno
+import shutil
+import hashlib
+
+STAGING_SUFFIX = ".organizer-partial"
+BUFFER_SIZE = 8 * 1024 * 1024  # Buffered fallback and per-call copy size
+CANCEL_CHECK_BYTES = 64 * 1024 * 1024 # A cancel request is noticed within this many bytes of one file
+VERIFY_MODES = ("size", "hash")
+_NO_FAST_COPY = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF, errno.ENOTSOCK)
+
+
+class TransferError(OSError):
+    """The copy could not be verified; the source is left untouched."""
+
+class TransferCancelled(Exception):
+    """cancel was set during a transfer; the staging copy is kept for resuming."""
+
+
+class TransferResult:
+    __slots__ = ("files", "bytes_copied", "bytes_resumed", "method")
+
+    def __init__(self):
+        self.files = 0          # Files in the item
+        self.bytes_copied = 0   # Bytes written by this transfer
+        self.bytes_resumed = 0  # Bytes already in the staging copy from an interrupted one
+        self.method = None      # Fastest copy primitive that was used
+
+    @property
+    def nbytes(self): return self.bytes_copied + self.bytes_resumed
+
+
+def staging_path(destination):
+    return destination + STAGING_SUFFIX
+
+def discard_partial(destination):
+    """Remove the staging copy an interrupted transfer to destination left behind. Returns True if there was one."""
+    path = staging_path(destination)
+    if os.path.isdir(path) and not os.path.islink(path): shutil.rmtree(path)
+    elif os.path.lexists(path): os.remove(path)
+    else: return False
+    return True
+
+
+# --- Copying one file ---
+
+def _copy_range(fin, fout, offset, size, result, cancel):
+    """Copy bytes offset..size of fin to the same offsets of fout with the fastest primitive that works."""
+    position = offset; next_check = offset + CANCEL_CHECK_BYTES; methods = []
+    if hasattr(os, "copy_file_range"): methods.append("copy_file_range")
+    if hasattr(os, "sendfile") and os.name != 'nt': methods.append("sendfile")
+    methods.append("buffered")
+    for method in methods:
+        try:
+            if method == "buffered":
+                fin.seek(position); fout.seek(position)
+                buffer = bytearray(BUFFER_SIZE); view = memoryview(buffer)
+                while position < size:
+                    count = fin.readinto(view)
+                    if not count: break # Source shrank while copying; caught by the verification
+                    fout.write(view[:count]); position += count
+                    if position >= next_check:
+                        next_check += CANCEL_CHECK_BYTES
+                        if cancel is not None and cancel.is_set(): raise TransferCancelled()
+            else:
+                in_fd = fin.fileno(); out_fd = fout.fileno()
+                os.lseek(out_fd, position, os.SEEK_SET)
+                while position < size:
+                    count = min(BUFFER_SIZE, size - position)
+                    if method == "copy_file_range": copied = os.copy_file_range(in_fd, out_fd, count, position)
+                    else: copied = os.sendfile(out_fd, in_fd, position, count)
+                    if not copied: break # Unsupported here or end of file: the next method takes over
+                    position += copied
+                    if position >= next_check:
+                        next_check += CANCEL_CHECK_BYTES
+                        if cancel is not None and cancel.is_set(): raise TransferCancelled()
+            if position > offset and result.method is None: result.method = method
+            if position >= size: break
+        except OSError as e:
+            if e.errno not in _NO_FAST_COPY or method == "buffered": raise
+    return position - offset
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(BUFFER_SIZE), b""): digest.update(chunk)
+    return digest.hexdigest()
+
+def _copy_file(source, target, result, verify, cancel):
+    """Copy (or finish copying) one file to target and verify it. Returns True if it was already complete."""
+    st = os.stat(source)
+    try: existing = os.stat(target)
+    except FileNotFoundError: existing = None
+    if existing is not None and existing.st_size == st.st_size and existing.st_mtime_ns == st.st_mtime_ns:
+        result.bytes_resumed += st.st_size; return True # Completed by an interrupted transfer
+    # A partial copy is only continued if the source has not been modified since it was written
+    offset = existing.st_size if existing is not None and existing.st_size < st.st_size and existing.st_mtime_ns >= st.st_mtime_ns else 0
+    for attempt in (1, 2):
+        with open(source, "rb") as fin, open(target, "r+b" if offset else "wb") as fout:
+            if offset: fout.truncate(offset)
+            copied = _copy_range(fin, fout, offset, st.st_size, result, cancel)
+        result.bytes_resumed += offset; result.bytes_copied += copied
+        size = os.stat(target).st_size
+        if size == st.st_size and (verify != "hash" or _sha256(source) == _sha256(target)): break
+        if attempt == 2: raise TransferError(errno.EIO, f"Copy of '{source}' does not match the source ({size} of {st.st_size} bytes)")
+        result.bytes_resumed -= offset; offset = 0 # Start this file over once
+    shutil.copystat(source, target) # Source timestamps: marks the file complete for a resumed transfer
+    return False
+
+
+# --- Whole items ---
+
+def _tree_files(root):
+    """{relative path: size} of the files below root (symlinks count as size 0)."""
+    found = {}
+    for parent, dirs, files in os.walk(root):
+        rel_parent = os.path.relpath(parent, root)
+        for name in files + [d for d in dirs if os.path.islink(os.path.join(parent, d))]:
+            path = os.path.join(parent, name); rel = os.path.normpath(os.path.join(rel_parent, name))
+            found[rel] = 0 if os.path.islink(path) else os.lstat(path).st_size
+    return found
+
+def transfer(source, destination, checkpoint=None, verify="size", cancel=None):
+    """
+    Move the file or folder source to destination (which must not exist) by
+    copying. checkpoint(relative_path, nbytes) is called after each verified
+    file, and checkpoint(None, total_bytes) once the copy is complete and in
+    place, just before the source is deleted. Raises TransferError if the copy
+    cannot be verified, TransferCancelled if cancel was set; in both cases the
+    source is untouched. Returns a TransferResult.
+    """
+    if verify not in VERIFY_MODES: raise ValueError(f"verify must be one of {VERIFY_MODES}")
+    result = TransferResult()
+    staging = staging_path(destination)
+    source_stat = os.lstat(source)
+    if stat.S_ISLNK(source_stat.st_mode) or not stat.S_ISDIR(source_stat.st_mode):
+        if stat.S_ISLNK(source_stat.st_mode):
+            if os.path.lexists(staging): os.remove(staging)
+            os.symlink(os.readlink(source), staging)
+        else:
+            _copy_file(source, staging, result, verify, cancel)
+            if checkpoint is not None: checkpoint(os.path.basename(source), source_stat.st_size)
+        result.files = 1
+    else:
+        for parent, dirs, files in os.walk(source):
+            rel_parent = os.path.relpath(parent, source)
+            target_parent = os.path.normpath(os.path.join(staging, rel_parent))
+            os.makedirs(target_parent, exist_ok=True)
+            for name in sorted(files) + sorted(d for d in dirs if os.path.islink(os.path.join(parent, d))):
+                if cancel is not None and cancel.is_set(): raise TransferCancelled()
+                path = os.path.join(parent, name); target = os.path.join(target_parent, name)
+                result.files += 1
+                if os.path.islink(path):
+                    if os.path.lexists(target): os.remove(target)
+                    os.symlink(os.readlink(path), target); continue
+                resumed = _copy_file(path, target, result, verify, cancel)
+                if checkpoint is not None and not resumed: checkpoint(os.path.normpath(os.path.join(rel_parent, name)), os.path.getsize(target))
+            dirs[:] = [d for d in dirs if not os.path.islink(os.path.join(parent, d))]
+        # The whole tree once more: nothing added, removed or resized in the source while copying
+        source_files = _tree_files(source); copied_files = _tree_files(staging)
+        for rel in copied_files.keys() - source_files.keys(): # Left by an interrupted transfer of an older source
+            os.remove(os.path.join(staging, rel)); del copied_files[rel]
+        if source_files != copied_files:
+            differing = sorted(source_files.keys() ^ copied_files.keys() | {k for k in source_files.keys() & copied_files.keys() if source_files[k] != copied_files[k]})
+            raise TransferError(errno.EIO, f"Copy of '{source}' does not match the source ({len(differing)} file(s) differ, e.g. '{differing[0]}')")
+        for parent, _, _ in os.walk(source, topdown=False): # Folder timestamps last: copying into them changed them
+            shutil.copystat(parent, os.path.normpath(os.path.join(staging, os.path.relpath(parent, source))), follow_symlinks=False)
+    if os.path.lexists(destination): raise FileExistsError(errno.EEXIST, "Destination appeared during the transfer", destination)
+    os.rename(staging, destination) # Same volume: the complete copy appears at once
+    if checkpoint is not None: checkpoint(None, result.nbytes)
+    if stat.S_ISDIR(source_stat.st_mode) and not stat.S_ISLNK(source_stat.st_mode): shutil.rmtree(source)
+    else: os.remove(source)
+    return result
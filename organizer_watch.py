@@ -0,0 +1,192 @@
+"""
+Watch mode: keep a Plug-ins directory organized while installers add plugins.
+
+The directory is watched with native change notifications on Windows
+(FindFirstChangeNotification) and by polling its mtime elsewhere; both block
+or sleep between checks, so an idle watch costs next to no CPU. A burst of
+changes is debounced: nothing happens until the directory has been quiet for
+`settle` seconds. Then only groups that contain new entries are organized, and
+a group is deferred while any of its new files or folders was modified less
+than `settle` seconds ago (or, on Windows, is still open for writing).
+"""
+import os
+import time
+import ctypes
+import threading
+
+import organizer_core as core
+import organizer_snapshot
+from organizer_core import log_action, flush_log
+
+WATCH_INTERVAL = 2.0 # Seconds between mtime polls (and the longest a native wait blocks)
+SETTLE_SECONDS = 5.0 # Quiet time before a burst is organized; minimum age of new items
+
+
+class _ChangeNotification:
+    """Windows directory change notification handle (names, sizes and write times of direct children)."""
+    FILTER = 0x1 | 0x2 | 0x8 | 0x10 # FILE_NAME | DIR_NAME | SIZE | LAST_WRITE
+    INVALID_HANDLE = ctypes.c_void_p(-1).value
+
+    def __init__(self, directory):
+        self.kernel32 = ctypes.windll.kernel32
+        self.kernel32.FindFirstChangeNotificationW.restype = ctypes.c_void_p
+        self.handle = self.kernel32.FindFirstChangeNotificationW(directory, False, self.FILTER)
+        if not self.handle or self.handle == self.INVALID_HANDLE: raise ctypes.WinError()
+
+    def wait(self, timeout):
+        """True if a change was signalled within timeout seconds (and re-arms the handle)."""
+        if self.kernel32.WaitForSingleObject(ctypes.c_void_p(self.handle), int(timeout * 1000)) != 0: return False
+        self.kernel32.FindNextChangeNotification(ctypes.c_void_p(self.handle))
+        return True
+
+    def close(self):
+        if self.handle: self.kernel32.FindCloseChangeNotification(ctypes.c_void_p(self.handle)); self.handle = None
+
+class DirectoryWatcher:
+    """Blocks until a directory changes: native notifications where available, mtime polling otherwise."""
+    def __init__(self, directory, interval=WATCH_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.native = None
+        if os.name == 'nt':
+            try: self.native = _ChangeNotification(directory)
+            except (OSError, AttributeError) as e: log_action(f"Watch: change notifications unavailable ({e}); polling instead.")
+        self._mtime = self._dir_mtime()
+
+    def _dir_mtime(self):
+        try: return os.stat(self.directory).st_mtime_ns
+        except OSError: return None
+
+    def wait(self, timeout=None, stop=None):
+        """True as soon as the directory changes; False after timeout seconds or once stop is set."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while stop is None or not stop.is_set():
+            step = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            if step <= 0: return False
+            if self.native is not None:
+                if self.native.wait(step): return True
+                continue
+            if stop is not None: stop.wait(step)
+            else: time.sleep(step)
+            mtime = self._dir_mtime()
+            if mtime != self._mtime: self._mtime = mtime; return True
+        return False
+
+    def reset(self):
+        """Forget changes seen so far (e.g. the ones our own moves just made)."""
+        if self.native is not None:
+            while self.native.wait(0): pass
+        self._mtime = self._dir_mtime()
+
+    def close(self):
+        if self.native is not None: self.native.close()
+
+
+def _in_use(path):
+    """Windows only: a file an installer still has open for writing cannot be opened read/write."""
+    if os.name != 'nt' or not os.access(path, os.W_OK): return False
+    try: os.close(os.open(path, os.O_RDWR))
+    except PermissionError: return True
+    except OSError: pass
+    return False
+
+def _newest_mtime(entry, limit=2000):
+    """mtime of the entry, or for a folder the newest mtime inside it (first `limit` items)."""
+    newest = os.stat(entry.path).st_mtime
+    if not entry.is_dir: return newest
+    seen = 0
+    for parent, dirs, files in os.walk(entry.path):
+        for name in dirs + files:
+            try: newest = max(newest, os.stat(os.path.join(parent, name)).st_mtime)
+            except OSError: pass
+            seen += 1
+            if seen >= limit: return newest
+    return newest
+
+def is_settled(entry, settle=SETTLE_SECONDS, now=None):
+    """True if nothing in entry changed for `settle` seconds and it is not open for writing."""
+    try:
+        if (now or time.time()) - _newest_mtime(entry) < settle: return False
+    except OSError: return False # Vanished or inaccessible: leave it for the next round
+    return not (entry.is_file and _in_use(entry.path))
+
+
+class WatchBatch:
+    """One debounced round of watch mode."""
+    def __init__(self):
+        self.new_entries = []  # Names that appeared since the last round
+        self.groups = 0        # Target folders organized in this round
+        self.deferred = []     # New names left for later (still being written)
+        self.result = None     # ExecutionResult, if anything was moved
+
+
+def organize_new(directory, prefix, suffix, known, settle=SETTLE_SECONDS, workers=None):
+    """
+    Plan the directory and execute only the groups that contain entries not in
+    `known`, skipping groups with unsettled items. Updates `known` in place and
+    returns a WatchBatch (None if there was nothing new).
+    """
+    plan = organizer_snapshot.plan_incremental(directory, prefix, suffix)
+    entries = plan.snapshot.entries
+    new_names = set(entries) - known
+    if not new_names: return None
+    batch = WatchBatch(); batch.new_entries = sorted(new_names)
+
+    now = time.time()
+    busy = {name for name in new_names if not is_settled(entries[name], settle, now)}
+    groups = {}
+    for source, destination in plan.moves: groups.setdefault(os.path.dirname(destination), set()).add(os.path.basename(source))
+    selected = set(); deferred = set(busy)
+    for folder_path, names in groups.items():
+        if not names & new_names: continue # Nothing new in this group: not ours to touch
+        if names & busy: deferred |= names & new_names; continue
+        selected.add(folder_path)
+    batch.deferred = sorted(deferred)
+
+    moves = [(s, d) for s, d in plan.moves if os.path.dirname(d) in selected]
+    log_action(f"Watch: {len(new_names)} new item(s) in '{directory}'; organizing {len(selected)} group(s), {len(deferred)} item(s) deferred.")
+    unmoved = set()
+    if moves:
+        batch.groups = len(selected)
+        batch.result = core.execute_moves(moves, plan.snapshot, prefix=prefix, suffix=suffix, workers=workers)
+        moved = {os.path.basename(s) for s in batch.result.undo_mapping.values()}
+        unmoved = {os.path.basename(s) for s, d in moves} - moved # Failed or never reached: still new in the next round
+        known |= {os.path.basename(os.path.dirname(d)) for s, d in moves if os.path.basename(s) in moved}
+        if len(moves) == len(plan.moves): organizer_snapshot.remember_applied(plan, batch.result)
+        else: organizer_snapshot.forget(directory) # Other groups were left in place on purpose
+    known |= new_names - deferred - unmoved
+    flush_log()
+    return batch
+
+
+def watch(directory, prefix="", suffix="", interval=WATCH_INTERVAL, settle=SETTLE_SECONDS, workers=None, stop=None, on_batch=None):
+    """
+    Organize new plugins in directory until stop (a threading.Event) is set or
+    KeyboardInterrupt. Entries present at start are left alone unless a new
+    .aex claims them. on_batch(WatchBatch) is called after every round.
+    """
+    if not os.path.isdir(directory): raise core.InvalidDirectoryError(f"Directory not found or invalid:\n{directory}")
+    stop = stop or threading.Event()
+    try: known = set(os.listdir(directory))
+    except OSError as e: raise core.ScanError(f"Could not list directory {directory}:\n{e}") from e
+    watcher = DirectoryWatcher(directory, interval)
+    log_action(f"Watch started for '{directory}' ({'change notifications' if watcher.native else f'polling every {interval}s'}, settle {settle}s), Prefix: '{prefix}', Suffix: '{suffix}'")
+    flush_log()
+    retry = False # Deferred or late items: look again after `settle` even without a new change
+    try:
+        while not stop.is_set():
+            if not watcher.wait(settle if retry else None, stop) and not retry: continue
+            while watcher.wait(settle, stop): pass # Debounce: wait for `settle` quiet seconds
+            if stop.is_set(): break
+            try: batch = organize_new(directory, prefix, suffix, known, settle, workers)
+            except core.OrganizerError as e:
+                log_action(f"Watch: round failed: {e}"); flush_log(); batch = None
+            watcher.reset() # Our own moves are not new changes
+            try: late = set(os.listdir(directory)) - known # Arrived while we were moving
+            except OSError: late = set()
+            retry = bool(late) or bool(batch and batch.deferred)
+            if batch is not None and on_batch is not None: on_batch(batch)
+    finally:
+        watcher.close()
+        log_action(f"Watch stopped for '{directory}'.")
+        flush_log()
@@ -0,0 +1,41 @@
+"""
+Shared fixtures. Every test runs with the organizer's own files (undo
+journal, undo history, snapshots, fingerprints) in a temp dir, logging off,
+the built-in association rules and the real filesystem backend restored
+afterwards.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import organizer_core as core
+import organizer_fs
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    import organizer_snapshot, organizer_duplicates
+    state = tmp_path / "state"; state.mkdir()
+    monkeypatch.setattr(core, "UNDO_FILE", str(state / "undo_log.jsonl"))
+    monkeypatch.setattr(core, "LEGACY_UNDO_FILE", str(state / "undo_log.json"))
+    monkeypatch.setattr(core, "HISTORY_FILE", str(state / "undo_history.sqlite3"))
+    monkeypatch.setattr(core, "RULES_FILE", None) # Built-in rules
+    monkeypatch.setattr(core, "FILESYSTEM", core.FILESYSTEM)
+    monkeypatch.setattr(core, "LOG_SINK", core.NullLogSink())
+    monkeypatch.setattr(core, "TRACE_SINK", core.NullLogSink())
+    monkeypatch.setattr(core, "EVENT_LOG", core.NullEventLog())
+    monkeypatch.setattr(organizer_snapshot, "SNAPSHOT_DIR", str(state / "snapshots"))
+    monkeypatch.setattr(organizer_duplicates, "FINGERPRINT_FILE", str(state / "fingerprints.sqlite3"))
+    return state
+
+
+@pytest.fixture
+def memfs(monkeypatch):
+    """A MemoryFileSystem installed as core.FILESYSTEM."""
+    fs = organizer_fs.MemoryFileSystem()
+    monkeypatch.setattr(core, "FILESYSTEM", fs)
+    return fs
+
@@ -0,0 +1,47 @@
+"""Batch planning: plan_roots serially and with the process pool, and what each writes to the log."""
+import os
+
+import pytest
+
+import organizer_batch
+import organizer_core as core
+
+
+def _roots(tmp_path):
+    roots = []
+    for n, plugins in enumerate([("Saber", "Aura"), ("Deep",), ()]):
+        root = tmp_path / f"AE{n}" / "Plug-ins"; root.mkdir(parents=True)
+        for name in plugins: (root / f"{name}.aex").write_bytes(b"x"); (root / f"{name} Presets.ffx").write_bytes(b"x")
+        roots.append(str(root))
+    return roots + [str(tmp_path / "missing")]
+
+@pytest.fixture
+def log(monkeypatch):
+    sink = core.RingLogSink(size=None)
+    monkeypatch.setattr(core, "LOG_SINK", sink); monkeypatch.setattr(core, "TRACE_SINK", sink)
+    return sink
+
+def _summary(results):
+    return [(os.path.basename(os.path.dirname(root)), plan and sorted((os.path.basename(s), os.path.basename(os.path.dirname(d))) for s, d in plan.moves), error is not None)
+            for root, plan, error in results]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_plan_roots(tmp_path, log, workers):
+    roots = _roots(tmp_path)
+    results = organizer_batch.plan_roots(roots, "", "", workers=workers)
+    assert [root for root, _, _ in results] == roots # Input order, whoever finished first
+    assert _summary(results) == [
+        ("AE0", [("Aura Presets.ffx", "Aura"), ("Aura.aex", "Aura"), ("Saber Presets.ffx", "Saber"), ("Saber.aex", "Saber")], False),
+        ("AE1", [("Deep Presets.ffx", "Deep"), ("Deep.aex", "Deep")], False), ("AE2", [], False), (tmp_path.name, None, True)]
+    assert not any("process pool unavailable" in line for line in log.lines)
+
+@pytest.mark.parametrize("workers", [1, 3])
+@pytest.mark.parametrize("trace", [True, False])
+def test_trace_lines_only_when_asked(tmp_path, log, workers, trace):
+    roots = _roots(tmp_path)
+    organizer_batch.plan_roots(roots, "", "", workers=workers, trace=trace)
+    traced = [line for line in log.lines if "Identified .aex" in line]
+    assert len(traced) == (3 if trace else 0)
+    if trace: assert ["Saber" in line or "Aura" in line for line in traced] == [True, True, False] # Root by root
+    assert core.TRACE_SINK is log # Put back after a serial run without tracing
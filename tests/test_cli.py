@@ -0,0 +1,36 @@
+"""The command line: organizer_cli.main with arguments, as a user would run it."""
+import os
+
+import organizer_cli
+from organizer_journal import read_journal
+import organizer_core as core
+
+
+def _plugins(root):
+    root.mkdir()
+    for name in ("Saber.aex", "Saber Help.pdf", "Aura.aex", "Aura Presets.ffx"): (root / name).write_bytes(b"x")
+    return sorted(os.listdir(root))
+
+
+def test_a_relative_directory_is_recorded_absolute(tmp_path, monkeypatch):
+    work = tmp_path / "w"; work.mkdir(); root = work / "PI"
+    before = _plugins(root)
+    monkeypatch.chdir(work)
+    assert organizer_cli.main(["apply", "PI"]) == 0
+    assert all(os.path.isabs(e.source) and os.path.isabs(e.destination) for e in read_journal(core.UNDO_FILE).entries)
+    assert core.undo_history().operations()[0]["root"] == str(root)
+
+    monkeypatch.chdir(os.sep) # Undo from elsewhere
+    assert organizer_cli.main(["undo"]) == 0
+    assert sorted(os.listdir(root)) == before
+
+def test_a_relative_stream_apply_is_undone_by_operation(tmp_path, monkeypatch):
+    work = tmp_path / "w"; work.mkdir(); root = work / "PI"
+    before = _plugins(root)
+    monkeypatch.chdir(work)
+    assert organizer_cli.main(["apply", "PI", "--stream"]) == 0
+    op_id = core.undo_history().operations()[0]["id"]
+    os.remove(core.UNDO_FILE) # Only the history is left
+    monkeypatch.chdir(tmp_path)
+    assert organizer_cli.main(["undo", "--operation", str(op_id)]) == 0
+    assert sorted(os.listdir(root)) == before
@@ -0,0 +1,55 @@
+"""find_duplicates: which copy of identical files is kept."""
+import os
+
+import organizer_duplicates as duplicates
+
+
+def _write(root, relative, content=b"plugin data"):
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return str(path)
+
+def _group(report, path):
+    return next(g for g in report.duplicates if path in [g.keep.path] + [f.path for f in g.candidates])
+
+
+def test_the_copy_in_the_plugin_folder_is_kept(tmp_path):
+    root = tmp_path / "Plug-ins"
+    organized = _write(root, "Saber/SaberLicense.dll")
+    _write(root, "Saber/Saber.aex", b"aex")
+    loose = _write(root, "SaberLicense.dll")
+    report = duplicates.find_duplicates(str(root), use_cache=False)
+    group = _group(report, organized)
+    assert group.keep.path == organized and [f.path for f in group.candidates] == [loose]
+    assert report.plan().moves == [(loose, os.path.join(str(root), duplicates.QUARANTINE_FOLDER, "SaberLicense.dll"))]
+
+def test_a_prefixed_plugin_folder_counts_as_the_plugin_folder(tmp_path):
+    root = tmp_path / "Plug-ins"
+    organized = _write(root, "[FX] Saber Pack/Saber.aex", b"aex")
+    loose = _write(root, "Saber.aex", b"aex")
+    group = _group(duplicates.find_duplicates(str(root), use_cache=False), organized)
+    assert group.keep.path == organized and [f.path for f in group.candidates] == [loose]
+
+def test_the_copy_next_to_its_aex_is_kept(tmp_path):
+    root = tmp_path / "Plug-ins"
+    _write(root, "Shared/Element.aex", b"aex")
+    beside = _write(root, "Shared/Element Presets.ffx")
+    other = _write(root, "Element Presets.ffx")
+    group = _group(duplicates.find_duplicates(str(root), use_cache=False), beside)
+    assert group.keep.path == beside and [f.path for f in group.candidates] == [other]
+
+def test_without_a_plugin_the_shallowest_copy_is_kept(tmp_path):
+    root = tmp_path / "Plug-ins"
+    shallow = _write(root, "Readme.txt")
+    deep = _write(root, "Docs/Readme.txt")
+    group = _group(duplicates.find_duplicates(str(root), use_cache=False), shallow)
+    assert group.keep.path == shallow and [f.path for f in group.candidates] == [deep]
+
+def test_a_name_without_a_copy_marker_still_comes_first(tmp_path):
+    root = tmp_path / "Plug-ins"
+    _write(root, "Saber/Saber.aex", b"aex")
+    marked = _write(root, "Saber/SaberLicense (1).dll")
+    plain = _write(root, "SaberLicense.dll")
+    group = _group(duplicates.find_duplicates(str(root), use_cache=False), plain)
+    assert group.keep.path == plain and [f.path for f in group.candidates] == [marked]
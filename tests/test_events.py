@@ -0,0 +1,78 @@
+"""The structured event log: segments rotated into .gz, pruning, the index, and reading an operation back."""
+import os
+import json
+
+import organizer_cli
+import organizer_core as core
+from organizer_events import EventLog
+
+
+def _log(tmp_path, **kwargs):
+    return EventLog(str(tmp_path), max_bytes=400, keep=2, buffer_records=1, **kwargs)
+
+def _run(log, op, moves, history_id=None, other=None):
+    """An execution of `moves` records; `other` interleaves a second operation's records."""
+    log.emit(op, "execute.begin", planned=moves)
+    for i in range(moves):
+        log.emit(op, "move", src=f"/r/{i}.dat", dst=f"/r/A/{i}.dat")
+        if other: log.emit(other, "move", src="/r/x", dst="/r/X/x")
+    log.emit(op, "execute.end", history_id=history_id, moved=moves)
+
+
+def test_an_operation_is_read_back_across_rotations(tmp_path):
+    log = _log(tmp_path)
+    log.keep = 10
+    _run(log, "first", 3)
+    _run(log, "second", 12, history_id=7, other="first")
+    segments = log.segments()
+    assert len(segments) > 2 and all(compressed for _, _, compressed in segments[:-1]) and not segments[-1][2]
+    assert all(os.path.getsize(path) < 1000 for _, path, compressed in segments if not compressed)
+    records = log.read_operation("second")
+    assert [r["ev"] for r in records] == ["execute.begin"] + ["move"] * 12 + ["execute.end"] # Not the interleaved 'first' moves
+    assert [r["src"] for r in records[1:-1]] == [f"/r/{i}.dat" for i in range(12)]
+    assert [r["ev"] for r in log.read_operation("first")] == ["execute.begin", "move", "move", "move", "execute.end"] # Stops at its end
+    assert log.index()["second"]["history_id"] == 7 and log.history_ids() == {7: "second"}
+    assert log.operation_for_history_id(7) == "second" and log.operation_for_history_id(8) is None
+    assert log.read_operation("unknown") == []
+
+def test_old_archives_are_pruned_with_their_index_entries(tmp_path):
+    log = _log(tmp_path)
+    _run(log, "old", 4, history_id=1)
+    for n in range(6): _run(log, f"op{n}", 4)
+    archives = [s for s in log.segments() if s[2]]
+    assert len(archives) == 2 and archives[0][0] > 1
+    index = log.index()
+    assert "old" not in index and 1 not in log.history_ids() and log.read_operation("old") == []
+    assert all(entry["seg"] >= archives[0][0] for entry in index.values())
+    assert [r["ev"] for r in log.read_operation("op5")][-1] == "execute.end"
+
+def test_a_new_log_continues_the_last_segment_and_skips_a_torn_index_line(tmp_path):
+    log = EventLog(str(tmp_path), buffer_records=100)
+    log.emit("a", "plan.begin"); log.emit("a", "plan.end")
+    assert log.segments() == [] # Buffered
+    log.flush()
+    again = EventLog(str(tmp_path), buffer_records=1)
+    again.emit("c", "undo.begin"); again.emit("c", "undo.end")
+    with open(log.index_path, "a", encoding='utf-8') as f: f.write('{"op": "b", "ki') # Torn by a crash
+    assert [s[0] for s in again.segments()] == [1] and list(again.index()) == ["a", "c"]
+    assert [r["ev"] for r in again.read_operation("c")] == ["undo.begin", "undo.end"]
+
+
+def test_events_for_a_path_read_the_index_once(tmp_path, monkeypatch, capsys):
+    log = _log(tmp_path / "events")
+    os.mkdir(log.directory); log.keep = 50
+    monkeypatch.setattr(core, "EVENT_LOG", log)
+    root = tmp_path / "PI"; root.mkdir()
+    for name in ("Saber.aex", "Saber Help.pdf"): (root / name).write_bytes(b"x")
+    assert organizer_cli.main(["apply", str(root)]) == 0
+    assert organizer_cli.main(["undo"]) == 0
+    assert organizer_cli.main(["apply", str(root)]) == 0
+    reads = []
+    real = log._read_index_lines
+    monkeypatch.setattr(log, "_read_index_lines", lambda: reads.append(1) or real())
+    capsys.readouterr()
+    assert organizer_cli.main(["events", "--path", str(root / "Saber" / "Saber.aex"), "--json"]) == 0
+    records = json.loads(capsys.readouterr().out)["records"]
+    moves = [r for r in records if r["ev"] in ("move", "revert")]
+    assert len(reads) == 1 and len({r["op"] for r in records}) == 2 # Both applies
+    assert moves and all(str(root / "Saber" / "Saber.aex") in (r["src"], r["dst"]) for r in moves)
@@ -0,0 +1,58 @@
+"""Filesystem backends: the real one stays visible to CallCounter, the in-memory one behaves like os."""
+import os
+import errno
+
+import pytest
+
+import organizer_core as core
+import organizer_fs
+from organizer_metrics import CallCounter
+
+
+def test_call_counter_sees_stat_through_the_backend(tmp_path):
+    (tmp_path / "Element.aex").write_bytes(b"x")
+    fs = organizer_fs.RealFileSystem()
+    with CallCounter() as counter:
+        fs.stat(str(tmp_path)); fs.lstat(str(tmp_path / "Element.aex")); fs.isdir(str(tmp_path))
+    assert counter.counts.get("os.stat", 0) >= 2 and counter.counts.get("os.lstat") == 1
+
+def test_call_counter_sees_undo_stat_calls(tmp_path):
+    root = tmp_path / "Plug-ins"; root.mkdir()
+    for i in range(20): (root / f"Plugin{i}.aex").write_bytes(b""); (root / f"Plugin{i} Presets.dat").write_bytes(b"")
+    plan = core.plan_moves(str(root), "", "")
+    assert core.execute_moves(plan.moves, plan.snapshot).ok
+    with CallCounter() as counter: core.undo_moves()
+    assert counter.counts.get("os.stat", 0) >= 20 # The device of every plugin folder
+
+
+def test_memory_rename_and_move_across_volumes():
+    fs = organizer_fs.MemoryFileSystem()
+    fs.makedirs("/a/b"); fs.mount("/vol", free=100)
+    fs.create_file("/a/b/big.dat", 200); fs.create_file("/a/b/small.dat", 10)
+    with pytest.raises(OSError) as e: fs.rename("/a/b/small.dat", "/vol/small.dat")
+    assert e.value.errno == errno.EXDEV
+    with pytest.raises(OSError) as e: fs.move("/a/b/big.dat", "/vol/big.dat")
+    assert e.value.errno == errno.ENOSPC and fs.exists("/a/b/big.dat")
+    fs.move("/a/b/small.dat", "/vol/small.dat")
+    assert fs.tree("/vol") == ["small.dat"] and fs.disk_usage("/vol").free == 90
+
+def test_memory_errors_match_os():
+    fs = organizer_fs.MemoryFileSystem()
+    fs.makedirs("/r/d"); fs.create_file("/r/d/f")
+    with pytest.raises(FileNotFoundError): fs.stat("/r/missing")
+    with pytest.raises(FileExistsError): fs.mkdir("/r/d")
+    with pytest.raises(OSError) as e: fs.rmdir("/r/d")
+    assert e.value.errno == errno.ENOTEMPTY
+    fs.set_read_only("/r/d")
+    with pytest.raises(PermissionError): fs.remove("/r/d/f")
+    assert not fs.access("/r/d", os.W_OK) and fs.access("/r", os.W_OK)
+
+def test_faulty_filesystem_injects_and_counts():
+    inner = organizer_fs.MemoryFileSystem(); inner.makedirs("/r"); inner.create_file("/r/a"); inner.create_file("/r/b")
+    fs = organizer_fs.FaultyFileSystem(inner, seed=1)
+    fs.fail("rename", "*/b", errno.EACCES, count=1, after=0)
+    fs.rename("/r/a", "/r/a2")
+    with pytest.raises(PermissionError): fs.rename("/r/b", "/r/b2")
+    fs.rename("/r/b", "/r/b2") # count=1: only once
+    assert fs.calls["rename"] == 3 and fs.injected["rename"] == 1
+    assert inner.tree("/r") == ["a2", "b2"]
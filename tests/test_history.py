@@ -0,0 +1,106 @@
+"""The undo history: operations, their moves and their states, and undo --operation."""
+import os
+
+import pytest
+
+import organizer_core as core
+from organizer_history import UndoHistory
+
+ROOT = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+
+
+def _build(fs, plugins):
+    fs.makedirs(ROOT, exist_ok=True)
+    for name in plugins: fs.create_file(os.path.join(ROOT, f"{name}.aex")); fs.create_file(os.path.join(ROOT, f"{name} Presets.ffx"))
+
+def _apply():
+    plan = core.plan_moves(ROOT, "", "")
+    result = core.execute_moves(plan.moves, plan.snapshot)
+    assert result.ok
+    return result.operation_id
+
+def _state(op_id):
+    return core.undo_history().operation(op_id)["state"]
+
+
+def test_an_undo_that_finds_nothing_keeps_the_journal_and_the_state(memfs):
+    _build(memfs, ["Saber"])
+    op_id = _apply()
+    memfs.rename(os.path.join(ROOT, "Saber"), os.path.join(ROOT, "Elsewhere")) # Every recorded destination is gone
+    undo = core.undo_moves()
+    assert undo.reverted == 0 and undo.attempted == 2 and undo.undo_file_kept and os.path.exists(core.UNDO_FILE)
+    assert _state(op_id) == "applied"
+
+    memfs.rename(os.path.join(ROOT, "Elsewhere"), os.path.join(ROOT, "Saber")) # Put back: the undo can still happen
+    assert core.undo_moves().reverted == 2 and _state(op_id) == "undone" and not os.path.exists(core.UNDO_FILE)
+
+def test_an_operation_is_undone_only_when_every_move_is_reverted(memfs):
+    _build(memfs, ["Saber"])
+    op_id = _apply()
+    memfs.create_file(os.path.join(ROOT, "Saber.aex")) # The original location of one item is taken
+    first = core.undo_moves(operation_id=op_id)
+    assert first.reverted == 1 and _state(op_id) == "partially_undone"
+    memfs.remove(os.path.join(ROOT, "Saber.aex"))
+    second = core.undo_moves(operation_id=op_id)
+    assert second.ok and second.reverted == 1 and _state(op_id) == "undone"
+
+
+def test_operation_states_and_moves(tmp_path):
+    history = UndoHistory(str(tmp_path / "history.sqlite3"))
+    op_id = history.begin_operation("/r", "[FX] ", "", planned=3)
+    assert history.operation(op_id)["state"] == "running" and history.operation(op_id)["root"] == "/r"
+    moves = [("/r/a.aex", "/r/A/a.aex"), ("/r/b.dat", "/r/A/b.dat"), ("/r/c.dat", "/r/A/c.dat")]
+    history.finish_operation(op_id, moves)
+    op = history.operation(op_id)
+    assert (op["state"], op["moved"], op["errors"], op["prefix"]) == ("applied", 3, 0, "[FX] ")
+    assert list(history.iter_moves(op_id)) == moves[::-1] and list(history.iter_moves(op_id, newest_first=False)) == moves
+
+    history.mark_reverted(op_id, ["/r/A/c.dat"])
+    assert history.operation(op_id)["state"] == "partially_undone"
+    assert list(history.iter_moves(op_id, newest_first=False)) == moves[:2] and len(list(history.iter_moves(op_id, include_reverted=True))) == 3
+    history.mark_reverted(op_id, ["/r/elsewhere"]) # Not a move of this operation: no change
+    assert history.operation(op_id)["state"] == "partially_undone"
+    history.mark_reverted(op_id, ["/r/A/a.aex", "/r/A/b.dat"])
+    assert history.operation(op_id)["state"] == "undone"
+
+    failed = history.begin_operation("/s")
+    history.finish_operation(failed, moves[:1], errors=True)
+    assert history.operation(failed)["state"] == "partial"
+    assert [o["id"] for o in history.operations()] == [failed, op_id] and [o["id"] for o in history.operations("/r/")] == [op_id]
+    assert [o["id"] for o in history.operations(limit=1)] == [failed]
+
+def test_origin_of_a_path(tmp_path, monkeypatch):
+    history = UndoHistory(str(tmp_path / "history.sqlite3"))
+    first = history.begin_operation(str(tmp_path)); history.finish_operation(first, [(str(tmp_path / "a.aex"), str(tmp_path / "A" / "a.aex"))])
+    second = history.begin_operation(str(tmp_path)); history.finish_operation(second, [(str(tmp_path / "A" / "a.aex"), str(tmp_path / "a.aex"))])
+    rows = history.origin_of(str(tmp_path / "A" / "a.aex"))
+    assert [(r["op_id"], r["source"], r["destination"]) for r in rows] == [
+        (second, str(tmp_path / "A" / "a.aex"), str(tmp_path / "a.aex")), (first, str(tmp_path / "a.aex"), str(tmp_path / "A" / "a.aex"))]
+    monkeypatch.chdir(tmp_path)
+    assert [r["op_id"] for r in history.origin_of(os.path.join("A", "a.aex"))] == [second, first] # Relative paths are looked up absolute
+    assert history.origin_of(str(tmp_path / "b.aex")) == []
+
+def test_undo_an_older_operation(memfs):
+    _build(memfs, ["Saber"])
+    first = _apply()
+    _build(memfs, ["Aura"])
+    second = _apply() # The undo journal now belongs to this one
+    undo = core.undo_moves(operation_id=first)
+    assert undo.ok and undo.reverted == 2 and _state(first) == "undone" and _state(second) == "applied"
+    assert memfs.tree(ROOT) == ["Aura" + os.sep, os.path.join("Aura", "Aura Presets.ffx"), os.path.join("Aura", "Aura.aex"), "Saber Presets.ffx", "Saber.aex"]
+    assert os.path.exists(core.UNDO_FILE) # Still the newer run's
+    with pytest.raises(core.UndoUnavailableError): core.undo_moves(operation_id=first) # Already undone
+    assert core.undo_moves().reverted == 2 and _state(second) == "undone"
+    assert memfs.tree(ROOT) == ["Aura Presets.ffx", "Aura.aex", "Saber Presets.ffx", "Saber.aex"]
+
+def test_undo_of_an_unknown_or_unfinished_operation(memfs):
+    with pytest.raises(core.UndoUnavailableError): core.undo_moves(operation_id=42)
+    running = core.undo_history().begin_operation(ROOT)
+    with pytest.raises(core.UndoUnavailableError): core.undo_moves(operation_id=running)
+
+def test_undo_by_operation_removes_that_runs_journal(memfs):
+    _build(memfs, ["Saber", "Aura"])
+    before = memfs.tree(ROOT)
+    op_id = _apply()
+    assert core.undo_moves(operation_id=op_id).ok and memfs.tree(ROOT) == before
+    assert not os.path.exists(core.UNDO_FILE) # Not replayed a second time
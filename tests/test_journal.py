@@ -0,0 +1,89 @@
+"""The undo journal: reading back torn and interrupted runs, and undo after a run that failed halfway."""
+import os
+import json
+import errno
+
+import pytest
+
+import organizer_core as core
+import organizer_fs
+from organizer_journal import UndoJournal, read_journal
+
+ROOT = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+
+
+def _records(path):
+    with open(path, encoding='utf-8') as f: return [json.loads(line) for line in f]
+
+def _build(fs, plugins=("Aura", "Deep", "Saber", "Twitch")):
+    fs.makedirs(ROOT)
+    for name in plugins:
+        fs.create_file(os.path.join(ROOT, f"{name}.aex"), 100); fs.create_file(os.path.join(ROOT, f"{name} Presets.ffx"), 10)
+    return fs.tree(ROOT)
+
+def _run():
+    plan = core.plan_moves(ROOT, "", "")
+    return core.execute_moves(plan.moves, plan.snapshot, workers=1)
+
+
+def test_records_are_written_as_the_moves_happen(tmp_path):
+    path = str(tmp_path / "undo.jsonl")
+    journal = UndoJournal(path, header={"planned": 2})
+    assert not journal.started and not os.path.exists(path) # Nothing recorded, nothing replaced
+    first = journal.intent("/r/a", "/r/A/a"); journal.done(first)
+    second = journal.intent("/r/b", "/r/B/b"); journal.checkpoint(second, "x.dat", 5); journal.checkpoint(second, None, 5)
+    journal.close(moved=1)
+    assert [r["t"] for r in _records(path)] == ["begin", "mv", "ok", "mv", "ck", "ck", "end"]
+    contents = read_journal(path)
+    assert contents.complete and contents.header["planned"] == 2 and not contents.skipped_lines
+    assert [(e.source, e.destination, e.confirmed, e.checkpoints, e.copied) for e in contents.entries] == [
+        ("/r/a", "/r/A/a", True, 0, False), ("/r/b", "/r/B/b", False, 1, True)]
+
+def test_a_torn_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / "undo.jsonl")
+    journal = UndoJournal(path); move_id = journal.intent("/r/a", "/r/A/a"); journal.done(move_id); journal.intent("/r/b", "/r/B/b")
+    journal._file.write('{"t": "ok", "i'); journal._file.close() # The process died mid-write
+    contents = read_journal(path)
+    assert contents.skipped_lines == 1 and not contents.complete
+    assert [(e.source, e.confirmed) for e in contents.entries] == [("/r/a", True), ("/r/b", False)]
+
+def test_the_legacy_format_and_other_files(tmp_path):
+    legacy = tmp_path / "undo_log.json"; legacy.write_text(json.dumps({"/r/A/a": "/r/a"}), encoding='utf-8')
+    contents = read_journal(str(legacy))
+    assert contents.legacy and contents.complete and [(e.source, e.destination, e.confirmed) for e in contents.entries] == [("/r/a", "/r/A/a", True)]
+    other = tmp_path / "notes.txt"; other.write_text("not a journal\n", encoding='utf-8')
+    with pytest.raises(ValueError): read_journal(str(other))
+
+
+def test_a_journal_torn_at_the_crash_is_still_undone(memfs):
+    before = _build(memfs)
+    assert _run().ok
+    with open(core.UNDO_FILE, encoding='utf-8') as f: lines = f.read().splitlines()
+    assert json.loads(lines[-1])["t"] == "end" and json.loads(lines[-2])["t"] == "ok"
+    with open(core.UNDO_FILE, "w", encoding='utf-8') as f: f.write("\n".join(lines[:-2]) + "\n" + lines[-2][:5]) # Last 'ok' torn, no end
+    contents = read_journal(core.UNDO_FILE)
+    assert contents.skipped_lines == 1 and not contents.complete and not contents.entries[-1].confirmed
+    undo = core.undo_moves()
+    assert undo.ok and undo.reverted == 8 and memfs.tree(ROOT) == before # The unconfirmed move evidently happened
+
+def test_an_intent_without_its_move_is_not_reverted(memfs):
+    before = _build(memfs, ("Aura",))
+    journal = UndoJournal(core.UNDO_FILE)
+    journal.done(journal.intent(os.path.join(ROOT, "Aura.aex"), os.path.join(ROOT, "Aura", "Aura.aex")))
+    journal.intent(os.path.join(ROOT, "Aura Presets.ffx"), os.path.join(ROOT, "Aura", "Aura Presets.ffx"))
+    journal._file.close() # The process died before the second move
+    memfs.mkdir(os.path.join(ROOT, "Aura")); memfs.rename(os.path.join(ROOT, "Aura.aex"), os.path.join(ROOT, "Aura", "Aura.aex"))
+    undo = core.undo_moves()
+    assert undo.ok and sorted((os.path.basename(i.source), i.status) for i in undo.items) == [("Aura Presets.ffx", "not_moved"), ("Aura.aex", "reverted")]
+    assert memfs.tree(ROOT) == before
+
+def test_undo_restores_the_tree_after_a_run_failed_halfway(memfs, monkeypatch):
+    before = _build(memfs)
+    faulty = organizer_fs.FaultyFileSystem(memfs)
+    faulty.fail("rename", os.path.join(ROOT, "*"), errno.EIO, count=1, after=4)
+    monkeypatch.setattr(core, "FILESYSTEM", faulty)
+    result = _run()
+    assert not result.ok and result.moved_count == 4 and faulty.injected["rename"] == 1
+    assert not read_journal(core.UNDO_FILE).entries[-1].confirmed
+    undo = core.undo_moves()
+    assert undo.ok and undo.reverted == 4 and memfs.tree(ROOT) == before
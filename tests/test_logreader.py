@@ -0,0 +1,45 @@
+"""LogReader: reading backwards in blocks must give the same lines as a plain forward split, whatever the block size."""
+import random
+
+import pytest
+
+from organizer_logreader import LogReader
+
+
+def _lines(data):
+    """(offset, raw line) pairs of data, the obvious way."""
+    found = []; offset = 0
+    for raw in data.splitlines(keepends=True):
+        found.append((offset, raw)); offset += len(raw)
+    return found
+
+def _content(rng):
+    pieces = [b"", b"x", b"\n", b"\r\n", b"Moved 'Saber.aex'", "Übersicht ✓".encode('utf-8'), b"a" * 40]
+    return b"".join(rng.choice(pieces) for _ in range(rng.randrange(0, 60)))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_iter_reverse_matches_a_forward_split(tmp_path, seed):
+    rng = random.Random(seed)
+    data = _content(rng)
+    path = tmp_path / "plugin_organizer.log"; path.write_bytes(data)
+    expected = _lines(data)
+    boundaries = [offset for offset, _ in expected] + [len(data)]
+    for block_size in (1, 2, 3, 7, rng.randrange(4, 64), 64 * 1024):
+        reader = LogReader(str(path), block_size=block_size)
+        assert list(reader.iter_reverse()) == expected[::-1], block_size
+        before = rng.choice(boundaries)
+        assert list(reader.iter_reverse(before)) == [line for line in expected if line[0] < before][::-1], (block_size, before)
+    assert list(LogReader(str(path)).iter_forward()) == expected
+
+def test_pages_and_search(tmp_path):
+    path = tmp_path / "plugin_organizer.log"
+    path.write_bytes("".join(f"line {n}{' Saber' if n % 3 == 0 else ''}\n" for n in range(10)).encode('utf-8'))
+    reader = LogReader(str(path), block_size=5)
+    last = reader.lines_before(count=3)
+    assert [line for _, line in last] == ["line 7", "line 8", "line 9 Saber"]
+    assert [line for _, line in reader.lines_before(last[0][0], count=2)] == ["line 5", "line 6 Saber"]
+    lines, end = reader.lines_after(last[0][0], count=2)
+    assert [line for _, line in lines] == ["line 7", "line 8"] and end == last[2][0]
+    assert [line for _, line in reader.search("SABER")] == ["line 9 Saber", "line 6 Saber", "line 3 Saber", "line 0 Saber"]
+    assert list(reader.search("SABER", case_sensitive=True)) == [] and reader.find("Saber", before=last[2][0]) == reader.find("line 6")
@@ -0,0 +1,74 @@
+"""Saved move plans: file round trip, diffs, and refusing to apply a stale plan."""
+import os
+
+import pytest
+
+import organizer_core as core
+from organizer_plan import MovePlan, AEX_REASON, apply_plan, diff_plans
+
+ROOT = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+
+
+def _build(fs, files=("Saber.aex", "Saber Help.pdf", "SaberLicense.dll", "Aura.aex", "Notes.txt"), folders=("Aura Presets",)):
+    fs.makedirs(ROOT)
+    for name in folders: fs.mkdir(os.path.join(ROOT, name))
+    for name in files: fs.create_file(os.path.join(ROOT, name), 10)
+    return fs.tree(ROOT)
+
+def _saved(tmp_path, name="plan.json"):
+    path = str(tmp_path / name)
+    MovePlan.from_result(core.plan_moves(ROOT, "", "")).save(path)
+    return path
+
+
+def test_a_plan_file_round_trip(memfs, tmp_path):
+    _build(memfs)
+    plan = core.plan_moves(ROOT, "", "")
+    path = _saved(tmp_path)
+    loaded = MovePlan.load(path)
+    assert (loaded.root, loaded.prefix, loaded.suffix, len(loaded)) == (ROOT, "", "", len(plan.moves))
+    assert sorted(loaded.moves()) == sorted(plan.moves)
+    assert sorted(loaded.folders) == ["Aura", "Saber"] and [e.name for e in loaded.folders["Saber"]] == ["Saber Help.pdf", "Saber.aex", "SaberLicense.dll"]
+    reasons = {e.name: e.reason for entries in loaded.folders.values() for e in entries}
+    assert reasons["Saber.aex"] == AEX_REASON and reasons["SaberLicense.dll"] == "Followed by known suffix ('license')"
+    with open(path, encoding='utf-8') as f: text = f.read()
+    assert sum('"Saber Help.pdf"' in line for line in text.splitlines()) == 1 and len(text.splitlines()) == len(plan.moves) + 6 # One item per line
+
+def test_a_bad_plan_file(tmp_path):
+    (tmp_path / "bad.json").write_text('{"version": 1, "root": "/x"}', encoding='utf-8')
+    (tmp_path / "new.json").write_text('{"version": 99}', encoding='utf-8')
+    for name in ("bad.json", "new.json", "missing.json"):
+        with pytest.raises(core.OrganizerError): MovePlan.load(str(tmp_path / name))
+
+def test_diff_against_the_current_tree(memfs, tmp_path):
+    _build(memfs)
+    old = MovePlan.load(_saved(tmp_path, "old.json"))
+    memfs.remove(os.path.join(ROOT, "Saber Help.pdf")); memfs.create_file(os.path.join(ROOT, "Aura Help.pdf"))
+    memfs.create_file(os.path.join(ROOT, "SaberLicense.aex")) # Longer base: its folder wins over Saber's
+    new = MovePlan.load(_saved(tmp_path, "new.json"))
+    assert diff_plans(old, new) == [("Aura Help.pdf", None, "Aura"), ("Saber Help.pdf", "Saber", None),
+                                    ("SaberLicense.aex", None, "SaberLicense"), ("SaberLicense.dll", "Saber", "SaberLicense")]
+    assert diff_plans(old, old) == []
+
+def test_a_current_plan_is_applied_and_undone(memfs, tmp_path):
+    before = _build(memfs)
+    path = _saved(tmp_path)
+    memfs.create_file(os.path.join(ROOT, "Unrelated.txt")) # Changes the listing, not the plan
+    result = apply_plan(MovePlan.load(path))
+    assert result.ok and result.moved_count == 5
+    memfs.remove(os.path.join(ROOT, "Unrelated.txt"))
+    assert core.undo_moves().ok and memfs.tree(ROOT) == before
+
+@pytest.mark.parametrize("change", ["gone", "retyped", "new_related", "rules"])
+def test_a_stale_plan_is_refused(memfs, tmp_path, monkeypatch, change):
+    _build(memfs)
+    path = _saved(tmp_path)
+    if change == "gone": memfs.remove(os.path.join(ROOT, "SaberLicense.dll"))
+    if change == "retyped": memfs.remove(os.path.join(ROOT, "Saber Help.pdf")); memfs.mkdir(os.path.join(ROOT, "Saber Help.pdf"))
+    if change == "new_related": memfs.create_file(os.path.join(ROOT, "Aura Help.pdf"))
+    if change == "rules":
+        rules = tmp_path / "rules.json"; rules.write_text('{"mappings": {"Notes.txt": "Aura"}}', encoding='utf-8')
+        monkeypatch.setattr(core, "RULES_FILE", str(rules))
+    before = memfs.tree(ROOT)
+    with pytest.raises(core.StalePlanError) as e: apply_plan(MovePlan.load(path))
+    assert e.value.problems and memfs.tree(ROOT) == before and not os.path.exists(core.UNDO_FILE)
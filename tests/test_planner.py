@@ -0,0 +1,134 @@
+"""
+The trie planner (plan_moves, compute_moves, stream_moves) against the
+original nested-loop matcher, kept here as the oracle.
+"""
+import os
+import random
+
+import pytest
+
+import organizer_core as core
+import organizer_bench
+
+ROOT = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+ORACLE_SUFFIXES = ["license", "presets", "textures", "data", "config",
+                   "key", "lib", "sdk", "settings", "pack", "bundle",
+                   "docs", "help", "support", "extra", "install"]
+
+
+def oracle_moves(fs, directory, prefix, suffix):
+    """compute_moves as it was before the trie: every base tried longest first, every suffix in turn."""
+    moves = []; processed = set(); targets = {}
+    names = fs.listdir(directory)
+    for name in names:
+        path = os.path.join(directory, name)
+        if not fs.isdir(path) and name.lower().endswith('.aex'):
+            base = os.path.splitext(name)[0]
+            if base.startswith('_') or base.lower() in targets: continue
+            targets[base.lower()] = os.path.join(directory, f"{prefix}{base}{suffix}")
+            moves.append((path, os.path.join(targets[base.lower()], name))); processed.add(name)
+    for name in names:
+        if name in processed: continue
+        path = os.path.join(directory, name); lower = name.lower(); is_dir = fs.isdir(path)
+        for base in sorted(targets, key=len, reverse=True):
+            if not lower.startswith(base): continue
+            n = len(base)
+            if len(lower) == n or os.path.splitext(lower)[0] == base or not lower[n].isalpha(): related = True
+            else:
+                related = any(lower[n:].startswith(known) and (n + len(known) == len(lower) or not lower[n + len(known)].isalpha())
+                              for known in ORACLE_SUFFIXES)
+            if not related: continue
+            if not (is_dir and name == os.path.basename(targets[base])): moves.append((path, os.path.join(targets[base], name)))
+            processed.add(name)
+            break
+    return moves
+
+def streamed_moves(directory, prefix, suffix):
+    return [move for group in core.stream_moves(directory, prefix, suffix) for move in group.moves]
+
+
+def test_oracle_suffixes_are_the_known_suffixes():
+    assert ORACLE_SUFFIXES == core.KNOWN_SUFFIXES
+
+
+@pytest.mark.parametrize("seed", range(12))
+@pytest.mark.parametrize("prefix, suffix", [("", ""), ("[FX] ", ""), ("", " Pack")])
+def test_generated_trees_match_the_oracle(memfs, seed, prefix, suffix):
+    organizer_bench.generate_tree(ROOT, random.Random(seed).choice([50, 300, 1500]), seed, fs=memfs)
+    expected = oracle_moves(memfs, ROOT, prefix, suffix)
+    assert core.plan_moves(ROOT, prefix, suffix).moves == expected
+    assert core.compute_moves(ROOT, prefix, suffix) == expected
+    assert sorted(streamed_moves(ROOT, prefix, suffix)) == sorted(expected)
+
+
+def _build(fs, files, folders=()):
+    fs.makedirs(ROOT)
+    for name in files: fs.create_file(os.path.join(ROOT, name))
+    for name in folders: fs.mkdir(os.path.join(ROOT, name))
+
+def _targets(moves):
+    return {os.path.basename(source): os.path.basename(os.path.dirname(destination)) for source, destination in moves}
+
+
+def test_every_known_suffix(memfs):
+    items = []
+    for known in core.KNOWN_SUFFIXES:
+        items += [f"Element{known.capitalize()}", f"Element{known}.dll", f"Element{known.upper()} 2.txt", f"Element{known}x.dat"]
+    _build(memfs, ["Element.aex"] + items)
+    moves = core.plan_moves(ROOT, "", "").moves
+    assert moves == oracle_moves(memfs, ROOT, "", "")
+    targets = _targets(moves)
+    for known in core.KNOWN_SUFFIXES:
+        assert targets[f"Element{known.capitalize()}"] == "Element"
+        assert targets[f"Element{known}.dll"] == "Element"
+        assert targets[f"Element{known.upper()} 2.txt"] == "Element"
+        assert f"Element{known}x.dat" not in targets # A suffix must end at a non-letter
+
+
+def test_longest_base_wins(memfs):
+    _build(memfs, ["Elem.aex", "Element.aex", "ElementPro.aex", "ElementPro Presets", "Element_Data.dll", "Elem-cfg", "ElementPresets.dll",
+                   "Elementary.txt", "elemLib.dll"])
+    moves = core.plan_moves(ROOT, "", "").moves
+    assert moves == oracle_moves(memfs, ROOT, "", "")
+    assert sorted(streamed_moves(ROOT, "", "")) == sorted(moves)
+    targets = _targets(moves)
+    assert targets["ElementPro Presets"] == "ElementPro"
+    assert targets["Element_Data.dll"] == "Element" and targets["ElementPresets.dll"] == "Element"
+    assert targets["Elem-cfg"] == "Elem" and targets["elemLib.dll"] == "Elem"
+    assert "Elementary.txt" not in targets
+
+
+def test_folder_named_like_its_target_stays(memfs):
+    _build(memfs, ["Saber.aex", "Twitch.aex", "Saber Help.pdf"], folders=["Saber", "Twitch Pack", "Saber Presets"])
+    for prefix, suffix, skipped in (("", "", "Saber"), ("", " Pack", "Twitch Pack")):
+        moves = core.plan_moves(ROOT, prefix, suffix).moves
+        assert moves == oracle_moves(memfs, ROOT, prefix, suffix)
+        assert sorted(streamed_moves(ROOT, prefix, suffix)) == sorted(moves)
+        assert skipped not in _targets(moves)
+    assert _targets(core.plan_moves(ROOT, "", "").moves)["Saber Presets"] == "Saber"
+
+
+def test_underscore_bases_are_not_organized(memfs):
+    _build(memfs, ["_Internal.aex", "_Internal Presets", "Deep.aex", "_Deep.dll", "DeepGlow.aex", "Deep_Glow.txt"])
+    moves = core.plan_moves(ROOT, "", "").moves
+    assert moves == oracle_moves(memfs, ROOT, "", "")
+    targets = _targets(moves)
+    assert "_Internal.aex" not in targets and "_Internal Presets" not in targets and "_Deep.dll" not in targets
+    assert targets["Deep_Glow.txt"] == "Deep"
+
+
+def test_first_aex_of_a_base_defines_the_folder(memfs):
+    _build(memfs, ["Optical.aex", "optical.AEX", "Optical Flares.txt"])
+    moves = core.plan_moves(ROOT, "", "").moves
+    assert moves == oracle_moves(memfs, ROOT, "", "")
+    assert set(_targets(moves).values()) == {"Optical"}
+
+
+def test_a_relative_directory_gives_absolute_moves(tmp_path, monkeypatch):
+    (tmp_path / "PI").mkdir(); (tmp_path / "PI" / "Saber.aex").write_bytes(b""); (tmp_path / "PI" / "Saber Help.pdf").write_bytes(b"")
+    monkeypatch.chdir(tmp_path)
+    plan = core.plan_moves("PI", "", "")
+    assert plan.directory == str(tmp_path / "PI") and all(os.path.isabs(s) and os.path.isabs(d) for s, d in plan.moves)
+    assert sorted(streamed_moves("PI", "", "")) == sorted(plan.moves)
+    result = core.execute_moves([(os.path.join("PI", "Saber.aex"), os.path.join("PI", "Saber", "Saber.aex"))])
+    assert result.ok and list(result.undo_mapping) == [str(tmp_path / "PI" / "Saber" / "Saber.aex")]
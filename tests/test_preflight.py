@@ -0,0 +1,86 @@
+"""preflight: every kind of problem it finds, and that execute_moves moves nothing when one is fatal."""
+import os
+
+import pytest
+
+import organizer_core as core
+import organizer_preflight
+from organizer_preflight import preflight
+
+ROOT = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+
+
+def _path(*parts):
+    return os.path.join(ROOT, *parts)
+
+def _build(fs, files=(), folders=()):
+    fs.makedirs(ROOT)
+    for name in folders: fs.makedirs(_path(name))
+    for name in files: fs.create_file(_path(name), 100)
+
+def _kinds(report):
+    return sorted((p.kind, p.fatal) for p in report.problems)
+
+
+def test_a_clean_plan_passes(memfs):
+    _build(memfs, ["Saber.aex", "Saber Help.pdf"])
+    plan = core.plan_moves(ROOT, "", "")
+    report = preflight(plan.moves, plan.snapshot, memfs)
+    assert report.ok and not report.problems and report.checked == 2 and report.copy_bytes == 0
+
+def test_collision_and_self_move(memfs):
+    _build(memfs, ["a.dat", "b.dat"], folders=["Saber"])
+    moves = [(_path("a.dat"), _path("Saber", "x.dat")), (_path("b.dat"), _path("Saber", "x.dat")), (_path("Saber"), _path("Saber", "Saber"))]
+    report = preflight(moves, fs=memfs)
+    assert ("collision", True) in _kinds(report) and ("self_move", True) in _kinds(report)
+    assert [p.source for p in report.problems if p.kind == "collision"] == [_path("b.dat")]
+
+@pytest.mark.parametrize("case_insensitive", [True, False])
+def test_names_differing_only_in_case(memfs, monkeypatch, case_insensitive):
+    monkeypatch.setattr(organizer_preflight, "CASE_INSENSITIVE", case_insensitive)
+    _build(memfs, ["a.dat", "b.dat"])
+    report = preflight([(_path("a.dat"), _path("Saber", "X.dat")), (_path("b.dat"), _path("Saber", "x.dat"))], fs=memfs)
+    assert _kinds(report) == [("case_clash", case_insensitive)] and report.ok != case_insensitive
+
+def test_existing_destination_and_target_folder_in_the_way(memfs):
+    _build(memfs, ["a.dat", "Aura", "b.dat", "Saber/a.dat"], folders=["Saber"])
+    moves = [(_path("a.dat"), _path("Saber", "a.dat")), (_path("b.dat"), _path("Aura", "b.dat"))]
+    assert _kinds(preflight(moves, fs=memfs)) == [("exists", True), ("target_is_file", True)]
+
+def test_a_target_folder_that_is_moved_itself(memfs):
+    _build(memfs, ["a.dat"], folders=["Saber"])
+    moves = [(_path("Saber"), _path("Twitch", "Saber")), (_path("a.dat"), _path("Saber", "a.dat"))]
+    assert ("target_moved", True) in _kinds(preflight(moves, fs=memfs))
+
+def test_a_source_that_vanished_is_only_a_warning(memfs):
+    _build(memfs, ["a.dat"])
+    report = preflight([(_path("a.dat"), _path("Saber", "a.dat")), (_path("gone.dat"), _path("Saber", "gone.dat"))], fs=memfs)
+    assert _kinds(report) == [("missing", False)] and report.ok and len(report.warnings) == 1
+
+def test_a_read_only_folder(memfs):
+    _build(memfs, ["a.dat"], folders=["Saber"])
+    memfs.set_read_only(_path("Saber"))
+    report = preflight([(_path("a.dat"), _path("Saber", "a.dat"))], fs=memfs)
+    assert _kinds(report) == [("permission", True)] and report.problems[0].destination == _path("Saber")
+
+def test_too_little_space_on_the_other_volume(memfs):
+    _build(memfs, ["Saber.aex", "Saber Help.pdf"])
+    memfs.mount(_path("Saber"), free=150)
+    plan = core.plan_moves(ROOT, "", "")
+    report = preflight(plan.moves, plan.snapshot, memfs)
+    assert _kinds(report) == [("space", True)] and report.copy_bytes == 200
+    memfs.create_file(_path("Saber Help.pdf"), 10)
+    assert preflight(core.plan_moves(ROOT, "", "").moves, fs=memfs).ok
+
+
+@pytest.mark.parametrize("setup", ["read_only", "full", "collision"])
+def test_nothing_moves_when_the_preflight_fails(memfs, setup):
+    _build(memfs, ["Aura.aex", "Aura Presets.dat", "Saber.aex", "Saber Help.pdf", "Notes.txt"])
+    if setup == "read_only": memfs.mkdir(_path("Saber")); memfs.set_read_only(_path("Saber"))
+    if setup == "full": memfs.mount(_path("Saber"), free=150)
+    before = memfs.tree(ROOT)
+    plan = core.plan_moves(ROOT, "", "")
+    moves = plan.moves + ([(_path("Notes.txt"), _path("Saber", "Saber.aex"))] if setup == "collision" else [])
+    result = core.execute_moves(moves, plan.snapshot)
+    assert not result.ok and result.moved_count == 0 and not result.preflight.ok
+    assert memfs.tree(ROOT) == before and not os.path.exists(core.UNDO_FILE)
@@ -0,0 +1,106 @@
+"""Flatten and re-layout of organized folders (organizer_relayout)."""
+import os
+
+import organizer_core as core
+import organizer_fs
+import organizer_relayout as relayout
+
+ROOT = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+PLUGINS = {"Element": ["Element Presets", "ElementLicense.dll"], "Saber": ["Saber Help.pdf"], "Twitch": []}
+
+
+def _organized(fs, prefix="", suffix=""):
+    """ROOT with PLUGINS organized into '{prefix}{base}{suffix}' folders."""
+    for base, items in PLUGINS.items():
+        folder = os.path.join(ROOT, f"{prefix}{base}{suffix}"); fs.makedirs(folder, exist_ok=True)
+        for name in [base + ".aex"] + items: fs.create_file(os.path.join(folder, name), 100)
+    fs.create_file(os.path.join(ROOT, "Readme.txt"))
+
+
+def test_flatten_renames_when_the_root_is_a_mount_point(memfs):
+    memfs.mount(ROOT)
+    _organized(memfs)
+    plan = relayout.plan_flatten(ROOT)
+    result = relayout.apply_relayout(plan)
+    assert result.ok and result.renamed == len(plan.moves) == 6 and result.copied == 0
+    assert memfs.tree(ROOT) == sorted(["Readme.txt"] + [name for base, items in PLUGINS.items() for name in [base + ".aex"] + items])
+
+def test_source_on_another_volume_is_copied_without_a_rename_attempt(memfs):
+    memfs.makedirs(ROOT); memfs.mount(os.path.join(ROOT, "[FX] Saber"))
+    _organized(memfs, "[FX] ")
+    faulty = core.FILESYSTEM = organizer_fs.FaultyFileSystem(memfs)
+    result = relayout.apply_relayout(relayout.plan_flatten(ROOT, "[FX] "))
+    assert result.ok and result.copied == 2 and result.renamed == 4
+    assert faulty.calls["rename"] == 4 and faulty.calls["transfer"] == 2 # No rename tried (and failed with EXDEV) for Saber's items
+
+
+def _flat():
+    return sorted(["Readme.txt"] + [name for base, items in PLUGINS.items() for name in [base + ".aex"] + items])
+
+def test_detect_scheme(memfs):
+    memfs.makedirs(ROOT)
+    _organized(memfs, "[FX] ", " Pack")
+    assert relayout.detect_scheme(ROOT) == ("[FX] ", " Pack")
+    assert [f.base for f in relayout.find_organized(ROOT, "[FX] ", " Pack")] == ["Element", "Saber", "Twitch"]
+    assert relayout.find_organized(ROOT) == []
+
+def test_flatten_is_undone_into_recreated_folders(memfs):
+    memfs.makedirs(ROOT)
+    _organized(memfs)
+    before = memfs.tree(ROOT)
+    plan = relayout.plan_flatten(ROOT)
+    assert sorted(os.path.basename(p) for p in plan.remove_after) == ["Element", "Saber", "Twitch"]
+    result = relayout.apply_relayout(plan)
+    assert result.ok and len(result.removed_folders) == 3 and memfs.tree(ROOT) == _flat()
+    undo = core.undo_moves()
+    assert undo.ok and undo.reverted == 6 and memfs.tree(ROOT) == before
+
+def test_flatten_keeps_strays_and_names_taken_in_the_root(memfs):
+    memfs.makedirs(ROOT)
+    _organized(memfs)
+    memfs.create_file(os.path.join(ROOT, "Saber", "Notes.txt")); memfs.create_file(os.path.join(ROOT, "ElementLicense.dll"))
+    plan = relayout.plan_flatten(ROOT)
+    assert [os.path.basename(s) for s, _, _ in plan.conflicts] == ["ElementLicense.dll"]
+    assert [os.path.basename(p) for p in plan.remove_after] == ["Twitch"]
+    result = relayout.apply_relayout(plan)
+    assert result.ok and [os.path.basename(p) for p in result.removed_folders] == ["Twitch"]
+    assert memfs.tree(os.path.join(ROOT, "Saber")) == ["Notes.txt"] and memfs.tree(os.path.join(ROOT, "Element")) == ["ElementLicense.dll"]
+
+def test_flatten_failing_halfway_is_undone(memfs, monkeypatch):
+    memfs.makedirs(ROOT)
+    _organized(memfs)
+    before = memfs.tree(ROOT)
+    faulty = organizer_fs.FaultyFileSystem(memfs)
+    faulty.fail("rename", os.path.join(ROOT, "Saber", "*"), count=1)
+    monkeypatch.setattr(core, "FILESYSTEM", faulty)
+    result = relayout.apply_relayout(relayout.plan_flatten(ROOT), workers=1)
+    assert not result.ok and [os.path.basename(p) for p in result.removed_folders] == ["Element"] # Emptied before the failure
+    assert not memfs.exists(os.path.join(ROOT, "Element"))
+    undo = core.undo_moves()
+    assert undo.ok and memfs.tree(ROOT) == before
+
+def test_relayout_renames_each_folder_once(memfs):
+    memfs.makedirs(ROOT)
+    _organized(memfs)
+    before = memfs.tree(ROOT)
+    faulty = core.FILESYSTEM = organizer_fs.FaultyFileSystem(memfs)
+    plan = relayout.plan_relayout(ROOT, "", "", "[FX] ", "")
+    assert plan.renamed == 3 and not plan.conflicts and not plan.remove_after
+    result = relayout.apply_relayout(plan)
+    assert result.ok and result.renamed == 3 and faulty.calls["rename"] == 3
+    assert memfs.tree(ROOT) == sorted(["Readme.txt"] + [f"[FX] {name}" for name in before if name != "Readme.txt"])
+    assert core.undo_moves().ok and memfs.tree(ROOT) == before
+
+def test_relayout_merges_into_an_existing_folder(memfs):
+    memfs.makedirs(ROOT)
+    _organized(memfs)
+    memfs.makedirs(os.path.join(ROOT, "[FX] Saber")); memfs.create_file(os.path.join(ROOT, "[FX] Saber", "Saber Help.pdf"))
+    memfs.create_file(os.path.join(ROOT, "[FX] Twitch")) # A file: the folder cannot be renamed onto it
+    before = memfs.tree(ROOT)
+    plan = relayout.plan_relayout(ROOT, "", "", "[FX] ", "")
+    assert plan.renamed == 1 and sorted(os.path.basename(s) for s, _, _ in plan.conflicts) == ["Saber Help.pdf", "Twitch"]
+    assert [(os.path.basename(s), os.path.basename(os.path.dirname(d))) for s, d in plan.moves if os.path.dirname(s) != ROOT] == [("Saber.aex", "[FX] Saber")]
+    result = relayout.apply_relayout(plan)
+    assert result.ok and result.removed_folders == [] # Saber still holds the conflicting help file
+    assert memfs.tree(os.path.join(ROOT, "[FX] Saber")) == ["Saber Help.pdf", "Saber.aex"] and memfs.tree(os.path.join(ROOT, "Saber")) == ["Saber Help.pdf"]
+    assert core.undo_moves().ok and memfs.tree(ROOT) == before
@@ -0,0 +1,82 @@
+"""Association rules from organizer_rules.json: aliases, mappings, suffixes, ignores and the compiled-rules cache."""
+import os
+import json
+
+import pytest
+
+import organizer_core as core
+import organizer_rules
+from organizer_rules import Rules, load_rules
+
+ROOT = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+
+
+@pytest.fixture
+def rules_file(tmp_path, monkeypatch):
+    """Write a config dict (or raw text) to the rules file in effect."""
+    path = tmp_path / "organizer_rules.json"
+    monkeypatch.setattr(core, "RULES_FILE", str(path))
+    def write(config):
+        path.write_text(config if isinstance(config, str) else json.dumps(config), encoding='utf-8')
+        return str(path)
+    return write
+
+def _targets(fs, names):
+    fs.makedirs(ROOT)
+    for name in names: fs.create_file(os.path.join(ROOT, name))
+    return {os.path.basename(s): os.path.basename(os.path.dirname(d)) for s, d in core.plan_moves(ROOT, "", "").moves}
+
+
+def test_an_alias_groups_items_under_its_plugin(memfs, rules_file):
+    rules_file({"aliases": {"Particular": ["TC_Particular", "TCParticular"]}})
+    targets = _targets(memfs, ["Particular.aex", "TC_Particular Presets.ffx", "TCParticular.dll", "TC_Other.dll"])
+    assert targets == {"Particular.aex": "Particular", "TC_Particular Presets.ffx": "Particular", "TCParticular.dll": "Particular"}
+
+def test_an_alias_without_its_plugin_does_nothing(memfs, rules_file):
+    rules_file({"aliases": {"Particular": ["TC_Particular"]}})
+    assert _targets(memfs, ["Saber.aex", "TC_Particular Presets.ffx"]) == {"Saber.aex": "Saber"}
+
+def test_ignored_items_are_never_moved(memfs, rules_file):
+    rules_file({"ignore": ["*.tmp", "Thumbs.db"]})
+    targets = _targets(memfs, ["Saber.aex", "Saber Help.TMP", "Saber_cache.tmp", "Thumbs.db", "Saber Help.pdf"])
+    assert targets == {"Saber.aex": "Saber", "Saber Help.pdf": "Saber"}
+
+def test_a_mapping_overrides_prefix_matching(memfs, rules_file):
+    rules_file({"mappings": {"SaberLicense.dll": "Twitch", "RSMB_shared.dll": "RSMB"}})
+    targets = _targets(memfs, ["Saber.aex", "Twitch.aex", "RSMB.aex", "SaberLicense.dll", "RSMB_shared.dll", "SaberPresets.dll"])
+    assert targets["SaberLicense.dll"] == "Twitch" and targets["RSMB_shared.dll"] == "RSMB" and targets["SaberPresets.dll"] == "Saber"
+
+def test_a_mapping_to_an_absent_plugin_falls_back_to_the_prefix_rules(memfs, rules_file):
+    rules_file({"mappings": {"SaberLicense.dll": "Twitch"}})
+    assert _targets(memfs, ["Saber.aex", "SaberLicense.dll"])["SaberLicense.dll"] == "Saber"
+
+def test_extra_suffixes(memfs, rules_file):
+    rules_file({"suffixes": ["Assets"]})
+    targets = _targets(memfs, ["Element.aex", "ElementAssets", "Elementassetsx.dat", "ElementLibrary.txt"])
+    assert targets == {"Element.aex": "Element", "ElementAssets": "Element"}
+
+def test_ignore_plugins_replaces_the_default(memfs, rules_file):
+    rules_file({"ignore_plugins": ["Beta*"]})
+    targets = _targets(memfs, ["_Internal.aex", "BetaGlow.aex", "BetaGlow Presets.ffx"])
+    assert targets == {"_Internal.aex": "_Internal"}
+
+
+def test_rules_are_cached_until_the_file_changes(rules_file):
+    path = rules_file({"suffixes": ["fx"]})
+    first = load_rules(path)
+    assert load_rules(path) is first and core.current_rules() is first and "fx" in first.suffixes
+    rules_file({"suffixes": ["fx", "assets"]})
+    second = load_rules(path)
+    assert second is not first and "assets" in second.suffixes and second.fingerprint != first.fingerprint
+
+def test_a_missing_file_gives_the_built_in_rules(tmp_path):
+    assert load_rules(str(tmp_path / "none.json")) is organizer_rules.DEFAULT_RULES
+    assert Rules().suffixes == organizer_rules.KNOWN_SUFFIXES and Rules().fingerprint == organizer_rules.DEFAULT_RULES.fingerprint
+
+@pytest.mark.parametrize("text", ['{"suffixes": ["fx"', '[]', '{"colour": []}', '{"suffixes": "fx"}', '{"aliases": {"A": "B"}}', '{"mappings": {"a.dll": 3}}'])
+def test_a_bad_file_raises_rules_error(memfs, rules_file, text):
+    path = rules_file(text)
+    with pytest.raises(core.RulesError) as e: core.current_rules()
+    assert path in str(e.value)
+    memfs.makedirs(ROOT); memfs.create_file(os.path.join(ROOT, "Saber.aex"))
+    with pytest.raises(core.RulesError): core.plan_moves(ROOT, "", "")
@@ -0,0 +1,78 @@
+"""Incremental planning: plan_incremental must give what a fresh plan_moves gives, whatever changed in between."""
+import os
+import random
+
+import pytest
+
+import organizer_core as core
+import organizer_bench
+import organizer_snapshot
+
+ROOT = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+
+
+def _mutate(fs, rnd, step):
+    """One random change to ROOT: add, remove, rename, touch, retype, or add/remove a plugin."""
+    names = fs.listdir(ROOT)
+    bases = [os.path.splitext(n)[0] for n in names if n.lower().endswith(".aex")] or ["Orphan"]
+    name = rnd.choice(names) if names else None
+    path = os.path.join(ROOT, name) if name else None
+    kind = rnd.choice(["related", "unrelated", "plugin", "plugin_prefix", "remove", "remove_plugin", "rename", "touch", "retype"])
+    if kind == "related": fs.create_file(os.path.join(ROOT, f"{rnd.choice(bases)}{rnd.choice([' Presets', 'Lib', '_', 'x'])}{step}.dat"))
+    elif kind == "unrelated": fs.create_file(os.path.join(ROOT, f"Zz Unrelated {step}.txt"))
+    elif kind == "plugin": fs.create_file(os.path.join(ROOT, f"NewFx{step}.aex")); fs.create_file(os.path.join(ROOT, f"NewFx{step} Presets.ffx"))
+    elif kind == "plugin_prefix": fs.create_file(os.path.join(ROOT, rnd.choice(bases)[:3] + ".aex")) # A shorter base that prefixes others
+    elif kind == "remove_plugin":
+        aex = [n for n in names if n.lower().endswith(".aex")]
+        if aex: fs.remove(os.path.join(ROOT, rnd.choice(aex)))
+    elif name is None: return
+    elif kind == "remove" and fs.isdir(path): fs.rmtree(path)
+    elif kind == "remove": fs.remove(path)
+    elif kind == "rename": fs.rename(path, os.path.join(ROOT, f"{rnd.choice(bases)} Renamed {step}" + os.path.splitext(name)[1]))
+    elif kind == "touch" and not fs.isdir(path): fs.create_file(path, 7, mtime=1000000 + step)
+    elif kind == "retype" and fs.isdir(path): fs.rmtree(path); fs.create_file(path)
+    elif kind == "retype": fs.remove(path); fs.mkdir(path)
+
+
+@pytest.mark.parametrize("racy", [True, False])
+@pytest.mark.parametrize("seed", range(8))
+def test_incremental_plans_match_a_full_plan(memfs, monkeypatch, seed, racy):
+    if not racy: monkeypatch.setattr(organizer_snapshot, "RACY_SECONDS", 0.0) # Trust directory mtimes at once
+    organizer_bench.generate_tree(ROOT, 120, seed, fs=memfs)
+    rnd = random.Random(seed)
+    assert organizer_snapshot.plan_incremental(ROOT, "", "").changed is None # No snapshot yet: a full plan
+    for step in range(12):
+        for _ in range(rnd.randint(0, 3)): _mutate(memfs, rnd, step)
+        incremental = organizer_snapshot.plan_incremental(ROOT, "", "")
+        full = core.plan_moves(ROOT, "", "")
+        assert incremental.moves == full.moves and incremental.aex_count == full.aex_count, f"step {step}"
+
+def test_an_unchanged_directory_is_not_listed_again(memfs, monkeypatch):
+    monkeypatch.setattr(organizer_snapshot, "RACY_SECONDS", 0.0)
+    organizer_bench.generate_tree(ROOT, 60, 1, fs=memfs)
+    first = organizer_snapshot.plan_incremental(ROOT, "", "")
+    listed = []
+    monkeypatch.setattr(memfs, "scandir", lambda path, real=memfs.scandir: listed.append(path) or real(path))
+    again = organizer_snapshot.plan_incremental(ROOT, "", "")
+    assert again.changed == 0 and again.moves == first.moves and listed == []
+    memfs.create_file(os.path.join(ROOT, "Zz.txt"))
+    assert organizer_snapshot.plan_incremental(ROOT, "", "").changed == 1 and listed == [ROOT]
+
+def test_remember_applied_and_forget(memfs):
+    organizer_bench.generate_tree(ROOT, 60, 2, fs=memfs)
+    plan = organizer_snapshot.plan_incremental(ROOT, "", "")
+    result = core.execute_moves(plan.moves, plan.snapshot)
+    assert result.ok
+    organizer_snapshot.remember_applied(plan, result)
+    memfs.create_file(os.path.join(ROOT, "Late.aex")); memfs.create_file(os.path.join(ROOT, "Late Presets.ffx"))
+    after = organizer_snapshot.plan_incremental(ROOT, "", "")
+    assert after.changed is not None and after.moves == core.plan_moves(ROOT, "", "").moves
+    organizer_snapshot.forget(ROOT)
+    assert not os.path.exists(organizer_snapshot.snapshot_file(ROOT))
+    assert organizer_snapshot.plan_incremental(ROOT, "", "").changed is None
+
+def test_other_prefix_or_suffix_plans_in_full(memfs):
+    organizer_bench.generate_tree(ROOT, 40, 3, fs=memfs)
+    organizer_snapshot.plan_incremental(ROOT, "", "")
+    plan = organizer_snapshot.plan_incremental(ROOT, "[FX] ", "")
+    assert plan.changed is None and plan.moves == core.plan_moves(ROOT, "[FX] ", "").moves
@@ -0,0 +1,32 @@
+"""execute_stream: groups are moved as they are planned and checked one at a time."""
+import os
+
+import organizer_core as core
+
+ROOT = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+
+
+def _build(fs, names):
+    fs.makedirs(ROOT)
+    for name in names: fs.create_file(os.path.join(ROOT, name))
+
+
+def test_stream_moves_the_same_items_as_execute_moves(memfs):
+    _build(memfs, ["Aura.aex", "Aura Presets.dat", "Saber.aex", "Saber Help.pdf", "Notes.txt"])
+    result = core.execute_stream(core.stream_moves(ROOT, "", ""))
+    assert result.ok and result.moved_count == 4
+    assert memfs.tree(ROOT) == ["Aura/", "Aura/Aura Presets.dat", "Aura/Aura.aex", "Notes.txt", "Saber/", "Saber/Saber Help.pdf", "Saber/Saber.aex"]
+
+def test_a_later_group_failing_its_checks_stops_after_earlier_groups_moved(memfs):
+    # 'Zeta' is in the way of the folder Zeta.aex needs; execute_moves would move nothing
+    _build(memfs, ["Aura.aex", "Aura Presets.dat", "Zeta.aex"])
+    memfs.mkdir(os.path.join(ROOT, "Zeta Presets")); memfs.create_file(os.path.join(ROOT, "Zeta"))
+    before = memfs.tree(ROOT)
+    plan = core.plan_moves(ROOT, "", "")
+    assert core.execute_moves(plan.moves, plan.snapshot).moved_count == 0 and memfs.tree(ROOT) == before
+
+    result = core.execute_stream(core.stream_moves(ROOT, "", ""), workers=1) # One worker moves each group before the next is checked
+    assert not result.ok and any(issue.kind == "preflight" for issue in result.issues)
+    assert result.moved_count == 2 and memfs.exists(os.path.join(ROOT, "Aura", "Aura.aex"))
+    core.undo_moves()
+    assert memfs.tree(ROOT) == before
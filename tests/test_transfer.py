@@ -0,0 +1,156 @@
+"""
+Cross-volume moves: organizer_transfer on real files, and execute_moves/undo
+when a copy into another (in-memory) volume fails partway.
+"""
+import os
+import errno
+import threading
+
+import pytest
+
+import organizer_core as core
+import organizer_transfer
+from organizer_journal import read_journal
+from organizer_transfer import STAGING_SUFFIX, TransferError, TransferCancelled, transfer
+
+ROOT = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+
+
+class Crash(Exception):
+    """Stands in for the process dying at a checkpoint."""
+
+
+def _tree(path):
+    return sorted(os.path.relpath(os.path.join(parent, name), path) for parent, dirs, files in os.walk(path) for name in dirs + files)
+
+def _item(tmp_path):
+    source = tmp_path / "src" / "Saber Presets"
+    (source / "Sub").mkdir(parents=True)
+    (source / "a.ffx").write_bytes(b"a" * 3000)
+    (source / "b.ffx").write_bytes(b"b" * 5000)
+    (source / "Sub" / "c.ffx").write_bytes(b"c" * 700)
+    (tmp_path / "dst").mkdir()
+    return str(source), str(tmp_path / "dst" / "Saber Presets")
+
+
+def test_a_file_is_checkpointed_then_moved(tmp_path):
+    source = tmp_path / "Saber.aex"; source.write_bytes(b"x" * 4096)
+    destination = str(tmp_path / "Saber" / "Saber.aex"); os.mkdir(os.path.dirname(destination))
+    checkpoints = []
+    result = transfer(str(source), destination, checkpoint=lambda name, n: checkpoints.append((name, n)))
+    assert checkpoints == [("Saber.aex", 4096), (None, 4096)]
+    assert result.files == 1 and result.bytes_copied == 4096 and not source.exists()
+    assert open(destination, "rb").read() == b"x" * 4096 and not os.path.lexists(destination + STAGING_SUFFIX)
+
+def test_an_interrupted_folder_copy_is_resumed(tmp_path):
+    source, destination = _item(tmp_path)
+    def crash_after_first(name, n):
+        if name is not None: raise Crash(name)
+    with pytest.raises(Crash): transfer(source, destination, checkpoint=crash_after_first)
+    staging = destination + STAGING_SUFFIX
+    assert os.path.isdir(staging) and os.path.isdir(source) and not os.path.exists(destination)
+
+    checkpoints = []
+    result = transfer(source, destination, checkpoint=lambda name, n: checkpoints.append((name, n)))
+    assert result.bytes_resumed == 3000 and result.bytes_copied == 5700 # a.ffx was complete
+    assert checkpoints == [("b.ffx", 5000), (os.path.join("Sub", "c.ffx"), 700), (None, 8700)]
+    assert _tree(destination) == ["Sub", os.path.join("Sub", "c.ffx"), "a.ffx", "b.ffx"]
+    assert not os.path.exists(source) and not os.path.lexists(staging)
+
+def test_a_partly_copied_file_is_continued_unless_the_source_changed(tmp_path):
+    source = tmp_path / "Saber.aex"; source.write_bytes(b"0123456789" * 100)
+    destination = str(tmp_path / "dst" / "Saber.aex"); os.mkdir(os.path.dirname(destination))
+    staging = destination + STAGING_SUFFIX
+    with open(staging, "wb") as f: f.write(b"0123456789" * 40)
+    result = transfer(str(source), destination)
+    assert result.bytes_resumed == 400 and result.bytes_copied == 600 and open(destination, "rb").read() == b"0123456789" * 100
+
+    source = tmp_path / "Saber.aex"; source.write_bytes(b"abcdefghij" * 100)
+    os.remove(destination)
+    with open(staging, "wb") as f: f.write(b"0123456789" * 40)
+    st = os.stat(source); os.utime(staging, ns=(st.st_atime_ns, st.st_mtime_ns - 10**9)) # Written before the source changed
+    result = transfer(str(source), destination)
+    assert result.bytes_resumed == 0 and open(destination, "rb").read() == b"abcdefghij" * 100
+
+def test_a_copy_that_does_not_match_leaves_the_source(tmp_path, monkeypatch):
+    source, destination = _item(tmp_path)
+    monkeypatch.setattr(organizer_transfer, "_copy_range", lambda fin, fout, offset, size, result, cancel: 0) # Writes nothing
+    with pytest.raises(TransferError): transfer(source, destination)
+    assert _tree(source) == ["Sub", os.path.join("Sub", "c.ffx"), "a.ffx", "b.ffx"] and not os.path.exists(destination)
+
+def test_a_cancelled_copy_keeps_its_staging_copy(tmp_path):
+    source, destination = _item(tmp_path)
+    cancel = threading.Event()
+    def cancel_after_first(name, n): cancel.set()
+    with pytest.raises(TransferCancelled): transfer(source, destination, checkpoint=cancel_after_first, cancel=cancel)
+    assert os.path.isfile(os.path.join(destination + STAGING_SUFFIX, "a.ffx")) and os.path.isdir(source)
+    assert organizer_transfer.discard_partial(destination) and not os.path.lexists(destination + STAGING_SUFFIX)
+    assert not organizer_transfer.discard_partial(destination)
+
+
+def _other_volume(memfs):
+    """Saber.aex and 'Saber Presets' in the root; the existing 'Saber' folder is another volume."""
+    memfs.makedirs(ROOT)
+    memfs.mount(os.path.join(ROOT, "Saber")); memfs.create_file(os.path.join(ROOT, "Saber", "Readme.txt"))
+    memfs.create_file(os.path.join(ROOT, "Saber.aex"), 100)
+    memfs.makedirs(os.path.join(ROOT, "Saber Presets", "Sub"))
+    memfs.create_file(os.path.join(ROOT, "Saber Presets", "a.ffx"), 10); memfs.create_file(os.path.join(ROOT, "Saber Presets", "Sub", "b.ffx"), 20)
+    return memfs.tree(ROOT)
+
+def _fail(monkeypatch, fs, name, test):
+    """Make fs.<name>(path) raise EIO where test(path) holds; the backend's own calls go through it too."""
+    real = getattr(fs, name)
+    def failing(path, *args, **kwargs):
+        if test(path): raise OSError(errno.EIO, "Injected I/O error", path)
+        return real(path, *args, **kwargs)
+    monkeypatch.setattr(fs, name, failing)
+
+def _entries():
+    return {os.path.basename(e.source): (e.confirmed, e.checkpoints, e.copied) for e in read_journal(core.UNDO_FILE).entries}
+
+
+def test_copies_into_another_volume_are_journaled_and_undone(memfs):
+    before = _other_volume(memfs)
+    plan = core.plan_moves(ROOT, "", "")
+    result = core.execute_moves(plan.moves, plan.snapshot)
+    assert result.ok and result.copied == 2 and result.renamed == 0
+    assert _entries() == {"Saber.aex": (True, 1, True), "Saber Presets": (True, 2, True)}
+    assert core.undo_moves().ok and memfs.tree(ROOT) == before
+
+def test_a_copy_stopped_before_it_is_in_place_is_discarded_by_undo(memfs, monkeypatch):
+    before = _other_volume(memfs)
+    _fail(monkeypatch, memfs, "rename", lambda path: path.endswith(STAGING_SUFFIX))
+    plan = core.plan_moves(ROOT, "", "")
+    result = core.execute_moves(plan.moves, plan.snapshot, workers=1)
+    assert not result.ok and result.moved_count == 0
+    assert any(name.endswith(STAGING_SUFFIX) for name in memfs.listdir(os.path.join(ROOT, "Saber")))
+    assert _entries()["Saber.aex"] == (False, 1, False) # Intent and checkpoint, no done record
+    monkeypatch.delattr(memfs, "rename") # The fault is gone
+    undo = core.undo_moves()
+    assert undo.ok and {item.status for item in undo.items} == {"not_moved"}
+    assert memfs.tree(ROOT) == before
+
+def test_a_copy_in_place_whose_source_was_not_deleted_is_undone(memfs, monkeypatch):
+    before = _other_volume(memfs)
+    _fail(monkeypatch, memfs, "rmtree", lambda path: path == os.path.join(ROOT, "Saber Presets"))
+    plan = core.plan_moves(ROOT, "", "")
+    result = core.execute_moves(plan.moves, plan.snapshot, workers=1)
+    assert not result.ok and result.moved_count == 1
+    assert _entries()["Saber Presets"] == (False, 2, True) # The copy was complete; deleting the source failed
+    assert memfs.isdir(os.path.join(ROOT, "Saber", "Saber Presets")) and memfs.isdir(os.path.join(ROOT, "Saber Presets"))
+    monkeypatch.delattr(memfs, "rmtree")
+    undo = core.undo_moves()
+    assert undo.ok and sorted(item.status for item in undo.items) == ["reverted", "reverted"]
+    assert memfs.tree(ROOT) == before
+
+def test_a_full_volume_stops_the_copy_and_undo_restores_the_rest(memfs):
+    memfs.makedirs(ROOT)
+    memfs.mount(os.path.join(ROOT, "Saber"), free=150); memfs.create_file(os.path.join(ROOT, "Saber", "Readme.txt"))
+    memfs.create_file(os.path.join(ROOT, "Saber.aex"), 100); memfs.create_file(os.path.join(ROOT, "Saber Help.pdf"), 80)
+    memfs.create_file(os.path.join(ROOT, "Aura.aex"), 10)
+    before = memfs.tree(ROOT)
+    plan = core.plan_moves(ROOT, "", "")
+    result = core.execute_moves(plan.moves, plan.snapshot, workers=1, check=False)
+    assert not result.ok
+    assert memfs.exists(os.path.join(ROOT, "Saber Help.pdf")) or memfs.exists(os.path.join(ROOT, "Saber.aex")) # One of them did not fit
+    assert core.undo_moves().ok and memfs.tree(ROOT) == before
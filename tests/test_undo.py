@@ -0,0 +1,77 @@
+"""Undo's batched, parallel revert: items it must skip, folders it cannot list, and small batches."""
+import os
+import errno
+
+import pytest
+
+import organizer_core as core
+
+ROOT = os.path.abspath(os.path.join(os.sep, "share", "Plug-ins"))
+PLUGINS = ("Aura", "Deep", "Saber", "Twitch")
+
+
+def _path(*parts):
+    return os.path.join(ROOT, *parts)
+
+def _apply(fs, plugins=PLUGINS):
+    fs.makedirs(ROOT)
+    for name in plugins: fs.create_file(_path(f"{name}.aex"), 100); fs.create_file(_path(f"{name} Presets.ffx"), 10)
+    before = fs.tree(ROOT)
+    plan = core.plan_moves(ROOT, "", "")
+    assert core.execute_moves(plan.moves, plan.snapshot).ok
+    return before
+
+def _statuses(undo):
+    return sorted((os.path.basename(i.source), i.status) for i in undo.items if i.status != "reverted")
+
+def _unlistable(monkeypatch, fs, folder):
+    real = fs.scandir
+    def scandir(path):
+        if path == folder: raise PermissionError(errno.EACCES, "Permission denied", path)
+        return real(path)
+    monkeypatch.setattr(fs, "scandir", scandir)
+
+
+def test_an_item_whose_original_location_is_taken_is_skipped(memfs):
+    before = _apply(memfs)
+    memfs.create_file(_path("Saber.aex"), 5) # Something new where the item came from
+    undo = core.undo_moves(workers=4)
+    assert not undo.ok and undo.reverted == 7 and undo.attempted == 8
+    assert _statuses(undo) == [("Saber.aex", "exists")] and len(undo.issues) == 1
+    assert memfs.exists(_path("Saber", "Saber.aex")) and memfs.stat(_path("Saber.aex")).st_size == 5 # Neither copy lost
+    assert memfs.tree(ROOT) == sorted(before + ["Saber" + os.sep, os.path.join("Saber", "Saber.aex")])
+
+def test_a_missing_item_is_reported_but_not_an_error(memfs):
+    before = _apply(memfs)
+    memfs.remove(_path("Deep", "Deep Presets.ffx"))
+    undo = core.undo_moves(workers=4)
+    assert undo.ok and undo.reverted == 7 and _statuses(undo) == [("Deep Presets.ffx", "missing")] and not undo.issues
+    assert memfs.tree(ROOT) == [name for name in before if name != "Deep Presets.ffx"]
+
+@pytest.mark.parametrize("folder", ["Saber", ""])
+def test_a_folder_that_cannot_be_listed_is_checked_item_by_item(memfs, monkeypatch, folder):
+    before = _apply(memfs)
+    _unlistable(monkeypatch, memfs, _path(folder).rstrip(os.sep))
+    undo = core.undo_moves(workers=4)
+    assert undo.ok and undo.reverted == 8
+    monkeypatch.delattr(memfs, "scandir")
+    assert memfs.tree(ROOT) == before
+
+def test_a_taken_location_is_found_without_a_listing(memfs, monkeypatch):
+    before = _apply(memfs)
+    memfs.create_file(_path("Aura Presets.ffx"), 5)
+    _unlistable(monkeypatch, memfs, ROOT)
+    undo = core.undo_moves(workers=4)
+    assert not undo.ok and undo.reverted == 7 and _statuses(undo) == [("Aura Presets.ffx", "exists")]
+    monkeypatch.delattr(memfs, "scandir")
+    assert memfs.tree(ROOT) == sorted(before + ["Aura" + os.sep, os.path.join("Aura", "Aura Presets.ffx")])
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_small_batches_with_skips_in_between(memfs, monkeypatch, workers):
+    monkeypatch.setattr(core, "UNDO_BATCH", 3)
+    plugins = [f"P{n:02d}" for n in range(12)]
+    before = _apply(memfs, plugins)
+    memfs.remove(_path("P03", "P03.aex")); memfs.create_file(_path("P07 Presets.ffx"), 5)
+    undo = core.undo_moves(workers=workers)
+    assert undo.reverted == 22 and undo.attempted == 24 and _statuses(undo) == [("P03.aex", "missing"), ("P07 Presets.ffx", "exists")]
+    assert memfs.tree(ROOT) == sorted([n for n in before if n != "P03.aex"] + ["P07" + os.sep, os.path.join("P07", "P07 Presets.ffx")])
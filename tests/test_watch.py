@@ -0,0 +1,49 @@
+"""Watch mode's organize_new: only new groups are organized, and an item is known once it is settled and moved."""
+import os
+import errno
+
+import organizer_core as core
+import organizer_fs
+from organizer_watch import organize_new
+
+
+def _add(root, *names):
+    for name in names: (root / name).write_bytes(b"x")
+
+def _tree(root):
+    return sorted(os.path.relpath(os.path.join(parent, name), root) for parent, dirs, files in os.walk(root) for name in dirs + files)
+
+
+def test_only_groups_with_new_entries_are_organized(tmp_path):
+    root = tmp_path / "PI"; root.mkdir()
+    _add(root, "Old.aex", "Old Presets.ffx")
+    known = set(os.listdir(root))
+    assert organize_new(str(root), "", "", known, settle=0) is None
+    _add(root, "Saber.aex", "Saber Help.pdf", "Notes.txt")
+    batch = organize_new(str(root), "", "", known, settle=0)
+    assert batch.new_entries == ["Notes.txt", "Saber Help.pdf", "Saber.aex"] and batch.groups == 1 and batch.result.ok and not batch.deferred
+    assert _tree(root) == ["Notes.txt", "Old Presets.ffx", "Old.aex", "Saber", os.path.join("Saber", "Saber Help.pdf"), os.path.join("Saber", "Saber.aex")]
+    assert known == {"Old.aex", "Old Presets.ffx", "Notes.txt", "Saber Help.pdf", "Saber.aex", "Saber"}
+    assert organize_new(str(root), "", "", known, settle=0) is None
+
+def test_unsettled_items_are_deferred(tmp_path):
+    root = tmp_path / "PI"; root.mkdir()
+    known = set()
+    _add(root, "Saber.aex", "Saber Help.pdf")
+    batch = organize_new(str(root), "", "", known, settle=3600)
+    assert batch.deferred == ["Saber Help.pdf", "Saber.aex"] and batch.result is None and not known
+    assert organize_new(str(root), "", "", known, settle=0).result.moved_count == 2
+
+def test_items_that_failed_to_move_are_still_new(tmp_path, monkeypatch):
+    root = tmp_path / "PI"; root.mkdir()
+    known = set()
+    _add(root, "Saber.aex", "Saber Help.pdf", "Notes.txt")
+    faulty = organizer_fs.FaultyFileSystem(core.FILESYSTEM)
+    faulty.fail("rename", os.path.join(str(root), "*"), errno.EIO, count=1) # The first move fails and stops the run
+    monkeypatch.setattr(core, "FILESYSTEM", faulty)
+    batch = organize_new(str(root), "", "", known, settle=0, workers=1)
+    assert not batch.result.ok and batch.result.moved_count == 0
+    assert known == {"Notes.txt"} # The next round tries the Saber group again
+    batch = organize_new(str(root), "", "", known, settle=0, workers=1)
+    assert batch.new_entries == ["Saber Help.pdf", "Saber.aex"] and batch.result.ok and known == {"Notes.txt", "Saber Help.pdf", "Saber.aex", "Saber"}
+    assert _tree(root) == ["Notes.txt", "Saber", os.path.join("Saber", "Saber Help.pdf"), os.path.join("Saber", "Saber.aex")]